@@ -1,19 +1,91 @@
 import os
+import sys
 import logging
 import re
 import zlib
 import hashlib
+import json
+import time
+import difflib
+import argparse
 import pdfplumber  # pip install pdfplumber
 import olefile
 from pathlib import Path
 from datetime import datetime
-from docx import Document
-from pptx import Presentation
+from collections import Counter, deque
+
+# 공용 파서 모듈 (src/parse)
+sys.path.insert(0, str(Path(__file__).parent / 'parse'))
+from hwp_reader import iter_hwp_paragraphs  # HWP 레코드 단위 리더
+from ooxml_reader import iter_docx_blocks, iter_pptx_slides  # DOCX/PPTX zip+iterparse 리더
+from worker_supervisor import SupervisedPool, Quarantine  # 파일 단위 예산 감시 워커
+from doc_records import DocRecordWriter, BLOCK_SEPARATOR, RECORD_EXT, COMPRESSED_EXT  # 구조화 중간 포맷
+from pdf_page_split import PageRange, SplitProbe, PageCount, probe_tasks, probe_pdf, task_file, RangeAssembler  # 대용량 PDF 페이지 범위 분할
+from pdf_ocr import PageOcr, ocr_available  # 스캔 페이지 OCR (pypdfium2/pytesseract 없으면 비활성)
+
+try:
+    import pypdfium2 as pdfium  # pip install pypdfium2 (고속 PDF 텍스트 엔진, 선택)
+except ImportError:
+    pdfium = None
+try:
+    import zstandard  # pip install zstandard (중간 포맷 압축, 선택)
+except ImportError:
+    zstandard = None
 
 # 1. 경로 설정
 SOURCE_DIR = Path(r"C:/Users/USER/Downloads/@@@인도네시아PDT암센터FS")
 OUTPUT_DIR = Path(r"C:/Users/USER/rag/src/data/text_converted")
 
+# 증분 변환 매니페스트 (표준 경로 → size/mtime/해시/출력 파일)
+MANIFEST_NAME = "_manifest_v4.json"
+CLEANUP_LIST_NAME = "_cleanup_v4.tsv"  # 로더가 .txt 로 읽지 않도록 확장자 분리
+DEDUP_TABLE_NAME = "_dedup_v4.json"    # 추출 텍스트가 같은 출력 그룹 (로더는 대표 1개만 임베딩)
+
+# 출력 포맷: jsonl(구조화 레코드, v5 로더) | txt(평문, v3/v4 로더 호환)
+OUTPUT_FORMAT = os.getenv("CONVERT_OUTPUT_FORMAT", "jsonl")
+# jsonl 압축: zstd 설치 시 .jsonl.zst 로 저장 (CONVERT_COMPRESS=zstd)
+OUTPUT_EXT = COMPRESSED_EXT if os.getenv("CONVERT_COMPRESS") == "zstd" and zstandard else RECORD_EXT
+MANIFEST_SAVE_INTERVAL = 200  # 중간 저장 주기 (파일 수)
+
+# 표 추출 사전 판정: 수직/수평 괘선(edge)이 각각 이 개수 미만이면 extract_tables 생략
+TABLE_MIN_EDGES = 2
+
+# PDF 텍스트 엔진: auto(pdfium 우선 + pdfplumber 폴백) | pdfplumber | pdfium
+PDF_TEXT_ENGINE = os.getenv("PDF_TEXT_ENGINE", "auto")
+FAST_ENGINE_MIN_CHARS = 50            # 고속 엔진 추출 글자 수가 이보다 적으면 폴백
+FAST_ENGINE_MAX_BROKEN_RATIO = 0.05   # 깨진 글자(U+FFFD, 사용자 정의 영역) 비율 상한
+PATH_LINE_MAX_WIDTH = 3.0             # pdfium 경로 객체를 괘선으로 볼 최대 두께(pt)
+ENGINE_REPORT_FILE = "pdf_engine_report_v4.txt"
+HWP_BENCH_REPORT_FILE = "hwp_benchmark_v4.txt"
+# [스캔 페이지 OCR] 본문 글자가 거의 없는 PDF 페이지만 렌더링 → OCR (Tesseract 설치 필요)
+OCR_ENABLED = os.getenv("CONVERT_OCR", "1") != "0"
+OCR_LANG = 'kor+eng'
+OCR_DPI = 300
+OCR_MIN_CHARS = 10                    # 추출 글자 수(공백 제외)가 이보다 적은 페이지만 OCR
+OCR_WORKERS = 2                       # 변환 워커당 동시 OCR 수 (tesseract 프로세스)
+OCR_CACHE_DB = OUTPUT_DIR.parent / "ocr_cache.sqlite3"  # DocumentProcessor 와 같은 캐시 (config.OCR_CACHE_DB)
+_BROKEN_CHARS = re.compile('[\ufffd\ue000-\uf8ff]')
+# HWP 벤치마크용 잡음 문자: 한글/ASCII/공백/일반 문장부호·기호 외 문자 (한자도 잡음 후보로 집계)
+_GARBAGE_CHARS = re.compile(
+    '[^\\s\x20-\x7e\u00a0-\u00ff\uac00-\ud7a3\u3131-\u318e\u2010-\u205e'
+    '\u2190-\u23ff\u2460-\u27bf\u3000-\u303f\uff01-\uff5e]'
+)
+
+# 병렬 변환 프로세스 수
+MAX_WORKERS = int(os.getenv("CONVERT_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+
+# [문서 내부 병렬] 이 페이지 수 이상 PDF 는 페이지 범위 작업으로 나눠 여러 워커가 추출 후 순서대로 재조립 (0: 분할 안 함)
+PDF_SPLIT_MIN_PAGES = int(os.getenv("CONVERT_PDF_SPLIT_PAGES", 300))
+PDF_SPLIT_RANGE_PAGES = 100       # 범위 작업 1개당 페이지 수
+
+# [감시 워커] 파일 단위 예산 (초과 시 워커 강제 종료 후 교체, 파일은 격리)
+FILE_TIME_BUDGET = 600            # 파일당 최대 변환 시간(초)
+FILE_MEMORY_BUDGET_MB = 2048      # 워커 RSS 상한 (psutil 설치 시 적용)
+WORKER_MAX_TASKS = 200            # 워커당 처리 파일 수 상한 (초과 시 재생성)
+QUARANTINE_NAME = "_quarantine_v4.json"
+QUARANTINE_BASE_DELAY = 24 * 3600        # 첫 재시도 대기 (이후 2배씩 증가)
+QUARANTINE_MAX_DELAY = 30 * 24 * 3600    # 재시도 대기 상한
+
 # 로그 설정
 logging.basicConfig(
     level=logging.INFO,
@@ -25,11 +97,162 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+def standardize_path(file_path):
+    """경로 표준화 (Windows 역슬래시를 슬래시로 통일, path_hash 입력값)"""
+    return str(Path(file_path).absolute()).replace('\\', '/')
+
+
+class ConversionManifest:
+    """
+    [증분 변환] 표준 경로 기준 원본 상태 기록
+    - size/mtime 일치 시 해시 계산 없이 즉시 스킵 (dict 조회 O(1))
+    - size/mtime 변경 시 내용 해시 비교 (touch만 된 파일은 재추출하지 않음)
+    """
+    def __init__(self, path=None):
+        self.path = path or OUTPUT_DIR / MANIFEST_NAME
+        self.entries = {}
+        self._unsaved = 0
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except Exception as e:
+                logger.error(f"❌ 매니페스트 로드 실패 (전체 재변환): {e}")
+
+    @staticmethod
+    def content_hash(file_path):
+        sha256 = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                sha256.update(block)
+        return sha256.hexdigest()
+
+    def _output_alive(self, entry):
+        # 내용이 비어 출력이 없던 파일은 그대로 스킵
+        return entry.get('output') is None or (OUTPUT_DIR / entry['output']).exists()
+
+    def check(self, file_path, standard_path):
+        """변경 여부 판정 → (재추출 필요 여부, 원본 상태)"""
+        stat = file_path.stat()
+        state = {'size': stat.st_size, 'mtime': stat.st_mtime}
+        entry = self.entries.get(standard_path)
+        if entry and entry['size'] == state['size'] and entry['mtime'] == state['mtime'] \
+                and self._output_alive(entry):
+            return False, state
+
+        state['sha256'] = self.content_hash(file_path)
+        if entry and entry.get('sha256') == state['sha256'] and self._output_alive(entry):
+            entry.update(size=state['size'], mtime=state['mtime'])
+            self._unsaved += 1
+            return False, state
+        return True, state
+
+    def record(self, standard_path, state, output_name, meta=None):
+        previous = self.entries.get(standard_path, {})
+        self.entries[standard_path] = {
+            'size': state['size'],
+            'mtime': state['mtime'],
+            # size/mtime 일치로 해시를 생략한 경우(전체 재변환) 기존 해시 유지
+            'sha256': state.get('sha256') or previous.get('sha256'),
+            'output': output_name,
+            'converted_at': datetime.now().isoformat(timespec='seconds'),
+            **(meta or {}),
+        }
+        self._unsaved += 1
+        if self._unsaved >= MANIFEST_SAVE_INTERVAL:
+            self.save()
+
+    def find_orphans(self, seen_paths):
+        """원본이 사라진 출력 파일 목록 (이미 지워진 출력은 매니페스트에서 제거)"""
+        orphans = []
+        for standard_path in [p for p in self.entries if p not in seen_paths]:
+            output = self.entries[standard_path].get('output')
+            if output and (OUTPUT_DIR / output).exists():
+                orphans.append((standard_path, output))
+            else:
+                del self.entries[standard_path]
+                self._unsaved += 1
+        return orphans
+
+    def build_dedup_table(self, previous=None):
+        """
+        [중복 제거] 추출 텍스트 해시가 같은 출력 그룹 → {출력 파일명: {canonical, text_hash, sources}}
+        - 대표(canonical)는 이전 테이블의 대표가 아직 그룹에 있으면 그대로 유지
+          (정렬상 앞서는 중복이 새로 생겨도 대표가 바뀌어 다시 임베딩되지 않도록)
+        - 새 그룹은 표준 경로가 가장 앞선 원본의 출력
+        - sources 는 그룹 내 모든 원본 표준 경로 (인용 시 전부 제시)
+        """
+        previous = previous or {}
+        groups = {}
+        for standard_path, entry in self.entries.items():
+            if entry.get('output') and entry.get('text_hash'):
+                groups.setdefault(entry['text_hash'], []).append((standard_path, entry['output']))
+
+        table = {}
+        for text_hash, members in groups.items():
+            if len(members) < 2:
+                continue
+            members.sort()
+            outputs = [output for _, output in members]
+            kept = [previous[output]['canonical'] for output in outputs if output in previous]
+            canonical = next((c for c in kept if c in outputs), outputs[0])
+            sources = [standard_path for standard_path, _ in members]
+            for _, output in members:
+                table[output] = {'canonical': canonical, 'text_hash': text_hash, 'sources': sources}
+        return table
+
+    def save(self):
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+        self._unsaved = 0
+
+
+def _fast_text_ok(text):
+    """고속 엔진 결과 품질 판정 (글자 수 부족/깨진 글자 과다 시 폴백)"""
+    stripped = text.strip()
+    if len(stripped) < FAST_ENGINE_MIN_CHARS:
+        return False
+    return len(_BROKEN_CHARS.findall(stripped)) / len(stripped) < FAST_ENGINE_MAX_BROKEN_RATIO
+
+
+def _pdfium_page_texts(file_path):
+    doc = pdfium.PdfDocument(str(file_path))
+    try:
+        for i in range(len(doc)):
+            page = doc[i]
+            textpage = page.get_textpage()
+            yield textpage.get_text_range().replace('\r\n', '\n')
+            textpage.close()
+            page.close()
+    finally:
+        doc.close()
+
+
+def _pdfplumber_page_texts(file_path):
+    with pdfplumber.open(file_path) as pdf:
+        for page in pdf.pages:
+            yield page.extract_text() or ""
+            page.close()
+
+
 class DocumentConverterV4:
     """
     [출처보완] 대용량 증분 처리 및 메타데이터 정밀 추출 버전
     """
-    def __init__(self):
+    def __init__(self, pdf_engine=PDF_TEXT_ENGINE, output_format=OUTPUT_FORMAT):
+        # 페이지 단위 시간 계측 (본문/표 판정/표 추출, 초 및 페이지 수)
+        self.timing = Counter()
+        # 파일 단위 추출 메타데이터 (PDF 엔진, 폴백 페이지 등 → 매니페스트 기록)
+        self.file_meta = {}
+        self.pdf_engine = pdf_engine
+        self.output_format = output_format
+        self._ocr = None  # 스캔 페이지 OCR 엔진 (첫 빈 페이지에서 생성, 사용 불가 시 False)
+        if pdf_engine != 'pdfplumber' and pdfium is None:
+            logger.warning("⚠️ pypdfium2 미설치: PDF 텍스트 엔진을 pdfplumber 로 대체합니다.")
+            self.pdf_engine = 'pdfplumber'
         if not OUTPUT_DIR.exists():
             OUTPUT_DIR.mkdir(parents=True)
             logger.info(f"📂 v4 출력 디렉토리 생성: {OUTPUT_DIR}")
@@ -47,104 +270,753 @@ class DocumentConverterV4:
                 markdown += "| " + " | ".join(["---"] * len(row)) + " |\n"
         return markdown + "\n"
 
+    def page_may_have_table(self, page):
+        """
+        표 추출 사전 판정 (extract_tables 기본 'lines' 전략 기준)
+        - 수직/수평 괘선이 각각 2개 이상 없으면 셀이 만들어지지 않으므로 생략
+        - 괘선 영역 안에 글자가 없으면 빈 표이므로 생략 (format_as_markdown 결과도 빈 값)
+        """
+        edges = page.edges  # lines + rects + curves 의 변 (extract_text 시 파싱된 객체 재사용)
+        v_edges = [e for e in edges if e['orientation'] == 'v']
+        h_edges = [e for e in edges if e['orientation'] == 'h']
+        if len(v_edges) < TABLE_MIN_EDGES or len(h_edges) < TABLE_MIN_EDGES:
+            return False
+
+        x0 = min(e['x0'] for e in v_edges)
+        x1 = max(e['x1'] for e in v_edges)
+        top = min(e['top'] for e in h_edges)
+        bottom = max(e['bottom'] for e in h_edges)
+        return any(
+            x0 <= (c['x0'] + c['x1']) / 2 <= x1 and top <= (c['top'] + c['bottom']) / 2 <= bottom
+            for c in page.chars
+        )
+
+    def pdfium_page_may_have_table(self, page, textpage=None):
+        """
+        page_may_have_table 의 pdfium 버전 (경로 객체 경계 상자로 괘선 추정)
+        - 가늘고 긴 선분(두께 PATH_LINE_MAX_WIDTH 이하)만 괘선으로 인정, 면이 있는 사각형/곡선
+          (장식 상자, 로고 테두리, 배경 패널)은 제외
+        - 같은 위치(1pt 단위)의 선분은 1개로 계산 (셀마다 따로 그린 테두리 중복 제거)
+        - 괘선 영역 안에 글자가 없으면 빈 표이므로 생략
+        """
+        v_lines = {}  # 반올림 x → (아래, 위)
+        h_lines = {}  # 반올림 y → (왼쪽, 오른쪽)
+        for obj in page.get_objects(filter=[pdfium.raw.FPDF_PAGEOBJ_PATH]):
+            left, bottom, right, top = obj.get_bounds()
+            width, height = right - left, top - bottom
+            if width <= PATH_LINE_MAX_WIDTH < height:
+                v_lines.setdefault(round((left + right) / 2), (bottom, top))
+            elif height <= PATH_LINE_MAX_WIDTH < width:
+                h_lines.setdefault(round((bottom + top) / 2), (left, right))
+        if len(v_lines) < TABLE_MIN_EDGES or len(h_lines) < TABLE_MIN_EDGES:
+            return False
+        if textpage is None:
+            return True
+
+        x0, x1 = min(v_lines), max(v_lines)
+        y0, y1 = min(h_lines), max(h_lines)
+        return bool(textpage.get_text_bounded(left=x0, bottom=y0, right=x1, top=y1).strip())
+
+    def _extract_pdfplumber_page(self, page):
+        """pdfplumber 페이지 추출: [본문, 마크다운 표...]"""
+        started = time.perf_counter()
+        blocks = [page.extract_text() or ""]
+        checked = time.perf_counter()
+        has_table = self.page_may_have_table(page)
+        extracted = time.perf_counter()
+        if has_table:
+            for table in page.extract_tables():
+                md_table = self.format_as_markdown(table)
+                if md_table.strip():
+                    blocks.append(md_table)
+        finished = time.perf_counter()
+
+        self.timing['pdf_pages'] += 1
+        self.timing['engine_pdfplumber'] += 1
+        self.timing['table_pages' if has_table else 'table_skipped'] += 1
+        self.timing['text_sec'] += checked - started
+        self.timing['table_check_sec'] += extracted - checked
+        self.timing['table_sec'] += finished - extracted
+        return blocks
+
+    def iter_pdf_pages(self, file_path, start=0, end=None):
+        """
+        PDF 페이지 단위 추출: 페이지마다 [본문, 마크다운 표...] 반환 후 페이지 캐시 해제
+        - start/end: [start, end) 페이지 범위만 추출 (대용량 PDF 분할 작업, 0부터 시작)
+        - 본문 글자가 거의 없는 (스캔) 페이지는 OCR 본문으로 교체
+        """
+        self.file_meta['pdf_engine'] = self.pdf_engine
+        if self.pdf_engine != 'pdfplumber':
+            pages = self._iter_pdf_pages_fast(file_path, start, end)
+        else:
+            pages = self._iter_pdf_pages_plumber(file_path, start, end)
+        yield from self._ocr_blank_pages(file_path, pages, start)
+
+    def _iter_pdf_pages_plumber(self, file_path, start=0, end=None):
+        with pdfplumber.open(file_path) as pdf:
+            self.file_meta['pages'] = len(pdf.pages)
+            for page in pdf.pages[start:end]:
+                try:
+                    yield self._extract_pdfplumber_page(page)
+                finally:
+                    # 페이지 객체/레이아웃 캐시 해제 → 문서 길이와 무관하게 메모리 일정
+                    page.close()
+
+    def _iter_pdf_pages_fast(self, file_path, start=0, end=None):
+        """
+        고속 엔진(pdfium) 우선 추출
+        - auto: 표 괘선이 있거나 품질 미달인 페이지만 pdfplumber 로 재추출
+        - 폴백 페이지 번호는 file_meta['pdf_fallback_pages'] 에 기록 (나머지는 pdfium)
+        """
+        fallback_pages = self.file_meta.setdefault('pdf_fallback_pages', [])
+        doc = pdfium.PdfDocument(str(file_path))
+        plumber_pdf = None
+        self.file_meta['pages'] = len(doc)
+        try:
+            for i in range(start, len(doc) if end is None else min(end, len(doc))):
+                started = time.perf_counter()
+                page = doc[i]
+                try:
+                    textpage = page.get_textpage()
+                    try:
+                        text = textpage.get_text_range().replace('\r\n', '\n')
+                        needs_layout = self.pdf_engine == 'auto' and self.pdfium_page_may_have_table(page, textpage)
+                    finally:
+                        textpage.close()
+                finally:
+                    page.close()
+                self.timing['fast_text_sec'] += time.perf_counter() - started
+
+                if self.pdf_engine == 'pdfium' or (not needs_layout and _fast_text_ok(text)):
+                    self.timing['pdf_pages'] += 1
+                    self.timing['engine_pdfium'] += 1
+                    yield [text]
+                    continue
+
+                if plumber_pdf is None:
+                    plumber_pdf = pdfplumber.open(file_path)
+                plumber_page = plumber_pdf.pages[i]
+                try:
+                    blocks = self._extract_pdfplumber_page(plumber_page)
+                finally:
+                    plumber_page.close()
+                fallback_pages.append(i + 1)
+                yield blocks
+        finally:
+            if plumber_pdf is not None:
+                plumber_pdf.close()
+            doc.close()
+
+    def _ocr_blank_pages(self, file_path, pages, start=0):
+        """
+        [스캔 페이지] 본문 글자가 OCR_MIN_CHARS 미만인 페이지는 렌더링 → OCR 본문으로 교체 (표 블록은 유지)
+        - 빈 페이지가 OCR_WORKERS × 2 개 모이면 한 번에 OCR (스레드 병렬), 그 사이 페이지와 함께 순서대로 반환
+        - OCR 한 페이지 번호는 file_meta['ocr_pages'] 에 기록
+        """
+        buffered, blank, skipped = [], [], 0
+        for i, blocks in enumerate(pages, start):
+            if len("".join(blocks[0].split())) < OCR_MIN_CHARS:
+                if self._get_ocr():
+                    blank.append(i)
+                else:
+                    skipped += 1
+            if not blank:
+                yield blocks
+                continue
+            buffered.append((i, blocks))
+            if len(blank) >= OCR_WORKERS * 2:
+                yield from self._ocr_buffered(file_path, buffered, blank)
+                buffered, blank = [], []
+        if blank:
+            yield from self._ocr_buffered(file_path, buffered, blank)
+        if skipped and OCR_ENABLED:
+            logger.warning(f"⚠️ 텍스트 없는 페이지 {skipped}개 OCR 생략 ({Path(file_path).name})")
+
+    def _ocr_buffered(self, file_path, buffered, blank):
+        """빈 페이지 OCR (페이지별 OCR 시간/캐시 적중 로그) → 버퍼 페이지를 순서대로 반환"""
+        name = Path(file_path).name
+        results = self._ocr.ocr_pages(file_path, blank)
+        ocr_pages = self.file_meta.setdefault('ocr_pages', [])
+        for i, blocks in buffered:
+            result = results.get(i)
+            if result is not None:
+                if result.cached:
+                    logger.info(f"🔎 OCR {name} p.{i + 1}: 캐시 적중 (원래 OCR {result.seconds:.2f}s, {len(result.text.strip())}자)")
+                    self.timing['ocr_cached'] += 1
+                else:
+                    logger.info(f"🔎 OCR {name} p.{i + 1}: {result.seconds:.2f}s ({len(result.text.strip())}자)")
+                    self.timing['ocr_sec'] += result.seconds
+                self.timing['ocr_pages'] += 1
+                if len(result.text.strip()) > len(blocks[0].strip()):
+                    blocks = [result.text] + blocks[1:]
+                    ocr_pages.append(i + 1)
+            yield blocks
+
+    def _get_ocr(self):
+        if self._ocr is None:
+            self._ocr = False
+            if OCR_ENABLED and ocr_available():
+                self._ocr = PageOcr(OCR_LANG, OCR_DPI, OCR_WORKERS, OCR_CACHE_DB)
+            elif OCR_ENABLED:
+                logger.warning("⚠️ pypdfium2/pytesseract/Tesseract 미설치: 스캔 페이지 OCR 비활성화")
+        return self._ocr
+
     def extract_pdf_smart(self, file_path):
-        """PDF 텍스트 및 표 추출"""
-        full_content = []
+        """PDF 텍스트 및 표 추출 (문서 전체를 문자열로 반환)"""
         try:
-            with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    text = page.extract_text() or ""
-                    full_content.append(text)
-                    tables = page.extract_tables()
-                    for table in tables:
-                        md_table = self.format_as_markdown(table)
-                        if md_table.strip():
-                            full_content.append(md_table)
-            return "\n".join(full_content)
+            return "\n".join(block for blocks in self.iter_pdf_pages(file_path) for block in blocks)
         except Exception as e:
             logger.error(f"❌ PDF 추출 실패: {e}")
             return ""
 
     def extract_hwp_text(self, file_path):
-        """HWP 텍스트 추출 (v4 깨짐 방지 로직)"""
+        """HWP 텍스트 추출 (레코드 단위 리더: PARA_TEXT 문단만)"""
         try:
-            f = olefile.OleFileIO(str(file_path))
-            dirs = f.listdir()
-            bodytext = [d for d in dirs if d[0].startswith("BodyText/Section")]
-            if not bodytext: bodytext = [d for d in dirs if d[0].startswith("BodyText")]
-                
-            full_text = ""
-            for section in bodytext:
-                data = f.openstream(section).read()
-                try:
-                    decompressed = zlib.decompress(data, -15)
-                except:
-                    decompressed = data
-                section_text = decompressed.decode('utf-16', errors='ignore')
-                full_text += "".join([c for c in section_text if ord(c) >= 32 or c in "\n\r\t"])
-            
-            f.close()
-            return re.sub(r'[^\w\s\.\,\?\!\(\)\[\]\%\:\-\d\uAC00-\uD7A3]+', ' ', full_text)
+            return "\n".join(iter_hwp_paragraphs(file_path))
         except Exception as e:
             logger.error(f"❌ HWP 추출 실패: {e}")
             return ""
 
-    def convert(self):
+    def _extract_hwp_text_legacy(self, file_path):
+        """[벤치마크 비교용] 기존 방식: 구역 전체 UTF-16 디코딩 후 문자 필터"""
+        f = olefile.OleFileIO(str(file_path))
+        dirs = f.listdir()
+        bodytext = [d for d in dirs if d[0].startswith("BodyText/Section")]
+        if not bodytext: bodytext = [d for d in dirs if d[0].startswith("BodyText")]
+
+        full_text = ""
+        for section in bodytext:
+            data = f.openstream(section).read()
+            try:
+                decompressed = zlib.decompress(data, -15)
+            except:
+                decompressed = data
+            section_text = decompressed.decode('utf-16', errors='ignore')
+            full_text += "".join([c for c in section_text if ord(c) >= 32 or c in "\n\r\t"])
+
+        f.close()
+        return re.sub(r'[^\w\s\.\,\?\!\(\)\[\]\%\:\-\d\uAC00-\uD7A3]+', ' ', full_text)
+
+    def benchmark_hwp(self, sample_size=20):
+        """[HWP 벤치마크] 기존 방식 vs 레코드 리더: 소요 시간, 출력 글자 수, 잡음 문자 수"""
+        hwps = sorted(p for p in SOURCE_DIR.rglob('*') if p.suffix.lower() == '.hwp' and not p.name.startswith("~$"))
+        sample = hwps[::max(1, len(hwps) // sample_size)][:sample_size]
+        logger.info(f"🔬 HWP 벤치마크 시작: {len(sample)}개 파일 (전체 HWP {len(hwps)}개)")
+
+        lines = [f"HWP 추출 벤치마크 ({datetime.now().isoformat(timespec='seconds')})", "=" * 80]
+        totals = Counter()
+        for file_path in sample:
+            try:
+                started = time.perf_counter()
+                legacy = self._extract_hwp_text_legacy(file_path)
+                legacy_sec = time.perf_counter() - started
+                started = time.perf_counter()
+                records = "\n".join(iter_hwp_paragraphs(file_path))
+                records_sec = time.perf_counter() - started
+            except Exception as e:
+                logger.error(f"❌ HWP 벤치마크 실패 ({file_path.name}): {e}")
+                continue
+
+            legacy_garbage = len(_GARBAGE_CHARS.findall(legacy))
+            records_garbage = len(_GARBAGE_CHARS.findall(records))
+            totals.update(files=1, legacy_sec=legacy_sec, records_sec=records_sec,
+                          legacy_chars=len(legacy), records_chars=len(records),
+                          legacy_garbage=legacy_garbage, records_garbage=records_garbage)
+            lines.append(
+                f"{file_path.name[:50]:<50} | 기존 {legacy_sec * 1000:>7.0f}ms {len(legacy):>8,}자 잡음 {legacy_garbage:>7,} | "
+                f"레코드 {records_sec * 1000:>7.0f}ms {len(records):>8,}자 잡음 {records_garbage:>7,}"
+            )
+
+        if not totals['files']:
+            logger.warning("비교할 HWP 가 없습니다")
+            return
+        summary = (
+            f"합계 {totals['files']}개 파일 | 기존 {totals['legacy_sec']:.2f}s (잡음 {totals['legacy_garbage']:,}/{totals['legacy_chars']:,}자) | "
+            f"레코드 {totals['records_sec']:.2f}s (잡음 {totals['records_garbage']:,}/{totals['records_chars']:,}자) | "
+            f"속도비 x{totals['legacy_sec'] / max(totals['records_sec'], 1e-9):.1f}"
+        )
+        lines += ["=" * 80, summary]
+        with open(HWP_BENCH_REPORT_FILE, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        logger.info(f"🔬 {summary}")
+        logger.info(f"✅ HWP 벤치마크 리포트 저장: {HWP_BENCH_REPORT_FILE}")
+
+    def iter_content(self, file_path, pdf_pages=None):
+        """
+        파일 타입별 추출 → 블록 dict {kind, text, page, anchor} 스트리밍
+        - PDF 는 페이지 단위, PPTX 는 슬라이드 단위 위치(page/anchor) 포함
+        - HWP/DOCX 는 문단·표 순서대로 (위치 정보 없음), TXT 는 문서 전체 1블록
+        - pdf_pages: 페이지 범위 작업 결과를 재조립한 페이지 목록 (지정 시 PDF 를 다시 열지 않음)
+        """
+        ext = file_path.suffix.lower()
+        if ext == '.pdf':
+            pages = self.iter_pdf_pages(file_path) if pdf_pages is None else pdf_pages
+            for page_no, blocks in enumerate(pages, 1):
+                # 첫 블록은 본문, 이후는 마크다운 표
+                anchor = f"Page {page_no}/{self.file_meta.get('pages', '?')}"
+                for i, block in enumerate(blocks):
+                    yield {'kind': 'table' if i else 'text', 'text': block, 'page': page_no, 'anchor': anchor}
+            return
+
+        if ext == '.hwp':
+            # 문단 단위 스트리밍 (구역 전체를 메모리에 올리지 않음)
+            for paragraph in iter_hwp_paragraphs(file_path):
+                yield {'kind': 'text', 'text': paragraph}
+            return
+
+        if ext == '.docx':
+            # 문단/표를 문서 순서대로 스트리밍
+            for kind, value in iter_docx_blocks(file_path):
+                if kind == 'table':
+                    yield {'kind': 'table', 'text': self.format_as_markdown(value)}
+                else:
+                    yield {'kind': 'text', 'text': value}
+            return
+
+        if ext == '.pptx':
+            # 슬라이드 순서대로 도형/표
+            for slide_no, total, slide in iter_pptx_slides(file_path):
+                anchor = f"Slide {slide_no}/{total}"
+                for kind, value in slide:
+                    text = self.format_as_markdown(value) if kind == 'table' else value
+                    yield {'kind': 'table' if kind == 'table' else 'text', 'text': text,
+                           'page': slide_no, 'anchor': anchor}
+            return
+
+        content = ""
+        if ext == '.txt':
+            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                content = f.read()
+        yield {'kind': 'text', 'text': content}
+
+    def convert_file(self, file_path, pdf_pages=None, pdf_meta=None):
+        """
+        단일 파일 추출 → 표준 포맷 저장 (저장된 출력 파일명, 내용 없으면 None, PDF/HWP 추출 실패 시 False)
+        - pdf_pages/pdf_meta: 대용량 PDF 분할 추출 결과 (assemble_pdf_ranges), 기록만 수행
+        """
+        self.file_meta = dict(pdf_meta or {})
+        # 1. 경로 표준화 (Windows 역슬래시를 슬래시로 통일하여 저장)
+        standard_path = standardize_path(file_path)
+
+        # 2. 고유 파일명 생성 (파일명 + 경로 해시 조합)
+        path_hash = hashlib.md5(standard_path.encode()).hexdigest()[:8]
+        safe_stem = re.sub(r'[^\w\s-]', '', file_path.stem).strip()[:40]
+        ext = OUTPUT_EXT if self.output_format == 'jsonl' else '.txt'
+        output_filename = f"{safe_stem}_{path_hash}{ext}"
+        output_path = OUTPUT_DIR / output_filename
+
+        # 3. 파일 저장
+        #    추출 블록(PDF 페이지)을 바로 기록하고, 내용이 있을 때만 임시 파일을 교체
+        #    - jsonl: 출처/위치/표 구분/추출 메타데이터를 담은 구조화 레코드 (v5 로더용)
+        #    - txt: "Source:" 헤더 + 본문 평문 (기존 로더 호환)
+        tmp_path = OUTPUT_DIR / f"{output_filename}.part"
+        has_content = False
+        text_hash = hashlib.sha256()  # [중복 제거] 본문(헤더 제외) 내용 해시
+        try:
+            if self.output_format == 'jsonl':
+                with DocRecordWriter(tmp_path, standard_path) as writer:
+                    for block in self._iter_output_blocks(file_path, text_hash, pdf_pages):
+                        writer.write_block(block['text'], block['kind'], block.get('page'), block.get('anchor'))
+                        has_content = has_content or bool(block['text'].strip())
+                    writer.write_meta({**self.file_meta, 'text_hash': text_hash.hexdigest()})
+            else:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(f"Source: {standard_path}\n")
+                    f.write("-" * 60 + "\n")
+                    for i, block in enumerate(self._iter_output_blocks(file_path, text_hash, pdf_pages)):
+                        if i:
+                            f.write(BLOCK_SEPARATOR)
+                        f.write(block['text'])
+                        has_content = has_content or bool(block['text'].strip())
+        except Exception as e:
+            tmp_path.unlink(missing_ok=True)
+            ext = file_path.suffix.lower()
+            if ext in {'.pdf', '.hwp'}:
+                # 추출 실패는 "내용 없음"과 구분 (매니페스트에 기록하지 않아 다음 실행에서 재시도, 이전 출력 유지)
+                logger.error(f"❌ {ext[1:].upper()} 추출 실패: {e}")
+                return False
+            raise
+
+        if not has_content:
+            tmp_path.unlink()
+            # 바뀐 원본이 이제 내용이 없으면 같은 이름의 이전 출력도 제거 (로더가 옛 내용을 계속 적재하지 않도록)
+            output_path.unlink(missing_ok=True)
+            return None
+        os.replace(tmp_path, output_path)
+        self.file_meta['text_hash'] = text_hash.hexdigest()
+        return output_filename
+
+    def _iter_output_blocks(self, file_path, text_hash, pdf_pages=None):
+        """추출 블록 용어 보정 + 본문 해시 갱신 (출력 포맷과 무관하게 동일한 본문 해시)"""
+        for i, block in enumerate(self.iter_content(file_path, pdf_pages)):
+            # 4. 용어 보정 (블록 단위)
+            block['text'] = re.sub(r'\bPDT\b', 'PDT(광역동 치료)', block['text'])
+            if i:
+                text_hash.update(BLOCK_SEPARATOR.encode('utf-8'))
+            text_hash.update(block['text'].encode('utf-8'))
+            yield block
+
+    def extract_pdf_range(self, task):
+        """[문서 내부 병렬] PageRange 작업 → 페이지별 블록 목록 (범위 메타데이터는 file_meta)"""
+        self.file_meta = {}
+        return list(self.iter_pdf_pages(task.file_path, task.start, task.end))
+
+    @staticmethod
+    def assemble_pdf_ranges(parts):
+        """시작 페이지 순 [(페이지 목록, 메타), ...] → (전체 페이지 목록, 파일 메타데이터)"""
+        pages = [blocks for range_pages, _ in parts for blocks in range_pages]
+        meta = dict(parts[0][1])
+        for key in ('pdf_fallback_pages', 'ocr_pages'):
+            if any(key in range_meta for _, range_meta in parts):
+                meta[key] = [page for _, range_meta in parts for page in range_meta.get(key, [])]
+        meta['pdf_split_ranges'] = len(parts)
+        return pages, meta
+
+    def convert(self, workers=1, incremental=True, supervised=True, split_pages=PDF_SPLIT_MIN_PAGES):
+        """
+        전체 변환
+        - supervised: 감시 워커 풀(workers 개)에서 파일 단위 시간/메모리 예산 적용
+          (False 면 현재 프로세스에서 순차 변환, 디버깅용)
+        - incremental: 매니페스트 기준 변경분만 변환
+        - split_pages: 이 페이지 수 이상 PDF 는 페이지 범위 작업으로 나눠 워커들이 병렬 추출 (0: 분할 안 함)
+        """
         target_exts = {'.pdf', '.docx', '.pptx', '.txt', '.hwp'}
         # 전체 경로 탐색
         all_files = [p for p in SOURCE_DIR.rglob('*') if p.suffix.lower() in target_exts]
-        
-        logger.info(f"🚀 [v4 출처보완] 총 {len(all_files)}개 파일 변환 시작...")
+        targets = [p for p in all_files if not p.name.startswith("~$")]
+
+        # [증분 변환] 변경 없는 파일 스킵, [격리] 재시도 대기 중인 파일 스킵
+        manifest = ConversionManifest()
+        quarantine = Quarantine(OUTPUT_DIR / QUARANTINE_NAME, QUARANTINE_BASE_DELAY, QUARANTINE_MAX_DELAY)
+        pending = {}
+        skipped = 0
+        quarantined = 0
+        for file_path in targets:
+            standard_path = standardize_path(file_path)
+            try:
+                changed, state = manifest.check(file_path, standard_path)
+            except OSError as e:
+                logger.error(f"❌ 파일 상태 확인 실패 ({file_path.name}): {e}")
+                continue
+            if not (changed or not incremental):
+                skipped += 1
+            elif quarantine.is_blocked(standard_path, state.get('sha256')):
+                quarantined += 1
+            else:
+                pending[file_path] = (standard_path, state)
+
+        # [문서 내부 병렬] 대용량 PDF → 페이지 범위 작업 여러 개 (워커 1개면 분할 이점 없음)
+        # 페이지 수 확인은 워커의 분할 판정 작업에서 (부모는 PDF 를 열지 않음: 예산/격리 밖 파싱 방지)
+        tasks = list(pending)
+        split = supervised and (workers or 1) > 1 and split_pages
+        if split:
+            tasks = probe_tasks(tasks, split_pages, PDF_SPLIT_RANGE_PAGES)
+
+        # 분할될 수 있는 PDF 가 있으면 파일 수보다 작업 수가 많아질 수 있어 워커 수를 줄이지 않음
+        if not (split and any(isinstance(task, SplitProbe) for task in tasks)):
+            workers = min(workers or 1, len(tasks) or 1)
+        workers = max(1, workers or 1)
+        mode = f"감시 워커 {workers}개" if supervised else "단일 프로세스"
+        logger.info(
+            f"🚀 [v4 출처보완] 총 {len(all_files)}개 파일 변환 시작... "
+            f"({mode}, 변경 없음 스킵: {skipped}개, 격리 대기: {quarantined}개)"
+        )
 
         success_count = 0
-        for idx, file_path in enumerate(all_files, 1):
+        emptied = []  # 바뀐 원본이 내용 없음이 되어 제거한 이전 출력 (적재된 청크 정리 대상)
+        if supervised:
+            results = self._convert_supervised(pending, workers, quarantine, tasks)
+        else:
+            results = self._convert_sequential(list(pending))
+        for idx, (file_path, output_name, meta) in enumerate(results, 1):
+            standard_path, state = pending[file_path]
+            # 출력 포맷 변경 등으로 파일명이 바뀐 경우 이전 출력 제거 (로더 중복 적재 방지)
+            previous = manifest.entries.get(standard_path, {}).get('output')
+            if previous and previous != output_name:
+                (OUTPUT_DIR / previous).unlink(missing_ok=True)
+                if output_name is None:
+                    emptied.append((standard_path, previous))
+            manifest.record(standard_path, state, output_name, meta)
+            if output_name:
+                success_count += 1
+                self._log_progress(idx, len(pending), file_path)
+
+        # 원본이 사라진 출력 파일은 삭제하지 않고 정리 목록만 기록
+        orphans = manifest.find_orphans({standardize_path(p) for p in targets})
+        if orphans or emptied:
+            with open(OUTPUT_DIR / CLEANUP_LIST_NAME, 'w', encoding='utf-8') as f:
+                for standard_path, output in orphans + emptied:
+                    f.write(f"{output}\t{standard_path}\n")
+        if orphans:
+            logger.warning(f"🧹 원본 삭제 감지: {len(orphans)}개 출력 파일 정리 필요 → {CLEANUP_LIST_NAME}")
+        if emptied:
+            logger.warning(f"🧹 내용 없어진 원본: 이전 출력 {len(emptied)}개 삭제, 적재 청크 정리 필요 → {CLEANUP_LIST_NAME}")
+        manifest.save()
+        self._save_dedup_table(manifest)
+
+        logger.info(f"🏁 v4 변환 완료! (성공: {success_count}/{len(all_files)}, 스킵: {skipped})")
+        self._log_timing()
+
+    def _save_dedup_table(self, manifest):
+        """[중복 제거] 동일 내용 출력 그룹을 로더용 테이블로 저장 (출력 파일은 모두 유지)"""
+        table_path = OUTPUT_DIR / DEDUP_TABLE_NAME
+        previous = {}
+        if table_path.exists():
+            try:
+                with open(table_path, 'r', encoding='utf-8') as f:
+                    previous = json.load(f)
+            except Exception as e:
+                logger.warning(f"⚠️ 이전 중복 테이블 로드 실패 (대표 새로 지정): {e}")
+        table = manifest.build_dedup_table(previous)
+        tmp_path = OUTPUT_DIR / f"{DEDUP_TABLE_NAME}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(table, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, table_path)
+
+        duplicates = sum(1 for output, entry in table.items() if entry['canonical'] != output)
+        if duplicates:
+            groups = len({entry['text_hash'] for entry in table.values()})
+            logger.info(f"🧬 동일 내용 문서: {groups}개 그룹, 임베딩 생략 대상 {duplicates}개 → {DEDUP_TABLE_NAME}")
+
+    def _convert_sequential(self, targets):
+        for file_path in targets:
             try:
-                if file_path.name.startswith("~$"): continue
-
-                ext = file_path.suffix.lower()
-                content = ""
-
-                # 파일 타입별 추출
-                if ext == '.pdf': content = self.extract_pdf_smart(file_path)
-                elif ext == '.docx':
-                    doc = Document(file_path)
-                    content = "\n".join([p.text for p in doc.paragraphs])
-                elif ext == '.hwp': content = self.extract_hwp_text(file_path)
-                elif ext == '.pptx':
-                    prs = Presentation(file_path)
-                    content = "\n".join([shape.text for slide in prs.slides for shape in slide.shapes if hasattr(shape, "text")])
-                elif ext == '.txt':
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        content = f.read()
-
-                if content.strip():
-                    # 1. 용어 보정
-                    content = re.sub(r'\bPDT\b', 'PDT(광역동 치료)', content)
-                    
-                    # 2. 경로 표준화 (Windows 역슬래시를 슬래시로 통일하여 저장)
-                    standard_path = str(file_path.absolute()).replace('\\', '/')
-                    
-                    # 3. 고유 파일명 생성 (파일명 + 경로 해시 조합)
-                    path_hash = hashlib.md5(standard_path.encode()).hexdigest()[:8]
-                    safe_stem = re.sub(r'[^\w\s-]', '', file_path.stem).strip()[:40]
-                    output_filename = f"{safe_stem}_{path_hash}.txt"
-                    output_path = OUTPUT_DIR / output_filename
-                    
-                    # 4. 파일 저장 (나중에 읽기 쉬운 표준 포맷)
-                    with open(output_path, 'w', encoding='utf-8') as f:
-                        f.write(f"Source: {standard_path}\n")
-                        f.write("-" * 60 + "\n")
-                        f.write(content)
-                    
-                    success_count += 1
-                    if idx % 10 == 0 or idx == len(all_files):
-                        logger.info(f"⏳ 진행 중: [{idx}/{len(all_files)}] {file_path.name} 완료")
-                
+                output_name = self.convert_file(file_path)
+                # 추출 실패(False)는 매니페스트에 기록하지 않음
+                if output_name is not False:
+                    yield file_path, output_name, self.file_meta
             except Exception as e:
                 logger.error(f"❌ 변환 에러 ({file_path.name}): {e}")
 
-        logger.info(f"🏁 v4 변환 완료! (성공: {success_count}/{len(all_files)})")
+    def _convert_supervised(self, pending, workers, quarantine, tasks=None):
+        """
+        [감시 워커] 워커별 파서 인스턴스 1개, 로그/결과는 부모에서 병합, 예산 초과 파일은 격리
+        - 분할 판정 작업(SplitProbe)이 페이지 수(PageCount)를 돌려주면 페이지 범위 작업을 대기열 앞에 추가
+          (작은 PDF 는 판정한 워커가 바로 변환, 판정 중 예산 초과도 파일 격리)
+        - 페이지 범위 작업(PageRange)은 파일의 모든 범위가 모이면 페이지 순서대로 재조립해 부모에서 기록
+          (범위 1개라도 예산 초과/실패하면 파일 전체를 실패로 처리)
+        """
+        pool = SupervisedPool(
+            _convert_in_worker, workers,
+            initializer=_init_worker, initargs=(self.pdf_engine, self.output_format),
+            time_budget=FILE_TIME_BUDGET, memory_budget_mb=FILE_MEMORY_BUDGET_MB,
+            max_tasks_per_worker=WORKER_MAX_TASKS,
+        )
+        assembler = RangeAssembler()
+        tasks = deque(pending if tasks is None else tasks)
+        for task, status, value in pool.imap_unordered(tasks):
+            file_path = task_file(task)
+            standard_path, state = pending[file_path]
+            is_range = isinstance(task, PageRange)
+            label = f"{file_path.name} p.{task.start + 1}-{task.end}" if is_range else file_path.name
+            if is_range and status != 'ok' and not assembler.fail(task):
+                continue  # 같은 파일의 다른 범위가 이미 실패 처리됨
+            if status in {'timeout', 'memory', 'crashed'}:
+                fingerprint = state.get('sha256') or ConversionManifest.content_hash(file_path)
+                quarantine.add(standard_path, value, fingerprint)
+                attempts = quarantine.entries[standard_path]['attempts']
+                logger.error(f"🚫 격리 ({label}): {value} (누적 {attempts}회, 워커 교체)")
+                continue
+            if status == 'error':
+                logger.error(f"❌ 변환 에러 ({label}): {value}")
+                continue
+
+            output_name, meta, records, timing = value
+            # 워커 로그를 메인 로그(conversion_log_v4.txt)로 병합
+            for level, message in records:
+                logger.log(level, message)
+            self.timing.update(timing)
+            if isinstance(output_name, PageCount):
+                parts = assembler.split(task, output_name, tasks)
+                logger.info(f"✂️ 대용량 PDF {file_path.name} ({output_name.total}페이지) → 페이지 범위 작업 {parts}개로 분할 추출")
+                continue
+            if is_range:
+                # 범위 결과(output_name 자리에 페이지 목록) 모으기 → 마지막 범위 도착 시 기록
+                if output_name is False:
+                    # 추출 실패: 단일 작업과 같이 매니페스트에 기록하지 않음 (다음 실행에서 재시도)
+                    assembler.fail(task)
+                    continue
+                parts = assembler.add(task, (output_name, meta))
+                if parts is None:
+                    continue
+                pages, meta = self.assemble_pdf_ranges(parts)
+                try:
+                    output_name = self.convert_file(file_path, pages, meta)
+                except Exception as e:
+                    logger.error(f"❌ 변환 에러 ({file_path.name}): {e}")
+                    continue
+                meta = self.file_meta
+            # 변환 에러(False)는 매니페스트에 기록하지 않아 다음 실행에서 재시도
+            if output_name is not False:
+                quarantine.release(standard_path)
+                yield file_path, output_name, meta
+
+    def _log_timing(self):
+        """PDF 페이지 단위 시간 계측 요약 (표 판정/추출 비용 확인용)"""
+        t = self.timing
+        if not t['pdf_pages']:
+            return
+        total_sec = t['text_sec'] + t['table_check_sec'] + t['table_sec']
+        table_share = (t['table_check_sec'] + t['table_sec']) / total_sec * 100 if total_sec else 0
+        logger.info(
+            f"📐 PDF {t['pdf_pages']}페이지 | 본문 {t['text_sec']:.1f}s | "
+            f"표 판정 {t['table_check_sec']:.1f}s | 표 추출 {t['table_sec']:.1f}s "
+            f"(실행 {t['table_pages']} / 생략 {t['table_skipped']}페이지) | "
+            f"표 비중 {table_share:.1f}% | 페이지당 {total_sec / t['pdf_pages'] * 1000:.0f}ms"
+        )
+        if t['engine_pdfium']:
+            logger.info(
+                f"⚡ PDF 엔진: pdfium {t['engine_pdfium']}페이지 ({t['fast_text_sec']:.1f}s) | "
+                f"pdfplumber 폴백 {t['engine_pdfplumber']}페이지"
+            )
+        if t['ocr_pages']:
+            ocr_run = t['ocr_pages'] - t['ocr_cached']
+            logger.info(
+                f"🔎 스캔 페이지 OCR: {t['ocr_pages']}페이지 (캐시 적중 {t['ocr_cached']}) | "
+                f"OCR {t['ocr_sec']:.1f}s | 페이지당 {t['ocr_sec'] / max(ocr_run, 1):.2f}s"
+            )
+
+    def compare_pdf_engines(self, sample_size=20):
+        """
+        [엔진 비교] pdfium vs pdfplumber 본문 추출 비교 리포트
+        - 파일별 문자/초, 페이지별 유사도(공백 정규화 후 difflib), 차이가 큰 페이지 diff 발췌
+        """
+        if pdfium is None:
+            logger.error("❌ pypdfium2 미설치: 엔진 비교를 건너뜁니다.")
+            return
+
+        pdfs = sorted(p for p in SOURCE_DIR.rglob('*') if p.suffix.lower() == '.pdf' and not p.name.startswith("~$"))
+        sample = pdfs[::max(1, len(pdfs) // sample_size)][:sample_size]
+        logger.info(f"🔬 PDF 엔진 비교 시작: {len(sample)}개 파일 (전체 PDF {len(pdfs)}개)")
+
+        lines = [f"PDF 엔진 비교 리포트 ({datetime.now().isoformat(timespec='seconds')})", "=" * 80]
+        totals = Counter()
+        worst_pages = []
+        for file_path in sample:
+            try:
+                started = time.perf_counter()
+                fast_pages = list(_pdfium_page_texts(file_path))
+                fast_sec = time.perf_counter() - started
+                started = time.perf_counter()
+                plumber_pages = list(_pdfplumber_page_texts(file_path))
+                plumber_sec = time.perf_counter() - started
+            except Exception as e:
+                logger.error(f"❌ 엔진 비교 실패 ({file_path.name}): {e}")
+                continue
+
+            ratios = []
+            for page_no, (fast, plumber) in enumerate(zip(fast_pages, plumber_pages), 1):
+                a, b = " ".join(fast.split()), " ".join(plumber.split())
+                ratio = difflib.SequenceMatcher(None, a, b).ratio() if (a or b) else 1.0
+                ratios.append(ratio)
+                worst_pages.append((ratio, file_path.name, page_no, a, b))
+
+            fast_chars = sum(len(t) for t in fast_pages)
+            plumber_chars = sum(len(t) for t in plumber_pages)
+            totals.update(files=1, pages=len(fast_pages), fast_chars=fast_chars, plumber_chars=plumber_chars,
+                          fast_sec=fast_sec, plumber_sec=plumber_sec)
+            lines.append(
+                f"{file_path.name[:50]:<50} | {len(fast_pages):>4}p | "
+                f"pdfium {fast_chars / max(fast_sec, 1e-9):>10,.0f}자/s | "
+                f"pdfplumber {plumber_chars / max(plumber_sec, 1e-9):>10,.0f}자/s | "
+                f"유사도 평균 {sum(ratios) / max(len(ratios), 1):.3f} 최저 {min(ratios, default=1.0):.3f}"
+            )
+
+        if not totals['files']:
+            logger.warning("비교할 PDF 가 없습니다")
+            return
+        summary = (
+            f"합계 {totals['files']}개 파일 / {totals['pages']}페이지 | "
+            f"pdfium {totals['fast_chars'] / max(totals['fast_sec'], 1e-9):,.0f}자/s | "
+            f"pdfplumber {totals['plumber_chars'] / max(totals['plumber_sec'], 1e-9):,.0f}자/s | "
+            f"속도비 x{totals['plumber_sec'] / max(totals['fast_sec'], 1e-9):.1f}"
+        )
+        lines += ["=" * 80, summary, "", "차이가 큰 페이지 (유사도 하위 10개)", "-" * 80]
+        worst_pages = [page for page in worst_pages if page[0] < 1.0]
+        for ratio, name, page_no, a, b in sorted(worst_pages, key=lambda x: x[0])[:10]:
+            lines.append(f"[{ratio:.3f}] {name} p.{page_no}")
+            diff = difflib.unified_diff(b.split(), a.split(), 'pdfplumber', 'pdfium', n=2, lineterm="")
+            lines += [f"    {d}" for d in list(diff)[:30]]
+
+        with open(ENGINE_REPORT_FILE, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        logger.info(f"🔬 {summary}")
+        logger.info(f"✅ 엔진 비교 리포트 저장: {ENGINE_REPORT_FILE}")
+
+    def _log_progress(self, idx, total, file_path):
+        if idx % 10 == 0 or idx == total:
+            logger.info(f"⏳ 진행 중: [{idx}/{total}] {file_path.name} 완료")
+
+
+# =========================================================
+# [감시 워커] 워커 프로세스당 변환기 1개
+# =========================================================
+_worker_converter = None
+_worker_records = []
+
+
+class _WorkerLogBuffer(logging.Handler):
+    """워커 로그를 모아 두었다가 결과와 함께 부모 프로세스로 전달"""
+    def emit(self, record):
+        _worker_records.append((record.levelno, f"[pid {os.getpid()}] {record.getMessage()}"))
+
+
+def _init_worker(pdf_engine=PDF_TEXT_ENGINE, output_format=OUTPUT_FORMAT):
+    global _worker_converter
+    # 워커는 로그 파일에 직접 쓰지 않음 (동시 쓰기 방지)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(_WorkerLogBuffer())
+    root.setLevel(logging.INFO)
+    _worker_converter = DocumentConverterV4(pdf_engine=pdf_engine, output_format=output_format)
+
+
+def _convert_in_worker(task):
+    _worker_records.clear()
+    if isinstance(task, PageRange):
+        # [문서 내부 병렬] 페이지 범위만 추출 → 첫 값은 출력 파일명 대신 페이지 목록 (기록은 부모)
+        try:
+            output_name = _worker_converter.extract_pdf_range(task)
+        except Exception as e:
+            logger.error(f"❌ PDF 추출 실패 ({task.file_path.name} p.{task.start + 1}-{task.end}): {e}")
+            output_name = False
+    else:
+        try:
+            # 분할 판정 작업: 큰 PDF 는 페이지 수만 반환, 나머지는 파일 작업과 같이 바로 변환
+            if isinstance(task, SplitProbe):
+                output_name = probe_pdf(task, _worker_converter.convert_file)
+            else:
+                output_name = _worker_converter.convert_file(task)
+        except Exception as e:
+            logger.error(f"❌ 변환 에러 ({task_file(task).name}): {e}")
+            output_name = False
+    # 워커 누적 계측값은 파일 단위로 넘기고 초기화
+    timing = dict(_worker_converter.timing)
+    _worker_converter.timing.clear()
+    return output_name, _worker_converter.file_meta, list(_worker_records), timing
+
 
 if __name__ == "__main__":
-    converter = DocumentConverterV4()
-    converter.convert()
+    parser = argparse.ArgumentParser(description="v4 문서 → 텍스트 변환기")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="병렬 변환 프로세스 수")
+    parser.add_argument("--full", action="store_true", help="매니페스트 무시하고 전체 재변환")
+    parser.add_argument("--no-watchdog", action="store_true", help="감시 워커 없이 현재 프로세스에서 순차 변환")
+    parser.add_argument("--pdf-engine", default=PDF_TEXT_ENGINE, choices=["auto", "pdfplumber", "pdfium"])
+    parser.add_argument("--pdf-split-pages", type=int, default=PDF_SPLIT_MIN_PAGES, metavar="N",
+                        help="N페이지 이상 PDF 는 페이지 범위로 나눠 병렬 추출 (0: 분할 안 함)")
+    parser.add_argument("--output-format", default=OUTPUT_FORMAT, choices=["jsonl", "txt"],
+                        help="jsonl: 구조화 중간 포맷(v5 로더) | txt: 평문(기존 로더)")
+    parser.add_argument("--compare-engines", type=int, metavar="N", help="PDF N개 표본으로 엔진 비교 리포트만 생성")
+    parser.add_argument("--bench-hwp", type=int, metavar="N", help="HWP N개 표본으로 추출 방식 벤치마크만 실행")
+    args = parser.parse_args()
+
+    converter = DocumentConverterV4(pdf_engine=args.pdf_engine, output_format=args.output_format)
+    if args.compare_engines:
+        converter.compare_pdf_engines(sample_size=args.compare_engines)
+    elif args.bench_hwp:
+        converter.benchmark_hwp(sample_size=args.bench_hwp)
+    else:
+        converter.convert(workers=args.workers, incremental=not args.full, supervised=not args.no_watchdog,
+                          split_pages=args.pdf_split_pages)
@@ -1,13 +1,21 @@
 import os
-import json
 import shutil
 import time
+import uuid
 import logging
+import sys
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime
+from pathlib import Path
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import Chroma
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from config import Settings  # 중앙 설정 참조
+sys.path.insert(0, str(Path(__file__).parent / 'embed'))
+from rate_limiter import TokenBucketLimiter, RateLimitedEmbeddings, make_token_estimator  # TPM/RPM 속도 제한
+from ingest_state import IngestState  # 적재 상태 저장소 (SQLite)
+sys.path.insert(0, str(Path(__file__).parent / 'parse'))
+from doc_records import is_record_file, read_doc_file  # 변환기 구조화 중간 포맷 (jsonl 기본 출력)
 
 # 1. 에러 로그 설정
 log_file_path = Settings.LOGS_DIR / f"loader_error_{datetime.now().strftime('%Y%m%d')}.log"
@@ -24,11 +32,49 @@ def get_db_status(vector_db):
     except Exception:
         return 0
 
+def doc_key(file_name):
+    """출력 포맷과 무관한 문서 키 (v5 로더와 같은 상태 저장소 공유: a_1234abcd.txt / .jsonl → a_1234abcd)"""
+    return file_name.split('.', 1)[0]
+
+def embed_batch(embeddings, batch_chunks, original_name):
+    """배치 1개 임베딩 → 벡터 목록 (Rate Limit 은 임베딩 래퍼가 대기/재시도, 토큰 초과 시 20개씩 재분할)"""
+    try:
+        # time.sleep(Settings.SLEEP_INTERVAL)  # 고정 대기 → 토큰 버킷 제한기로 대체
+        return embeddings.embed_documents(batch_chunks)
+    except Exception as e:
+        err_str = str(e)
+        if "400" in err_str or "max_tokens" in err_str:
+            # 100개도 크면 20개씩 더 잘게 쪼개서 재시도
+            now_time = datetime.now().strftime("%H:%M:%S")
+            print(f"\n[{now_time}] ⚠️ [Token Limit] {original_name} 재분할 임베딩 중...")
+            vectors = []
+            for j in range(0, len(batch_chunks), 20):
+                vectors.extend(embeddings.embed_documents(batch_chunks[j:j+20]))
+            return vectors
+        else:
+            raise e
+
+def write_batch(vector_db, batch_chunks, vectors, batch_metadatas):
+    """[단일 기록] 임베딩이 끝난 배치를 Chroma 에 추가 (메인 스레드에서만 호출, add_texts 와 같이 임의 ID)"""
+    vector_db._collection.add(
+        ids=[str(uuid.uuid4()) for _ in batch_chunks],
+        embeddings=vectors, metadatas=batch_metadatas, documents=batch_chunks,
+    )
+
 def process_and_save():
     db_path = str(Settings.CHROMA_DB_PATH)
-    state_file = Settings.BATCH_STATE_FILE
+    state_file = Settings.BATCH_STATE_FILE  # 기존 JSON 상태 (최초 1회 가져오기)
+    state_db = Settings.INGEST_STATE_DB
     input_dir = Settings.DATA_DIR / "text_converted"
-    embeddings = OpenAIEmbeddings(model=Settings.EMBEDDING_MODEL)
+    # embeddings = OpenAIEmbeddings(model=Settings.EMBEDDING_MODEL)
+    # [속도 제한] TPM/RPM 토큰 버킷 + 429 retry-after 대기, 연결/타임아웃/5xx 백오프 (재시도는 래퍼가 모두 담당하므로 클라이언트 재시도 끔)
+    limiter = TokenBucketLimiter(Settings.EMBED_API_TPM, Settings.EMBED_API_RPM)
+    embeddings = RateLimitedEmbeddings(
+        OpenAIEmbeddings(model=Settings.EMBEDDING_MODEL, max_retries=0),
+        limiter,
+        make_token_estimator(Settings.EMBEDDING_MODEL),
+        max_retries=Settings.EMBED_API_MAX_RETRIES,
+    )
     
     # [초기화 절차]
     if Settings.RESET_DB:
@@ -38,6 +84,9 @@ def process_and_save():
             shutil.rmtree(db_path)
         if os.path.exists(state_file):
             os.remove(state_file)
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(f"{state_db}{suffix}"):
+                os.remove(f"{state_db}{suffix}")
         print(f"[{now}] 🗑️  DB 및 상태 파일 삭제 완료.")
 
     # 2. 벡터 DB 연결
@@ -49,14 +98,16 @@ def process_and_save():
 
     # 3. 상태 확인 (이어넣기용)
     initial_count = get_db_status(vector_db)
-    processed_files = set()
-    if not Settings.RESET_DB and os.path.exists(state_file):
-        with open(state_file, "r", encoding="utf-8") as f:
-            processed_files = set(json.load(f))
+    # [상태 저장소] 파일 단위 원자적 기록 (파일마다 JSON 전체를 다시 쓰지 않음, 기존 JSON 목록은 처음 한 번만 가져옴)
+    state = IngestState(state_db)
+    if len(state) == 0 and not Settings.RESET_DB:
+        imported = state.import_json(state_file, doc_key)
+        if imported:
+            print(f"📥 기존 상태 파일 가져오기: {imported}건 ({state_file.name} → {state_db.name})")
 
     # 4. 대상 파일 목록 추출
-    all_files = [f for f in os.listdir(input_dir) if f.endswith(".txt")]
-    files_to_process = [f for f in all_files if f not in processed_files]
+    all_files = [f for f in os.listdir(input_dir) if f.endswith(".txt") or is_record_file(f)]
+    files_to_process = [f for f in all_files if doc_key(f) not in state]
     total_files = len(files_to_process)
     
     print(f"\n📊 [DB 현황] 기존 데이터: {initial_count}건")
@@ -70,27 +121,82 @@ def process_and_save():
     )
 
     # 5. 메인 처리 루프
+    # [동시 요청] 배치 임베딩을 워커 스레드로 동시에 요청 (속도는 제한기가 TPM/RPM 한도 안으로 조절)
+    #   Chroma 기록/상태 기록/진행 보고는 파일의 모든 배치 임베딩이 끝난 뒤 메인 스레드에서만 수행 (단일 기록자)
     total_added_chunks = 0
     batch_display_size = 20 # 20개 파일마다 보고
-    
+    chunk_batch_size = 100
+    executor = ThreadPoolExecutor(max_workers=Settings.EMBED_API_CONCURRENCY)
+    pending = {}  # 파일명 → (배치 future 목록, 청크 목록, 메타데이터 목록, 원본 파일명, 순번) (제출 순서 유지)
+    started_at = time.perf_counter()
+
+    def finish_file(file_name):
+        nonlocal total_added_chunks
+        futures, chunks, metadatas, original_name, idx = pending.pop(file_name)
+        num_chunks = len(chunks)
+        now_time = datetime.now().strftime("%H:%M:%S")
+        try:
+            for i, future in zip(range(0, num_chunks, chunk_batch_size), futures):
+                write_batch(vector_db, chunks[i : i + chunk_batch_size], future.result(),
+                            metadatas[i : i + chunk_batch_size])
+        except Exception as e:
+            err_msg = f"실패: {file_name} | 이유: {str(e)}"
+            print(f"\n[{now_time}] ❌ {err_msg}")
+            logging.error(err_msg)
+            return
+
+        # 상태 업데이트 (파일 1건 트랜잭션)
+        total_added_chunks += num_chunks
+        state.mark_done([(doc_key(file_name), file_name, num_chunks)])
+
+        # 진행 보고
+        if num_chunks >= 50: # 대형 파일 기준 상향
+            print(f"\n[{now_time}] 🐘 [대형] ({idx}/{total_files}) {original_name} (청크: {num_chunks}개)")
+
+        if idx % batch_display_size == 0:
+            print(f"\n[{now_time}] 📦 [배치] {idx}/{total_files} 파일 완료 (누적 청크: {total_added_chunks})")
+        else:
+            print(f"\r[{now_time}] ({idx}/{total_files}) 처리 중: {original_name[:25]}...", end="")
+
+    def finish_ready(block=False):
+        """모든 배치가 끝난 파일 마무리 (block: 진행 중 배치가 하나라도 끝날 때까지 대기)"""
+        if block:
+            running = [f for futures, *_ in pending.values() for f in futures if not f.done()]
+            if running:
+                wait(running, return_when=FIRST_COMPLETED)
+        for file_name in [name for name, (futures, *_) in pending.items() if all(f.done() for f in futures)]:
+            finish_file(file_name)
+
+    def in_flight():
+        return sum(1 for futures, *_ in pending.values() for f in futures if not f.done())
+
     for idx, file_name in enumerate(files_to_process, 1):
         file_path = os.path.join(input_dir, file_name)
         now_time = datetime.now().strftime("%H:%M:%S")
         
         try:
-            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                full_content = f.read()
-            
-            lines = full_content.split('\n')
-            
-            # 출처 복원 및 본문 정제
-            if lines and lines[0].startswith("Source:"):
-                full_source_path = lines[0].replace("Source:", "").strip()
-                original_name = full_source_path.replace('\\', '/').split('/')[-1]
-                content_body = "\n".join(lines[2:]).strip()
+            if is_record_file(file_name):
+                # [구조화 중간 포맷] 출처/본문을 레코드에서 바로 읽음
+                full_source_path, content_body, _, _ = read_doc_file(file_path)
+                if full_source_path:
+                    original_name = full_source_path.replace('\\', '/').split('/')[-1]
+                else:
+                    original_name = file_name.rsplit('_', 1)[0]
+                content_body = content_body.strip()
             else:
-                original_name = file_name.rsplit('_', 1)[0]
-                content_body = full_content
+                with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+                    full_content = f.read()
+                
+                lines = full_content.split('\n')
+                
+                # 출처 복원 및 본문 정제
+                if lines and lines[0].startswith("Source:"):
+                    full_source_path = lines[0].replace("Source:", "").strip()
+                    original_name = full_source_path.replace('\\', '/').split('/')[-1]
+                    content_body = "\n".join(lines[2:]).strip()
+                else:
+                    original_name = file_name.rsplit('_', 1)[0]
+                    content_body = full_content
 
             # 청크 생성
             chunks = text_splitter.split_text(content_body)
@@ -98,59 +204,37 @@ def process_and_save():
             metadatas = [{Settings.META_SOURCE_KEY: original_name} for _ in range(num_chunks)]
 
             # ---------------------------------------------------------
-            # [핵심] 분할 적재 로직 - 100개씩 끊어서 전송
+            # [핵심] 분할 적재 로직 - 100개씩 끊어서 전송 (배치별 동시 임베딩, 기록은 finish_file)
             # ---------------------------------------------------------
-            chunk_batch_size = 100 
-            for i in range(0, num_chunks, chunk_batch_size):
-                batch_chunks = chunks[i : i + chunk_batch_size]
-                batch_metadatas = metadatas[i : i + chunk_batch_size]
-                
-                success = False
-                while not success:
-                    try:
-                        vector_db.add_texts(texts=batch_chunks, metadatas=batch_metadatas)
-                        time.sleep(Settings.SLEEP_INTERVAL)
-                        success = True
-                    except Exception as e:
-                        err_str = str(e)
-                        if "429" in err_str or "Rate limit" in err_str:
-                            print(f"\n[{now_time}] ⏳ [Rate Limit] 15초 대기... ({idx}/{total_files})")
-                            time.sleep(15)
-                        elif "400" in err_str or "max_tokens" in err_str:
-                            # 100개도 크면 20개씩 더 잘게 쪼개서 재시도
-                            print(f"\n[{now_time}] ⚠️ [Token Limit] {original_name} 재분할 적재 중...")
-                            for j in range(0, len(batch_chunks), 20):
-                                vector_db.add_texts(texts=batch_chunks[j:j+20], metadatas=batch_metadatas[j:j+20])
-                                time.sleep(Settings.SLEEP_INTERVAL)
-                            success = True
-                        else:
-                            raise e
-
-            # 상태 업데이트
-            total_added_chunks += num_chunks
-            processed_files.add(file_name)
-            with open(state_file, "w", encoding="utf-8") as f:
-                json.dump(list(processed_files), f, ensure_ascii=False, indent=4)
-            
-            # 진행 보고
-            if num_chunks >= 50: # 대형 파일 기준 상향
-                print(f"\n[{now_time}] 🐘 [대형] ({idx}/{total_files}) {original_name} (청크: {num_chunks}개)")
-            
-            if idx % batch_display_size == 0:
-                print(f"\n[{now_time}] 📦 [배치] {idx}/{total_files} 파일 완료 (누적 청크: {total_added_chunks})")
-            else:
-                print(f"\r[{now_time}] ({idx}/{total_files}) 처리 중: {original_name[:25]}...", end="")
+            futures = [
+                executor.submit(embed_batch, embeddings, chunks[i : i + chunk_batch_size], original_name)
+                for i in range(0, num_chunks, chunk_batch_size)
+            ]
+            pending[file_name] = (futures, chunks, metadatas, original_name, idx)
 
         except Exception as e:
             err_msg = f"실패: {file_name} | 이유: {str(e)}"
             print(f"\n[{now_time}] ❌ {err_msg}")
             logging.error(err_msg)
 
+        # 대기 배치가 동시 요청 수의 2배를 넘으면 읽기를 멈추고 완료를 기다림 (메모리 상한)
+        finish_ready()
+        while in_flight() > Settings.EMBED_API_CONCURRENCY * 2:
+            finish_ready(block=True)
+
+    while pending:
+        finish_ready(block=True)
+    executor.shutdown()
+    state.close()
+    wall = time.perf_counter() - started_at
+
     # 6. 최종 결과
     final_count = get_db_status(vector_db)
     print("\n\n" + "="*60)
     print("🏁 모든 데이터 적재 완료")
     print(f"📈 DB 청크 변화: {initial_count} -> {final_count} (증분: {total_added_chunks})")
+    print(f"⏱️ 처리량: {total_added_chunks / wall if wall else 0:.1f} 청크/s ({wall:.1f}s, 동시 요청 {Settings.EMBED_API_CONCURRENCY}개)")
+    print(f"🚦 {limiter.stats_line()}")
     print(f"📄 에러 로그: {log_file_path}")
     print("="*60)
 
@@ -4,14 +4,30 @@ import shutil
 import time
 import logging
 import re
+import sys
+import queue
+import argparse
+import threading
+import hashlib
+from pathlib import Path
 from datetime import datetime
 # [2026-01-31 성진 추가 정의] 로컬 임베딩용 라이브러리 추가
 from langchain_huggingface import HuggingFaceEmbeddings
 # [기존 유지]
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import Chroma
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from config import Settings  # 모든 상수는 여기서 참조
+sys.path.insert(0, str(Path(__file__).parent / 'parse'))
+from doc_records import is_record_file, read_doc_file  # 변환기 구조화 중간 포맷
+from doc_structure import detect_headings, section_at, span_segments, chunk_segments, get_tokenizer  # 구조 인식 청크 (페이지 경계/제목)
+sys.path.insert(0, str(Path(__file__).parent / 'embed'))
+from ingest_state import IngestState  # 적재 상태 저장소 (SQLite)
+from ingest_pipeline import Stage, DONE, iter_queue  # 단계별 스레드 파이프라인
+from chunk_ids import make_chunk_id  # 결정적 청크 ID
+from embedding_cache import CachedEmbeddings, cache_namespace  # 디스크 임베딩 캐시
+from length_buckets import LengthBucketedEmbeddings, make_token_counter, benchmark_buckets  # 길이 버킷 배치
+from sharded_embeddings import ShardedEmbeddings, resolve_device, auto_shard_count  # CPU 다중 프로세스 임베딩
+from onnx_embeddings import OnnxEmbeddings, export_onnx, onnx_available, onnx_model_path, parity_check  # ONNX/int8 백엔드
 
 # 1. 에러 로그 설정
 log_file_path = Settings.LOGS_DIR / f"loader_error_{datetime.now().strftime('%Y%m%d')}.log"
@@ -28,9 +44,432 @@ def get_db_status(vector_db):
     except Exception:
         return 0
 
-def process_and_save():
+def load_dedup_table(input_dir):
+    """[중복 제거] 변환기가 남긴 동일 내용 테이블 (없으면 빈 dict)"""
+    table_path = input_dir / Settings.DEDUP_TABLE_NAME
+    if not table_path.exists():
+        return {}
+    try:
+        with open(table_path, "r", encoding=Settings.ENCODING) as f:
+            return json.load(f)
+    except Exception as e:
+        logging.error(f"중복 테이블 로드 실패: {e}")
+        return {}
+
+def load_text_hashes(input_dir):
+    """[중복 제거] 변환 매니페스트의 출력 파일명 → text_hash (txt 는 본문을 다시 해시하면 변환기와 달라질 수 있음)"""
+    manifest_path = input_dir / Settings.CONVERT_MANIFEST_NAME
+    if not manifest_path.exists():
+        return {}
+    try:
+        with open(manifest_path, "r", encoding=Settings.ENCODING) as f:
+            manifest = json.load(f)
+    except Exception as e:
+        logging.error(f"변환 매니페스트 로드 실패: {e}")
+        return {}
+    return {entry['output']: entry['text_hash'] for entry in manifest.values()
+            if entry.get('output') and entry.get('text_hash')}
+
+def doc_key(file_name):
+    """출력 포맷과 무관한 문서 키 (a_1234abcd.txt / .jsonl / .jsonl.zst → a_1234abcd)"""
+    return file_name.split('.', 1)[0]
+
+def read_converted(file_path, file_name):
+    """
+    변환 출력 읽기 → (출처 경로, 원본 파일명, 본문, 위치 구간, 추출 메타데이터)
+    - jsonl: 레코드를 그대로 스트리밍 (출처/페이지/슬라이드 위치 포함)
+    - txt: "Source:" 줄 파싱 (위치 정보 없음)
+    """
+    if is_record_file(file_name):
+        source_path, body, spans, extract_meta = read_doc_file(file_path)
+        original_name = source_path.replace('\\', '/').split('/')[-1] if source_path else doc_key(file_name).rsplit('_', 1)[0]
+        return source_path, original_name, body, spans, extract_meta
+
+    with open(file_path, "r", encoding=Settings.ENCODING, errors=Settings.FILE_ERRORS_STRATEGY) as f:
+        full_content = f.read()
+    lines = full_content.split('\n')
+    # 출처 복원 및 본문 정제
+    if lines and lines[0].startswith("Source:"):
+        full_source_path = lines[0].replace("Source:", "").strip()
+        original_name = full_source_path.replace('\\', '/').split('/')[-1]
+        return full_source_path, original_name, "\n".join(lines[2:]), [], {}
+    return None, file_name.rsplit('_', 1)[0], full_content, [], {}
+
+def settle_duplicate_groups(vector_db, dedup_table, state):
+    """
+    [중복 제거] 그룹 대표를 이미 적재된 출력으로 고정하고 중복 적재분 정리 → 정리한 그룹 수
+    - 적재(또는 일부 적재)된 구성원이 있으면 그 출력이 대표 (정렬 순서가 바뀌어도 다시 임베딩하지 않음)
+    - 구성원 2개 이상 적재됨 (중복 테이블 이전 적재 등): 그룹 해시 벡터 삭제 + 상태 해제 → 대표만 다시 적재
+    - 적재된 구성원이 없는데 그룹 해시 벡터가 남음 (이전 대표 원본 삭제): 남은 벡터 삭제 후 새 대표 적재
+    """
+    groups = {}
+    for file_name, entry in dedup_table.items():
+        groups.setdefault(entry['text_hash'], []).append(file_name)
+
+    purged = 0
+    for text_hash, members in groups.items():
+        where = {Settings.META_CONTENT_HASH_KEY: text_hash}
+        ingested = sorted(f for f in members if doc_key(f) in state or state.get_progress(doc_key(f)))
+        if not ingested:
+            if vector_db._collection.get(where=where, limit=1, include=[])["ids"]:
+                vector_db._collection.delete(where=where)
+                purged += 1
+            continue
+        canonical = dedup_table[members[0]]['canonical']
+        if canonical not in ingested:
+            canonical = ingested[0]
+            for f in members:
+                dedup_table[f]['canonical'] = canonical
+        if len(ingested) > 1:
+            vector_db._collection.delete(where=where)
+            state.discard(doc_key(f) for f in ingested)
+            purged += 1
+    return purged
+
+def sync_duplicate_sources(vector_db, dedup_table, state):
+    """이미 적재된 대표 문서의 sources 메타데이터를 최신 중복 그룹으로 갱신 (임베딩 재계산 없음)"""
+    updated = 0
+    for file_name, entry in dedup_table.items():
+        if entry['canonical'] != file_name or doc_key(file_name) not in state:
+            continue
+        sources = " | ".join(entry['sources'])
+        where = {Settings.META_CONTENT_HASH_KEY: entry['text_hash']}
+        first = vector_db._collection.get(where=where, limit=1, include=["metadatas"])
+        if not first["ids"] or first["metadatas"][0].get(Settings.META_SOURCES_KEY) == sources:
+            continue
+        stored = vector_db._collection.get(where=where, include=["metadatas"])
+        for meta in stored["metadatas"]:
+            meta[Settings.META_SOURCES_KEY] = sources
+        vector_db._collection.update(ids=stored["ids"], metadatas=stored["metadatas"])
+        updated += 1
+    return updated
+
+class CrossFileBatcher:
+    """
+    [교차 파일 배치] 여러 파일의 청크를 고정 크기 임베딩 배치로 모아 sink 로 전달
+    - 청크 수(max_chunks) 또는 토큰 예산(max_tokens) 도달 시 flush
+    - 파일은 모든 청크가 기록(complete)된 뒤에만 완료로 반환 (대형 파일은 여러 배치에 걸쳐 기록)
+    - 적재 실패(fail) 시 해당 배치에 포함된 파일은 실패 처리, 남은 청크도 버림
+    - sink(ids, texts, metadatas, owners): 즉시 기록 후 완료 목록 반환(순차) 또는 큐에 넣고 [] 반환(파이프라인)
+    - [청크 구간 체크포인트] checkpoint 파일은 배치 기록마다 on_progress([(파일, 기록 청크 수, 전체 청크 수)]) 호출
+      (배치는 순서대로 기록되므로 기록 청크 수 = 앞에서부터 연속 구간)
+    - 실패 처리된 파일은 on_fail([파일, ...]) 로 알림 (호출 측 파일별 상태 정리)
+    """
+    def __init__(self, sink, max_chunks, max_tokens=None, count_tokens=len, on_progress=None, on_fail=None):
+        self.sink = sink
+        self.on_progress = on_progress
+        self.on_fail = on_fail
+        self.max_chunks = max_chunks
+        self.max_tokens = max_tokens
+        self.count_tokens = count_tokens
+        self.ids, self.texts, self.metadatas, self.owners = [], [], [], []
+        self.tokens = 0
+        self.remaining = {}  # 파일 → 아직 기록되지 않은 청크 수
+        self.written = {}    # 파일 → 기록된 청크 수
+        self.failed = {}     # 파일 → 실패 사유
+        self.totals = {}     # 체크포인트 대상 파일 → 전체 청크 수
+        self.batch_count = 0
+        self._lock = threading.Lock()  # 파이프라인: 배치 조립(메인)과 기록 완료(writer) 스레드 공유
+
+    def add_file(self, file_name, chunks, metadatas, ids, skip=0, checkpoint=False):
+        """
+        파일 청크를 배치에 추가 → 이번 호출 중 완료된 [(파일, 청크 수)]
+        - skip: 이전 실행에서 이미 기록된 앞부분 청크 수 (체크포인트 재개)
+        - checkpoint: 배치 기록마다 진행 상황을 on_progress 로 알림 (대형 파일)
+        """
+        if len(chunks) <= skip:
+            return [(file_name, len(chunks))]
+        done = []
+        with self._lock:
+            self.remaining[file_name] = len(chunks) - skip
+            self.written[file_name] = skip
+            if checkpoint:
+                self.totals[file_name] = len(chunks)
+        for chunk_id, text, meta in zip(ids[skip:], chunks[skip:], metadatas[skip:]):
+            if file_name in self.failed:
+                break
+            tokens = self.count_tokens(text) if self.max_tokens else 0
+            if self.texts and self.max_tokens and self.tokens + tokens > self.max_tokens:
+                done += self.flush()
+            self.ids.append(chunk_id)
+            self.texts.append(text)
+            self.metadatas.append(meta)
+            self.owners.append(file_name)
+            self.tokens += tokens
+            if len(self.texts) >= self.max_chunks:
+                done += self.flush()
+        return done
+
+    def flush(self):
+        """모인 청크를 sink 로 전달 → (순차 모드) 완료된 [(파일, 청크 수)]"""
+        if not self.texts:
+            return []
+        batch = (self.ids, self.texts, self.metadatas, self.owners)
+        self.ids, self.texts, self.metadatas, self.owners = [], [], [], []
+        self.tokens = 0
+        return self.sink(*batch) or []
+
+    def complete(self, owners):
+        """배치 기록 완료 → 마지막 청크까지 기록된 [(파일, 청크 수)]"""
+        done = []
+        progress = []
+        with self._lock:
+            self.batch_count += 1
+            for file_name in owners:
+                if file_name not in self.remaining:
+                    continue
+                self.remaining[file_name] -= 1
+                self.written[file_name] += 1
+                if self.remaining[file_name] == 0:
+                    del self.remaining[file_name]
+                    self.totals.pop(file_name, None)
+                    done.append((file_name, self.written.pop(file_name)))
+            for file_name in dict.fromkeys(owners):
+                if file_name in self.totals and file_name in self.remaining:
+                    progress.append((file_name, self.written[file_name], self.totals[file_name]))
+        if progress and self.on_progress:
+            self.on_progress(progress)
+        return done
+
+    def fail(self, owners, error):
+        """배치 임베딩/기록 실패 → 포함된 파일 전체 실패 처리"""
+        failed = list(dict.fromkeys(owners))
+        with self._lock:
+            for file_name in failed:
+                self.failed[file_name] = str(error)
+                self.remaining.pop(file_name, None)
+                self.written.pop(file_name, None)
+                self.totals.pop(file_name, None)
+                err_msg = f"실패: {file_name} | 이유: 배치 적재 오류 {error}"
+                print(f"\n❌ {err_msg}")
+                logging.error(err_msg)
+        if self.on_fail:
+            self.on_fail(failed)
+
+def prepare_chunks(file_name, parsed, tokenizer, dedup_table, text_hashes=None):
+    """[분할 단계] 읽은 본문 → (원본 파일명, 청크 목록, 청크별 메타데이터, 청크 ID)"""
+    full_source_path, original_name, content_body, spans, extract_meta = parsed
+
+    # [중복 제거] 변환기가 기록한 본문 해시 (헤더 제외) → 그룹 식별용 메타데이터
+    # (매니페스트가 없는 예전 출력만 본문을 다시 해시)
+    dedup_entry = dedup_table.get(file_name)
+    content_hash = extract_meta.get('text_hash') or (dedup_entry or {}).get('text_hash') or \
+        (text_hashes or {}).get(file_name) or \
+        hashlib.sha256(content_body.encode(Settings.ENCODING)).hexdigest()
+    all_sources = " | ".join(dedup_entry['sources']) if dedup_entry else full_source_path
+
+    # [구조 인식 청크] DocumentProcessor 와 같은 분할: 페이지/슬라이드 구간을 넘지 않고 모델 토큰 수 기준,
+    # 제목 > 빈 줄 > 줄바꿈 경계에서 자름 → 청크가 여러 페이지에 걸쳐 인용 페이지가 틀리는 일 없음
+    headings = detect_headings(content_body)
+    heading_starts = [offset for offset, _ in headings]
+    chunk_list = chunk_segments(span_segments(content_body, spans), Settings.CHUNK_SIZE, Settings.CHUNK_OVERLAP,
+                                tokenizer, heading_starts)
+    chunks = [chunk['text'] for chunk in chunk_list]
+    offsets = [chunk['offset'] for chunk in chunk_list]
+    locations = [(chunk['page'], chunk['anchor']) for chunk in chunk_list]
+    sections = [section_at(headings, heading_starts, offset) for offset in offsets]
+    # [결정적 ID] 출처 경로 + 본문 오프셋 + 청크 내용 해시 → 재적재해도 같은 ID (upsert 멱등)
+    ids = [make_chunk_id(full_source_path or file_name, offset, chunk) for offset, chunk in zip(offsets, chunks)]
+
+    # =========================================================
+    # [2026-01-31 성진 주석 보존] 기존 단일 메타데이터 설정
+    # metadatas = [{Settings.META_SOURCE_KEY: original_name} for _ in range(num_chunks)]
+
+    # [2026-01-31 성진 추가 정의] 확장 메타데이터 및 변수 추출 (ArtistSum 전용)
+    batch_metadatas = []
+
+    # [변수 처리] 실제 문서 기준 연도 추출 (추출 범위 상수화)
+    doc_year = "Unknown"
+    year_match = re.search(r'(19|20)\d{2}', file_name + content_body[:Settings.META_EXTRACT_LIMIT])
+    if year_match:
+        doc_year = year_match.group()
+
+    for (page, anchor), section in zip(locations, sections):
+        meta = {
+            Settings.META_SOURCE_KEY: original_name,
+            Settings.META_YEAR_KEY: doc_year,
+            Settings.META_PROJECT_NAME: "ArtistSum",
+            Settings.META_DOC_TYPE: "미분류",
+            Settings.META_INDUSTRY_KEY: None,
+            Settings.META_AUTHOR_KEY: None,
+            Settings.META_TOC_KEY: None,
+            Settings.META_SECTION_KEY: section,
+            Settings.META_ANCHOR_KEY: anchor,
+            Settings.META_PAGE_KEY: page,
+            Settings.META_CONTENT_HASH_KEY: content_hash,
+            Settings.META_SOURCES_KEY: all_sources,
+            Settings.META_DOC_KEY: doc_key(file_name)
+        }
+        batch_metadatas.append(meta)
+    # =========================================================
+    return original_name, chunks, batch_metadatas, ids
+
+def embed_new_chunks(vector_db, embeddings, batch):
+    """
+    [임베딩 단계] 이미 DB 에 있는 청크 ID 는 임베딩/기록 생략 (내용이 같으면 ID 도 같음)
+    → (기록할 ids, texts, vectors, metadatas, owners, 재사용 청크 수)
+    """
+    ids, texts, metadatas, owners = batch
+    existing = set(vector_db._collection.get(ids=ids, include=[])["ids"])
+    keep = []
+    for i, chunk_id in enumerate(ids):
+        if chunk_id not in existing:
+            existing.add(chunk_id)  # 배치 안 중복 ID 방지 (upsert 는 ID 중복 불가)
+            keep.append(i)
+    new_texts = [texts[i] for i in keep]
+    vectors = embeddings.embed_documents(new_texts) if new_texts else []
+    return ([ids[i] for i in keep], new_texts, vectors, [metadatas[i] for i in keep], owners, len(ids) - len(keep))
+
+def write_batch(vector_db, ids, texts, vectors, metadatas):
+    """[기록 단계] 임베딩이 끝난 배치를 Chroma 에 upsert (같은 ID 는 덮어쓰기)"""
+    if ids:
+        vector_db._collection.upsert(ids=ids, embeddings=vectors, metadatas=metadatas, documents=texts)
+
+def resolve_backend(device):
+    """임베딩 백엔드: EMBED_BACKEND=auto 이면 cpu 에서 내보낸 ONNX 모델이 있을 때 onnx, 그 외 torch"""
+    backend = Settings.EMBED_BACKEND
+    ready = onnx_available(Settings.EMBED_ONNX_DIR, Settings.EMBED_ONNX_QUANTIZE)
+    if backend == 'auto':
+        if device == 'cpu' and not ready:
+            print(f"💡 ONNX 모델 없음 → torch 사용 (내보내기: python {Path(__file__).name} --export-onnx)")
+        return 'onnx' if device == 'cpu' and ready else 'torch'
+    if backend == 'onnx' and not ready:
+        raise FileNotFoundError(
+            f"ONNX 모델/onnxruntime 없음: {onnx_model_path(Settings.EMBED_ONNX_DIR, Settings.EMBED_ONNX_QUANTIZE)}"
+        )
+    return backend
+
+def load_torch_embeddings(device, encode_kwargs):
+    return HuggingFaceEmbeddings(
+        model_name=Settings.EMBEDDING_MODEL,
+        model_kwargs={**Settings.EMBEDDING_KWARGS, 'device': device},
+        encode_kwargs=encode_kwargs
+    )
+
+def load_onnx_embeddings(encode_kwargs, threads=0):
+    return OnnxEmbeddings(
+        Settings.EMBED_ONNX_DIR, quantized=Settings.EMBED_ONNX_QUANTIZE,
+        normalize=encode_kwargs.get('normalize_embeddings', False), max_length=Settings.EMBED_ONNX_MAX_LENGTH,
+        batch_size=encode_kwargs.get('batch_size', 32), threads=threads
+    )
+
+def load_base_embeddings():
+    """
+    BGE-M3 로컬 임베딩 엔진 (길이 버킷 사용 시 버킷 1개 = 모델 호출 1회가 되도록 encode 배치 크기 맞춤)
+    - 장치 auto: CUDA 없으면 cpu
+    - 백엔드 auto: cpu 이고 ONNX(int8) 모델을 내보내 두었으면 ONNX Runtime, 아니면 torch
+    - cpu + EMBED_SHARDS != 1: 워커 프로세스 N개 샤드 엔진 (프로세스 수 0 → 코어/RAM 기준 자동)
+    → (엔진, 캐시 네임스페이스) : ONNX/int8 벡터는 fp32 와 미세하게 달라 캐시 키를 분리,
+      정규화 여부 등 encode 설정도 포함 (같은 캐시 DB 를 쓰는 VectorStore 와 섞이지 않도록)
+    """
+    encode_kwargs = dict(Settings.ENCODE_KWARGS)
+    if Settings.EMBED_BUCKET_ENABLED:
+        encode_kwargs['batch_size'] = Settings.EMBED_BUCKET_MAX_SIZE
+    device = resolve_device(Settings.EMBEDDING_DEVICE)
+    backend = resolve_backend(device)
+    onnx_options = None
+    cache_name = cache_namespace(Settings.EMBEDDING_MODEL, encode_kwargs)
+    if backend == 'onnx':
+        cache_name = cache_namespace(f"{Settings.EMBEDDING_MODEL}#onnx{'-int8' if Settings.EMBED_ONNX_QUANTIZE else ''}",
+                                     encode_kwargs, pooling='cls')
+        onnx_options = {
+            'onnx_dir': str(Settings.EMBED_ONNX_DIR), 'quantized': Settings.EMBED_ONNX_QUANTIZE,
+            'max_length': Settings.EMBED_ONNX_MAX_LENGTH,
+        }
+    if device == 'cpu' and Settings.EMBED_SHARDS != 1:
+        workers = Settings.EMBED_SHARDS or auto_shard_count(Settings.EMBED_SHARD_MODEL_MB)
+        if workers > 1:
+            engine = ShardedEmbeddings(
+                Settings.EMBEDDING_MODEL, encode_kwargs, workers=workers, threads=Settings.EMBED_SHARD_THREADS,
+                batch_size=Settings.EMBED_BUCKET_MAX_SIZE, onnx_options=onnx_options
+            )
+            print(f"🧩 CPU 임베딩 샤드: {engine.workers}개 프로세스 × {backend} {engine.threads}스레드")
+            return engine, cache_name
+    print(f"🖥️ 임베딩 장치: {device} / 백엔드: {backend} (단일 프로세스)")
+    if backend == 'onnx':
+        return load_onnx_embeddings(encode_kwargs), cache_name
+    return load_torch_embeddings(device, encode_kwargs), cache_name
+
+def close_base_embeddings(base_embeddings):
+    if isinstance(base_embeddings, ShardedEmbeddings):
+        base_embeddings.close()
+
+def sample_chunks(sample_size):
+    """벤치마크/정합성 점검용: 적재 대상 파일 앞쪽부터 청크 sample_size 개"""
+    input_dir = Settings.DATA_DIR / "text_converted"
+    tokenizer = get_tokenizer(Settings.EMBEDDING_MODEL)
+    texts = []
+    for f in sorted(os.listdir(input_dir)):
+        if len(texts) >= sample_size:
+            break
+        if not (f.endswith(".txt") or is_record_file(f)):
+            continue
+        try:
+            _, _, body, spans, _ = read_converted(input_dir / f, f)
+        except Exception as e:
+            logging.error(f"[벤치마크] {f} 읽기 실패: {e}")
+            continue
+        # 적재와 같은 구조 인식 분할 (벤치마크 청크 길이 분포가 실제 적재와 같도록)
+        chunks = chunk_segments(span_segments(body, spans), Settings.CHUNK_SIZE, Settings.CHUNK_OVERLAP, tokenizer,
+                                [offset for offset, _ in detect_headings(body)])
+        texts.extend(chunk['text'] for chunk in chunks if chunk['text'].strip())
+    return texts[:sample_size]
+
+def save_report(prefix, lines):
+    report_path = Settings.LOGS_DIR / f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+    with open(report_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+    print("\n".join(lines))
+    print(f"📄 리포트: {report_path.name}")
+
+def benchmark_embedding(sample_size):
+    """[길이 버킷 벤치마크] 적재 대상 청크 표본을 문서 순서 배치 vs 길이 버킷으로 임베딩 → 토큰/s 비교 (DB 기록 없음)"""
+    texts = sample_chunks(sample_size)
+    if not texts:
+        print("⚠️ 벤치마크할 청크가 없습니다.")
+        return
+
+    print(f"🔄 로컬 임베딩 모델 로드 중: {Settings.EMBEDDING_MODEL}...")
+    base_embeddings, _ = load_base_embeddings()
+    try:
+        lines = benchmark_buckets(base_embeddings, texts, make_token_counter(base_embeddings),
+                                  Settings.EMBED_BUCKET_TOKENS, Settings.EMBED_BUCKET_MAX_SIZE)
+    finally:
+        close_base_embeddings(base_embeddings)
+    save_report("embed_benchmark", lines)
+
+def check_onnx_parity(sample_size):
+    """[ONNX 정합성] 같은 청크를 torch fp32(cpu) vs ONNX 백엔드로 임베딩 → 코사인 일치도 + 처리량/지연 비교"""
+    texts = sample_chunks(sample_size)
+    if not texts:
+        print("⚠️ 점검할 청크가 없습니다.")
+        return
+    if not onnx_available(Settings.EMBED_ONNX_DIR, Settings.EMBED_ONNX_QUANTIZE):
+        print(f"⚠️ ONNX 모델 없음: 먼저 python {Path(__file__).name} --export-onnx 실행")
+        return
+    encode_kwargs = dict(Settings.ENCODE_KWARGS)
+    print(f"🔄 기준(fp32 torch) / 후보(ONNX{' int8' if Settings.EMBED_ONNX_QUANTIZE else ''}) 모델 로드 중...")
+    lines = parity_check(load_torch_embeddings('cpu', encode_kwargs), load_onnx_embeddings(encode_kwargs), texts)
+    save_report("onnx_parity", lines)
+
+def process_and_save(pipeline=None):
+    """pipeline: 단계별 스레드 파이프라인 사용 여부 (None 이면 Settings.LOADER_PIPELINE)"""
+    if pipeline is None:
+        pipeline = Settings.LOADER_PIPELINE
+    # [2026-01-31 성진 추가 정의] v5: ArtistSum 벤치마크용 로컬 모델 (상수 변수화 완료)
+    print(f"🔄 로컬 임베딩 모델 로드 중: {Settings.EMBEDDING_MODEL}...")
+    base_embeddings, cache_name = load_base_embeddings()
+    # 적재 중 예외로 끝나도 샤드 워커 프로세스는 반드시 종료
+    try:
+        ingest_files(base_embeddings, cache_name, pipeline)
+    finally:
+        close_base_embeddings(base_embeddings)
+
+def ingest_files(base_embeddings, cache_name, pipeline):
+    """변환 출력 → 분할 → 임베딩 → Chroma 적재 (엔진 생성/종료는 process_and_save 담당)"""
     db_path = str(Settings.CHROMA_DB_PATH)
-    state_file = Settings.BATCH_STATE_FILE
+    state_file = Settings.BATCH_STATE_FILE  # 기존 JSON 상태 (최초 1회 가져오기)
+    state_db = Settings.INGEST_STATE_DB
     input_dir = Settings.DATA_DIR / "text_converted"
     
     # =========================================================
@@ -38,13 +477,19 @@ def process_and_save():
     # =========================================================
     # embeddings = OpenAIEmbeddings(model=Settings.EMBEDDING_MODEL)
     
-    # [2026-01-31 성진 추가 정의] v5: ArtistSum 벤치마크용 로컬 모델 (상수 변수화 완료)
-    print(f"🔄 로컬 임베딩 모델 로드 중: {Settings.EMBEDDING_MODEL}...")
-    embeddings = HuggingFaceEmbeddings(
-        model_name=Settings.EMBEDDING_MODEL,
-        model_kwargs=Settings.EMBEDDING_KWARGS,
-        encode_kwargs=Settings.ENCODE_KWARGS
-    )
+    count_tokens = make_token_counter(base_embeddings)
+    # [길이 버킷] 캐시 미스 청크만 토큰 길이순으로 묶어 임베딩 (결과는 원래 순서)
+    embeddings = base_embeddings
+    bucketed = None
+    if Settings.EMBED_BUCKET_ENABLED:
+        embeddings = bucketed = LengthBucketedEmbeddings(
+            base_embeddings, count_tokens, Settings.EMBED_BUCKET_TOKENS, Settings.EMBED_BUCKET_MAX_SIZE
+        )
+    # [임베딩 캐시] 같은 텍스트는 재구축/청크 실험 시에도 디스크 캐시에서 재사용 (RESET_DB 와 무관하게 유지)
+    if Settings.EMBED_CACHE_ENABLED:
+        embeddings = CachedEmbeddings(
+            embeddings, cache_name, Settings.EMBED_CACHE_DB, Settings.EMBED_CACHE_MAX_MB
+        )
     # =========================================================
     
     # [초기화 절차]
@@ -55,6 +500,9 @@ def process_and_save():
             shutil.rmtree(db_path)
         if os.path.exists(state_file):
             os.remove(state_file)
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(f"{state_db}{suffix}"):
+                os.remove(f"{state_db}{suffix}")
         print(f"[{now}] 🗑️  DB 및 상태 파일 삭제 완료.")
 
     # 2. 벡터 DB 연결
@@ -66,121 +514,290 @@ def process_and_save():
 
     # 3. 상태 확인 (v4 이어넣기용)
     initial_count = get_db_status(vector_db)
-    processed_files = set()
-    if not Settings.RESET_DB and os.path.exists(state_file):
-        with open(state_file, "r", encoding=Settings.ENCODING) as f:
-            processed_files = set(json.load(f))
+    # [상태 저장소] 파일 단위 원자적 기록 + 인덱스 조회 (기존 JSON 목록은 처음 한 번만 가져옴)
+    state = IngestState(state_db)
+    if len(state) == 0 and not Settings.RESET_DB:
+        imported = state.import_json(state_file, doc_key)
+        if imported:
+            print(f"📥 기존 상태 파일 가져오기: {imported}건 ({state_file.name} → {state_db.name})")
 
     # 4. 대상 파일 목록 추출
-    all_files = [f for f in os.listdir(input_dir) if f.endswith(".txt")]
-    files_to_process = [f for f in all_files if f not in processed_files]
+    # [중복 제거] 동일 내용 그룹은 대표 출력만 임베딩 (나머지 원본은 sources 메타데이터로 인용)
+    dedup_table = load_dedup_table(input_dir)
+    text_hashes = load_text_hashes(input_dir)
+    purged = settle_duplicate_groups(vector_db, dedup_table, state)
+    duplicate_files = {f for f, entry in dedup_table.items() if entry['canonical'] != f}
+    # 같은 문서의 txt/jsonl 출력이 공존하면 구조화 포맷 우선 (상태는 포맷과 무관한 문서 키로 비교)
+    candidates = {}
+    for f in sorted(os.listdir(input_dir)):
+        if f.endswith(".txt") or is_record_file(f):
+            if doc_key(f) not in candidates or is_record_file(f):
+                candidates[doc_key(f)] = f
+    all_files = list(candidates.values())
+    files_to_process = [f for f in all_files if f not in duplicate_files and doc_key(f) not in state]
     total_files = len(files_to_process)
+    synced = sync_duplicate_sources(vector_db, dedup_table, state)
     
     print(f"\n📊 [DB 현황] 기존 데이터: {initial_count}건")
+    if duplicate_files:
+        print(f"🧬 [중복 제거] 동일 내용 문서 {len(duplicate_files)}개 임베딩 생략 (출처 갱신: {synced}건)")
+    if purged:
+        print(f"🧹 [중복 제거] 중복 적재 {purged}개 그룹 정리 → 대표 문서만 다시 적재")
     print(f"🚀 [작업 시작] ArtistSum 처리 대상: {total_files}개 파일\n")
 
-    # 스플리터 설정
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=Settings.CHUNK_SIZE,
-        chunk_overlap=Settings.CHUNK_OVERLAP,
-        separators=["\n\n", "\n", " ", ""]
-    )
+    # 스플리터 설정: 구조 인식 청크 (임베딩 모델 토크나이저, 없으면 단어 단위 폴백)
+    tokenizer = get_tokenizer(Settings.EMBEDDING_MODEL)
 
     # 5. 메인 처리 루프
+    # [파이프라인] 읽기 스레드 → 분할 워커 → (배치 조립) → 임베딩 → 단일 Chroma 기록 스레드
+    #   단계 사이는 크기 제한 큐, 순차 모드(pipeline=False)는 같은 단계를 한 스레드에서 차례로 실행
     total_added_chunks = 0
-    
-    for idx, file_name in enumerate(files_to_process, 1):
-        file_path = os.path.join(input_dir, file_name)
+    resumed_chunks = 0  # 체크포인트 재개로 건너뛴 청크 (이전 실행에서 기록됨)
+    stale_chunks = 0    # 재적재 문서에서 삭제한 이전 청크 (내용이 바뀌어 ID 가 달라진 청크)
+    done_lock = threading.Lock()  # 메인(빈 파일)과 기록 스레드가 함께 호출
+    file_chunk_ids = {}  # 적재 중 파일 → 새 청크 ID 집합 (완료 시 이전 청크 정리 후 제거)
+
+    def drop_stale_chunks(file_name):
+        """[재적재 정리] 같은 문서 키로 저장된 청크 중 새 ID 집합에 없는 것 삭제 (done_lock 보유 상태에서 호출)"""
+        new_ids = file_chunk_ids.pop(file_name, set())
+        stored = vector_db._collection.get(where={Settings.META_DOC_KEY: doc_key(file_name)}, include=[])
+        stale = [chunk_id for chunk_id in stored["ids"] if chunk_id not in new_ids]
+        if stale:
+            vector_db._collection.delete(ids=stale)
+        return len(stale)
+
+    def mark_done(done):
+        """모든 청크가 기록된 파일만 완료 처리 (배치 단위 트랜잭션 1회)"""
+        nonlocal total_added_chunks, stale_chunks
+        if not done:
+            return
+        with done_lock:
+            # 새 청크가 모두 기록된 뒤에 이전 청크 삭제 → 완료 기록 (중간에 끊겨도 다음 실행에서 다시 정리)
+            for file_name, _ in done:
+                stale_chunks += drop_stale_chunks(file_name)
+            state.mark_done((doc_key(file_name), file_name, num_written) for file_name, num_written in done)
+            total_added_chunks += sum(num_written for _, num_written in done)
+            for file_name, _ in done:
+                checkpoint_ids.pop(file_name, None)
+
+    # [청크 구간 체크포인트] 대형 파일은 배치 기록마다 "앞에서부터 기록된 청크 수 + 마지막 청크 ID" 저장
+    checkpoint_ids = {}  # 체크포인트 대상 파일 → 청크 ID 목록 (완료 시 제거)
+
+    def save_progress(progress):
+        with done_lock:
+            state.save_progress(
+                (doc_key(file_name), file_name, total, written, checkpoint_ids[file_name][written - 1])
+                for file_name, written, total in progress if file_name in checkpoint_ids
+            )
+
+    def forget_files(file_names):
+        """실패 파일의 청크 ID 목록 제거 (체크포인트/완료 기록은 그대로 → 다음 실행에서 재개 또는 재적재)"""
+        with done_lock:
+            for file_name in file_names:
+                checkpoint_ids.pop(file_name, None)
+                file_chunk_ids.pop(file_name, None)
+
+    def resume_point(file_name, chunk_ids):
+        """이전 실행의 체크포인트와 청크 구성이 같으면 이어서 기록할 위치 (다르면 0)"""
+        saved = state.get_progress(doc_key(file_name))
+        if not saved:
+            return 0
+        total, written, last_id = saved
+        if total == len(chunk_ids) and 0 < written <= total and chunk_ids[written - 1] == last_id:
+            return written
+        return 0
+
+    def read_stage(file_name):
+        return file_name, read_converted(os.path.join(input_dir, file_name), file_name)
+
+    def split_stage(item):
+        file_name, parsed = item
+        return (file_name,) + prepare_chunks(file_name, parsed, tokenizer, dedup_table, text_hashes)
+
+    def embed_stage(batch):
+        return embed_new_chunks(vector_db, embeddings, batch)
+
+    def write_stage(batch):
+        ids, texts, vectors, metadatas, owners, reused = batch
+        write_batch(vector_db, ids, texts, vectors, metadatas)
+        reused_chunks[0] += reused
+        mark_done(batcher.complete(owners))
+
+    def file_error(item, e):
+        file_name = item if isinstance(item, str) else item[0]
+        err_msg = f"실패: {file_name} | 이유: {str(e)}"
+        print(f"\n❌ {err_msg}")
+        logging.error(err_msg)
+        forget_files([file_name])
+
+    # 배치 실패 → 해당 배치에 청크가 있는 파일 모두 실패 처리 (단계마다 owners 위치가 다름)
+    def embed_error(batch, e):
+        batcher.fail(batch[3], e)  # (ids, texts, metadatas, owners)
+
+    def write_error(batch, e):
+        batcher.fail(batch[4], e)  # (ids, texts, vectors, metadatas, owners, reused)
+
+    def write_now(*batch):
+        """순차 모드 sink: 임베딩 + 기록을 바로 실행"""
+        owners = batch[3]
+        try:
+            started = time.perf_counter()
+            ids, texts, vectors, metadatas, _, reused = embed_new_chunks(vector_db, embeddings, batch)
+            stage_busy['embed'] += time.perf_counter() - started
+            started = time.perf_counter()
+            write_batch(vector_db, ids, texts, vectors, metadatas)
+            stage_busy['write'] += time.perf_counter() - started
+            reused_chunks[0] += reused
+        except Exception as e:
+            batcher.fail(owners, e)
+            return []
+        return batcher.complete(owners)
+
+    stage_busy = {'read': 0.0, 'split': 0.0, 'embed': 0.0, 'write': 0.0}
+    reused_chunks = [0]  # 이미 DB 에 있어 임베딩을 생략한 청크 수 (기록 스레드에서 갱신)
+    stages = []
+    if pipeline:
+        file_queue = queue.Queue()
+        for file_name in files_to_process:
+            file_queue.put(file_name)
+        file_queue.put(DONE)
+        read_queue = queue.Queue(maxsize=Settings.LOADER_QUEUE_SIZE)
+        split_queue = queue.Queue(maxsize=Settings.LOADER_QUEUE_SIZE)
+        embed_queue = queue.Queue(maxsize=Settings.LOADER_QUEUE_SIZE)
+        write_queue = queue.Queue(maxsize=Settings.LOADER_QUEUE_SIZE)
+
+        def enqueue_batch(*batch):
+            embed_queue.put(batch)
+            return []
+
+        batcher_sink = enqueue_batch
+    else:
+        batcher_sink = write_now
+
+    # [교차 파일 배치] 소형 파일 청크는 모아서, 대형 파일 청크는 나눠서 고정 크기로 임베딩
+    batcher = CrossFileBatcher(
+        batcher_sink,
+        max_chunks=Settings.EMBED_BATCH_CHUNKS,
+        max_tokens=Settings.EMBED_BATCH_TOKENS,
+        count_tokens=count_tokens if Settings.EMBED_BATCH_TOKENS else len,
+        on_progress=save_progress,
+        on_fail=forget_files,
+    )
+
+    started_at = time.perf_counter()
+    if pipeline:
+        stages = [
+            Stage("read", read_stage, file_queue, read_queue, Settings.LOADER_READ_WORKERS, file_error),
+            Stage("split", split_stage, read_queue, split_queue, Settings.LOADER_SPLIT_WORKERS, file_error),
+            Stage("embed", embed_stage, embed_queue, write_queue, 1, embed_error),
+            Stage("write", write_stage, write_queue, None, 1, write_error),
+        ]
+        prepared = iter_queue(split_queue)
+    else:
+        def iter_prepared():
+            for file_name in files_to_process:
+                try:
+                    started = time.perf_counter()
+                    item = read_stage(file_name)
+                    stage_busy['read'] += time.perf_counter() - started
+                    started = time.perf_counter()
+                    prepared_item = split_stage(item)
+                    stage_busy['split'] += time.perf_counter() - started
+                except Exception as e:
+                    file_error(file_name, e)
+                    continue
+                yield prepared_item
+        prepared = iter_prepared()
+
+    for idx, (file_name, original_name, chunks, batch_metadatas, chunk_ids) in enumerate(prepared, 1):
         now_time = datetime.now().strftime("%H:%M:%S")
+        num_chunks = len(chunks)
+
+        # ---------------------------------------------------------
+        # [2026-01-31 성진 주석 보존] 원본 분할 적재 루프 및 에러 처리
+        # ---------------------------------------------------------
+        """
+        chunk_batch_size = 100 
+        for i in range(0, num_chunks, chunk_batch_size):
+            # ... 기존 로직 보존 (중략) ...
+        """
+
+        # [2026-01-31 성진 추가 정의] BGE-M3 로컬 전용 고속 적재
+        # vector_db.add_texts(texts=chunks, metadatas=batch_metadatas)
+        # [교차 파일 배치] 배치가 차면 적재, 상태 업데이트는 파일의 마지막 청크 기록 후
+        # [청크 구간 체크포인트] 대형 파일은 중단 지점(마지막으로 기록된 배치)부터 재개
+        skip = 0
+        large = num_chunks >= Settings.LARGE_FILE_THRESHOLD
+        if large:
+            skip = resume_point(file_name, chunk_ids)
+            if skip:
+                resumed_chunks += skip
+                print(f"\n[{now_time}] ⏩ [재개] {original_name}: {skip}/{num_chunks} 청크 기록됨 → 이어서 적재")
+            with done_lock:
+                checkpoint_ids[file_name] = chunk_ids
+        with done_lock:
+            file_chunk_ids[file_name] = set(chunk_ids)
+        mark_done(batcher.add_file(file_name, chunks, batch_metadatas, chunk_ids, skip=skip, checkpoint=large))
+        # ---------------------------------------------------------
+
+        # 디버그용 출력 제어 (상수 참조)
+        if num_chunks >= Settings.LARGE_FILE_THRESHOLD: 
+            print(f"\n[{now_time}] 🐘 [대형] ({idx}/{total_files}) {original_name} (청크: {num_chunks}개)")
         
-        try:
-            with open(file_path, "r", encoding=Settings.ENCODING, errors=Settings.FILE_ERRORS_STRATEGY) as f:
-                full_content = f.read()
-            
-            lines = full_content.split('\n')
-            
-            # 출처 복원 및 본문 정제
-            if lines and lines[0].startswith("Source:"):
-                full_source_path = lines[0].replace("Source:", "").strip()
-                original_name = full_source_path.replace('\\', '/').split('/')[-1]
-                content_body = "\n".join(lines[2:]).strip()
-            else:
-                original_name = file_name.rsplit('_', 1)[0]
-                content_body = full_content
-
-            # 청크 생성
-            chunks = text_splitter.split_text(content_body)
-            num_chunks = len(chunks)
-
-            # =========================================================
-            # [2026-01-31 성진 주석 보존] 기존 단일 메타데이터 설정
-            # metadatas = [{Settings.META_SOURCE_KEY: original_name} for _ in range(num_chunks)]
-            
-            # [2026-01-31 성진 추가 정의] 확장 메타데이터 및 변수 추출 (ArtistSum 전용)
-            batch_metadatas = []
-            
-            # [변수 처리] 실제 문서 기준 연도 추출 (추출 범위 상수화)
-            doc_year = "Unknown"
-            year_match = re.search(r'(19|20)\d{2}', file_name + content_body[:Settings.META_EXTRACT_LIMIT])
-            if year_match:
-                doc_year = year_match.group()
-
-            for _ in range(num_chunks):
-                meta = {
-                    Settings.META_SOURCE_KEY: original_name,
-                    Settings.META_YEAR_KEY: doc_year,
-                    Settings.META_PROJECT_NAME: "ArtistSum",
-                    Settings.META_DOC_TYPE: "미분류",
-                    Settings.META_INDUSTRY_KEY: None,
-                    Settings.META_AUTHOR_KEY: None,
-                    Settings.META_TOC_KEY: None,
-                    Settings.META_SECTION_KEY: None,
-                    Settings.META_ANCHOR_KEY: None,
-                    Settings.META_PAGE_KEY: None
-                }
-                batch_metadatas.append(meta)
-            # =========================================================
-
-            # ---------------------------------------------------------
-            # [2026-01-31 성진 주석 보존] 원본 분할 적재 루프 및 에러 처리
-            # ---------------------------------------------------------
-            """
-            chunk_batch_size = 100 
-            for i in range(0, num_chunks, chunk_batch_size):
-                # ... 기존 로직 보존 (중략) ...
-            """
-
-            # [2026-01-31 성진 추가 정의] BGE-M3 로컬 전용 고속 적재
-            vector_db.add_texts(texts=chunks, metadatas=batch_metadatas)
-            # ---------------------------------------------------------
-
-            # 상태 업데이트
-            total_added_chunks += num_chunks
-            processed_files.add(file_name)
-            with open(state_file, "w", encoding=Settings.ENCODING) as f:
-                json.dump(list(processed_files), f, ensure_ascii=False, indent=4)
-            
-            # 디버그용 출력 제어 (상수 참조)
-            if num_chunks >= Settings.LARGE_FILE_THRESHOLD: 
-                print(f"\n[{now_time}] 🐘 [대형] ({idx}/{total_files}) {original_name} (청크: {num_chunks}개)")
-            
-            if idx % Settings.DISPLAY_INTERVAL == 0:
-                print(f"\n[{now_time}] 📦 [배치] {idx}/{total_files} 완료 (누적 청크: {total_added_chunks})")
-            else:
-                print(f"\r[{now_time}] ({idx}/{total_files}) 처리 중: {original_name[:25]}...", end="")
+        if idx % Settings.DISPLAY_INTERVAL == 0:
+            print(f"\n[{now_time}] 📦 [배치] {idx}/{total_files} 분할 완료 (기록 완료 청크: {total_added_chunks})")
+        else:
+            print(f"\r[{now_time}] ({idx}/{total_files}) 처리 중: {original_name[:25]}...", end="")
 
-        except Exception as e:
-            err_msg = f"실패: {file_name} | 이유: {str(e)}"
-            print(f"\n[{now_time}] ❌ {err_msg}")
-            logging.error(err_msg)
+    # 남은 배치 적재 (파이프라인은 임베딩/기록 단계가 모두 끝날 때까지 대기)
+    mark_done(batcher.flush())
+    if pipeline:
+        embed_queue.put(DONE)
+        for stage in stages:
+            stage.join()
+    wall = time.perf_counter() - started_at
 
     # 6. 최종 결과
+    state.close()
+    if isinstance(embeddings, CachedEmbeddings):
+        embeddings.close()
     final_count = get_db_status(vector_db)
     print("\n\n" + "="*60)
     print(f"🏁 ArtistSum 모든 데이터 적재 완료 (BGE-M3 768dim)")
-    print(f"📈 DB 청크 변화: {initial_count} -> {final_count} (증분: {total_added_chunks})")
+    print(f"📈 DB 청크 변화: {initial_count} -> {final_count} (증분: {total_added_chunks - resumed_chunks})")
+    print(f"♻️ 기존 청크 재사용: {reused_chunks[0]}개 (같은 ID 존재 → 임베딩 생략)")
+    if stale_chunks:
+        print(f"🧹 재적재 문서의 이전 청크 삭제: {stale_chunks}개")
+    if isinstance(embeddings, CachedEmbeddings):
+        print(f"🗄️ {embeddings.stats_line()}")
+    if bucketed is not None:
+        print(f"📏 {bucketed.stats_line()}")
+    print(f"📦 임베딩 배치: {batcher.batch_count}회 (배치당 최대 {Settings.EMBED_BATCH_CHUNKS}청크, 적재 실패 파일: {len(batcher.failed)}개)")
+    print(f"⏱️ 처리량: {(total_added_chunks - resumed_chunks) / wall if wall else 0:.1f} 청크/s ({wall:.1f}s, {'파이프라인' if pipeline else '순차'} 모드)")
+    if stages:
+        for stage in stages:
+            print(f"   - {stage.report(wall)}")
+    else:
+        for name, busy in stage_busy.items():
+            print(f"   - {name:<8} 작업 {busy:7.1f}s | 가동률 {busy / wall if wall else 0:6.1%}")
     print(f"📄 에러 로그: {log_file_path.name}")
     print("="*60)
 
 if __name__ == "__main__":
-    process_and_save()
+    parser = argparse.ArgumentParser(description="v5 로컬 임베딩 적재")
+    parser.add_argument("--sequential", action="store_true", help="파이프라인 없이 순차 처리 (처리량 비교용)")
+    parser.add_argument("--bench-embed", type=int, metavar="N", help="청크 N개 표본으로 길이 버킷 임베딩 벤치마크만 실행")
+    parser.add_argument("--export-onnx", action="store_true", help="임베딩 모델을 ONNX(+int8)로 내보내기만 실행")
+    parser.add_argument("--onnx-parity", type=int, metavar="N", help="청크 N개 표본으로 fp32 vs ONNX 정합성/속도 점검만 실행")
+    args = parser.parse_args()
+    if args.export_onnx:
+        path = export_onnx(Settings.EMBEDDING_MODEL, Settings.EMBED_ONNX_DIR, quantize=Settings.EMBED_ONNX_QUANTIZE)
+        print(f"✅ ONNX 모델 저장: {path}")
+        sys.exit(0)
+    if args.onnx_parity:
+        check_onnx_parity(args.onnx_parity)
+        sys.exit(0)
+    if args.bench_embed:
+        benchmark_embedding(args.bench_embed)
+        sys.exit(0)
+    process_and_save(pipeline=False if args.sequential else None)
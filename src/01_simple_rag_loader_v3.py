@@ -1,11 +1,15 @@
 # (단락보존 + 키워드 가중치형 + 메모리 초기화 + .env 로드)
 import os
+import sys
 import shutil
+from pathlib import Path
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import Chroma
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import TextLoader
 from config import Settings  # 중앙 설정 참조
+sys.path.insert(0, str(Path(__file__).parent / 'parse'))
+from doc_records import is_record_file, read_doc_file  # 변환기 구조화 중간 포맷 (jsonl 기본 출력)
 
 def process_and_save():
     # 1. DB 및 모델 설정 (기존 값 주석 보존)
@@ -37,13 +41,27 @@ def process_and_save():
 
     # 4. 작업 대상 파일 목록
     input_dir = Settings.DATA_DIR / "text_converted"
-    all_files = [f for f in os.listdir(input_dir) if f.endswith(".txt")]
+    all_files = [f for f in os.listdir(input_dir) if f.endswith(".txt") or is_record_file(f)]
     
     print(f"🚀 총 {len(all_files)}개 파일 적재 시작 (초기화 v3 모드)")
 
     for file_name in all_files:
         file_path = os.path.join(input_dir, file_name)
         try:
+            if is_record_file(file_name):
+                # [구조화 중간 포맷] 출처/본문을 레코드에서 바로 읽음 (Source 줄 없음)
+                full_source_path, content_body, _, _ = read_doc_file(file_path)
+                if full_source_path:
+                    original_name = full_source_path.replace('\\', '/').split('/')[-1]
+                else:
+                    original_name = file_name.rsplit('_', 1)[0]
+                final_chunks = text_splitter.create_documents(
+                    [content_body.strip()], metadatas=[{Settings.META_SOURCE_KEY: original_name}]
+                )
+                vector_db.add_documents(final_chunks)
+                print(f"✅ 적재 완료: {original_name}")
+                continue
+            
             loader = TextLoader(file_path, encoding='utf-8')
             raw_docs = loader.load()
             
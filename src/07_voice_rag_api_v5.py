@@ -72,7 +72,12 @@ def perform_rag_search(query: str):
         else:
             sources.append(fname.replace(".txt", ""))
 
-   
+        # [중복 제거] 동일 내용으로 임베딩이 생략된 원본도 함께 인용
+        dup_sources = d.metadata.get(Settings.META_SOURCES_KEY)
+        if dup_sources:
+            sources.extend(os.path.basename(p.replace('\\', '/')) for p in dup_sources.split(" | "))
+
+
     sources = sorted(list(set(sources)))
     context = "\n\n".join(context_list)
     
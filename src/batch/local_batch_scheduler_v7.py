@@ -236,8 +236,7 @@ class LocalBatchProcessor:
                 # 청크 생성
                 chunks = []
                 if contents:
-                    for content in contents:
-                        chunks.extend(processor.chunk_text(content, str(file_path)))
+                    chunks = processor.chunk_texts(contents, str(file_path))  # 페이지/슬라이드 일괄 토큰화
                 
                 # 벡터 DB에 저장
                 if chunks:
@@ -271,6 +270,9 @@ class LocalBatchProcessor:
         
         logger.info(f"✅ 처리 완료: {processed}개 파일, {total_chunks}개 청크")
         
+        # [재적재 정리] 수정된 파일의 이전 청크는 모든 파일 적재 후 한 번에 삭제
+        vector_store.finish_ingest()
+        
         # 벡터 DB 통계 저장
         vector_store.save_stats()
         
@@ -406,43 +406,40 @@ class BatchProcessor:
             
             logger.info(f"\n🔄 배치 {batch_num}: {len(batch)}개 파일 처리 중...")
             
-            documents = []
+            # [스트리밍] 배치 파일의 청크를 생성 즉시 벡터 DB 로 전달 (전체 청크 목록을 메모리에 모으지 않음)
+            # docs, _ = processor.process_directory(file_path.parent)  # 파일마다 폴더 전체 재처리
+            existing = [file_path for file_path in batch if file_path.exists()]
+            batch_stats = processor.new_stats()
+            result = vector_store.add_documents(processor.iter_chunks(files=existing, stats=batch_stats))
             
-            for file_path in batch:
-                if not file_path.exists():
+            for file_path in existing:
+                num_chunks = batch_stats['file_chunks'].get(str(file_path))
+                if num_chunks is None:
+                    logger.error(f"❌ 처리 실패 ({file_path.name})")
+                    self.stats['failed_files'] += 1
+                    self.stats['errors'].append(f"처리 실패: {file_path.name}")
                     continue
                 
-                try:
-                    # 문서 처리
-                    docs, _ = processor.process_directory(file_path.parent)
-                    documents.extend(docs)
-                    
-                    # 파일 해시 계산 (수정 감지용)
-                    file_hash = self._calculate_file_hash(file_path)
-                    
-                    # 원본 경로 복원 (파일명에서)
-                    file_name = file_path.name
-                    original_path = file_name.replace('_', '/')
-                    
-                    # 상태 업데이트 (전체 경로를 키로 사용)
-                    self.state['processed_files'][original_path] = {
-                        'modified_time': datetime.now().isoformat(),
-                        'file_hash': file_hash,
-                        'file_size': file_path.stat().st_size,
-                        'chunks': len(docs),
-                        'status': 'processed'
-                    }
-                    
-                    self.stats['processed_files'] += 1
+                # 파일 해시 계산 (수정 감지용)
+                file_hash = self._calculate_file_hash(file_path)
                 
-                except Exception as e:
-                    logger.error(f"❌ 처리 실패 ({file_path.name}): {e}")
-                    self.stats['failed_files'] += 1
-                    self.stats['errors'].append(f"처리 실패: {file_path.name}")
+                # 원본 경로 복원 (파일명에서)
+                file_name = file_path.name
+                original_path = file_name.replace('_', '/')
+                
+                # 상태 업데이트 (전체 경로를 키로 사용)
+                self.state['processed_files'][original_path] = {
+                    'modified_time': datetime.now().isoformat(),
+                    'file_hash': file_hash,
+                    'file_size': file_path.stat().st_size,
+                    'chunks': num_chunks,
+                    'status': 'processed'
+                }
+                
+                self.stats['processed_files'] += 1
             
-            # 벡터 DB에 추가
-            if documents:
-                result = vector_store.add_documents(documents)
+            # 벡터 DB에 추가 결과
+            if batch_stats['total_chunks']:
                 chunks_added = result['added']
                 total_chunks += chunks_added
                 self.stats['total_chunks'] += chunks_added
@@ -456,6 +453,9 @@ class BatchProcessor:
             
             batch_num += 1
         
+        # [재적재 정리] 수정된 파일의 이전 청크는 모든 배치 적재 후 한 번에 삭제
+        vector_store.finish_ingest()
+        
         logger.info(f"✅ 배치 처리 완료: 총 {total_chunks}개 청크 생성")
         
         return len(files), total_chunks
@@ -66,6 +66,34 @@ class Settings:
     
     SUPPORTED_FORMATS = {'.pdf', '.pptx', '.docx', '.txt', '.png', '.jpg', '.jpeg'}
     SLEEP_INTERVAL = 0.1
+    # [추가 정의] 원격 임베딩 API 속도 제한 (v4 OpenAI 적재: 고정 SLEEP_INTERVAL 대체)
+    EMBED_API_TPM = 1_000_000          # 분당 토큰 한도 (계정 등급에 맞게 조정)
+    EMBED_API_RPM = 3000               # 분당 요청 한도
+    EMBED_API_CONCURRENCY = 4          # 동시 요청 수 (한도 안에서 병렬 전송)
+    EMBED_API_MAX_RETRIES = 6          # 429/일시 오류(연결·타임아웃·5xx) 재시도 횟수 (429 는 retry-after 힌트 우선, 그 외 지수 백오프)
+
+    # ========================
+    # [추가 정의] 감시 워커: 파일 단위 파싱 예산 및 격리 (DocumentProcessor)
+    # ========================
+    PARSE_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+    FILE_TIME_BUDGET = 600             # 파일당 최대 파싱 시간(초), 초과 시 워커 강제 종료
+    FILE_MEMORY_BUDGET_MB = 2048       # 워커 RSS 상한 (psutil 설치 시 적용)
+    WORKER_MAX_TASKS = 200             # 워커당 처리 파일 수 상한 (초과 시 재생성)
+    QUARANTINE_FILE = _DATA_DIR / 'parse_quarantine.json'
+    QUARANTINE_BASE_DELAY = 24 * 3600        # 첫 재시도 대기 (이후 2배씩 증가)
+    QUARANTINE_MAX_DELAY = 30 * 24 * 3600    # 재시도 대기 상한
+    PDF_SPLIT_MIN_PAGES = 300          # 이 페이지 수 이상 PDF 는 페이지 범위 작업으로 나눠 병렬 추출 (0: 분할 안 함)
+    PDF_SPLIT_RANGE_PAGES = 100        # 범위 작업 1개당 페이지 수
+
+    # ========================
+    # [추가 정의] 스캔 PDF 페이지 OCR (DocumentProcessor, Tesseract 설치 필요)
+    # ========================
+    OCR_ENABLED = True
+    OCR_LANG = 'kor+eng'
+    OCR_DPI = 300
+    OCR_MIN_CHARS = 10                 # 추출 글자 수(공백 제외)가 이보다 적은 페이지만 OCR
+    OCR_WORKERS = 2                    # 파싱 워커당 동시 OCR 수 (tesseract 프로세스, 워커 수 × 이 값 ≈ 코어 수)
+    OCR_CACHE_DB = _DATA_DIR / 'ocr_cache.sqlite3'
 
     # ========================
     # [추가/수정] 임베딩 설정 (768차원 로컬 모델)
@@ -76,7 +104,22 @@ class Settings:
     # [추가 정의] BAAI/BGE-M3 무료 로컬 모델 (OpenAI Key 불필요)
     EMBEDDING_MODEL = "BAAI/bge-m3" 
     EMBEDDING_DIMENSION = 768
-    EMBEDDING_DEVICE = "cuda"  # GPU 가속 사용
+    # EMBEDDING_DEVICE = "cuda"  # GPU 가속 사용 (적재 서버에 GPU 가 없으면 실패 → auto 로 변경)
+    EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE", "auto")  # auto: CUDA 있으면 cuda, 없으면 cpu
+    # [추가 정의] CPU 다중 프로세스 임베딩 샤드 (장치가 cpu 일 때만 사용)
+    EMBED_SHARDS = int(os.getenv("EMBED_SHARDS", "0"))  # 프로세스 수 (0: 코어/RAM 기준 자동, 1: 단일 프로세스)
+    EMBED_SHARD_THREADS = 0            # 프로세스당 torch 스레드 (0: 코어 수 / 프로세스 수)
+    EMBED_SHARD_MODEL_MB = 2500        # 프로세스당 모델 메모리 추정 (BGE-M3 fp32 약 2.2GB + 작업 메모리)
+    # [추가 정의] 임베딩 백엔드 (auto: cpu 에서 내보낸 ONNX 모델이 있으면 onnx, 없으면 torch)
+    EMBED_BACKEND = os.getenv("EMBED_BACKEND", "auto")  # auto | torch | onnx
+    EMBED_ONNX_DIR = _DATA_DIR / 'onnx' / 'bge-m3'  # 01_safe_loader_v5.py --export-onnx 출력 폴더
+    EMBED_ONNX_QUANTIZE = True         # int8 동적 양자화 모델 사용 (False: ONNX fp32)
+    EMBED_ONNX_MAX_LENGTH = 8192       # 토큰 상한 (BGE-M3 최대 입력 길이)
+
+    # [추가 정의] 디스크 임베딩 캐시 (모델명 + 정규화 텍스트 해시 → float16 벡터)
+    EMBED_CACHE_ENABLED = True
+    EMBED_CACHE_DB = _DATA_DIR / 'embed_cache.sqlite3'
+    EMBED_CACHE_MAX_MB = 4096          # 초과 시 오래 안 쓴 항목부터 삭제
 
     # ========================
     # 벡터 DB 및 메타데이터 설정
@@ -123,9 +166,27 @@ class Settings:
     META_SECTION_KEY = "section"       # Step 3~4: 섹션별 상세 생성용
     META_ANCHOR_KEY = "anchor"         # 문서 내 절대 위치 (Page, Article, Slide 등)
     META_PAGE_KEY = "page_label"       # PDF 실제 페이지 번호
+    META_CONTENT_HASH_KEY = "content_hash"  # 추출 텍스트 해시 (동일 내용 문서 그룹 식별)
+    META_SOURCES_KEY = "sources"       # 동일 내용 원본 전체 경로 (" | " 구분, 인용용)
+    META_DOC_KEY = "doc_key"           # 변환 출력 문서 키 (재적재 시 새 청크 ID 에 없는 이전 청크 삭제용)
+    DEDUP_TABLE_NAME = "_dedup_v4.json"  # 변환기가 남기는 중복 문서 테이블 (text_converted 내)
+    CONVERT_MANIFEST_NAME = "_manifest_v4.json"  # 변환 매니페스트 (출력별 text_hash, txt 출력 해시 재계산 방지)
     
     # v4 이어넣기 상태 파일 및 DB 검증 리포트
     BATCH_STATE_FILE = Settings._DATA_DIR / 'batch_state_local.json'
+    INGEST_STATE_DB = _DATA_DIR / 'ingest_state.sqlite3'  # [추가 정의] v4/v5 적재 상태 (SQLite)
+    # [추가 정의] 교차 파일 임베딩 배치: 청크 수 또는 토큰 예산 도달 시 적재
+    EMBED_BATCH_CHUNKS = 256
+    EMBED_BATCH_TOKENS = None          # 예: 131072 (설정 시 배치 토큰 합계 상한 추가 적용)
+    # [추가 정의] 길이 버킷: 배치 안 청크를 토큰 길이로 정렬해 모델 호출 단위로 묶음 (패딩 낭비 감소)
+    EMBED_BUCKET_ENABLED = True
+    EMBED_BUCKET_TOKENS = 16384        # 모델 1회 호출 토큰 예산 (호출 청크 수 × 최장 청크 토큰)
+    EMBED_BUCKET_MAX_SIZE = 64         # 모델 1회 호출 최대 청크 수
+    # [추가 정의] 적재 파이프라인 (읽기 → 분할 → 임베딩 → 기록, 단계 사이 큐 크기 제한)
+    LOADER_PIPELINE = True
+    LOADER_READ_WORKERS = 2
+    LOADER_SPLIT_WORKERS = 2
+    LOADER_QUEUE_SIZE = 8              # 단계 사이 대기 항목 수 상한 (파일 또는 배치)
     DB_CHECK_REPORT_FILE = Settings._DATA_DIR / 'db_check_report.json'
     
     # ========================
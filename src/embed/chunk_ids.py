@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+결정적 청크 ID
+목표: 무작위/카운터 ID 대신 (출처 경로, 청크 시작 위치, 청크 내용) 해시로 ID 생성
+- 같은 문서를 다시 적재해도 같은 ID → upsert 가 덮어쓰기만 하므로 중복 벡터 없음
+- 중간에 끊긴 적재를 다시 실행해도 이미 기록된 청크는 같은 ID 로 재사용
+
+사용: from chunk_ids import make_chunk_id
+"""
+
+import hashlib
+
+
+def make_chunk_id(source: str, offset: int, text: str) -> str:
+    """출처 경로(역슬래시 → 슬래시), 시작 오프셋, 청크 내용 → 'chunk_' + sha256 앞 32자리"""
+    digest = hashlib.sha256()
+    digest.update(str(source).replace('\\', '/').encode('utf-8'))
+    digest.update(b'\x00')
+    digest.update(str(offset).encode('ascii'))
+    digest.update(b'\x00')
+    digest.update(text.encode('utf-8'))
+    return f"chunk_{digest.hexdigest()[:32]}"
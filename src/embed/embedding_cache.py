@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+디스크 임베딩 캐시 (SQLite, float16)
+목표: DB 재구축/청크 크기 실험 때마다 같은 텍스트를 BGE-M3 로 다시 임베딩하지 않도록 임베딩 엔진 앞단에 캐시
+
+기능:
+- 키: sha256(네임스페이스 + 용도(doc/query) + 정규화 텍스트) (NFC, 공백 정리)
+  네임스페이스 = 모델명 + 벡터 값을 바꾸는 encode 설정 (L2 정규화 여부, 풀링 등) → 같은 DB 를 공유해도 설정별로 분리
+- 값: float16 벡터 blob (float32 대비 절반 크기)
+- 적재(embed_documents)와 검색(embed_query) 모두 캐시 경유, 미스만 묶어서 한 번에 임베딩
+- 적중/미스 통계, 용량 상한 초과 시 오래 안 쓴 항목부터 삭제(LRU)
+
+사용: from embedding_cache import CachedEmbeddings
+"""
+
+import hashlib
+import logging
+import sqlite3
+import struct
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import List, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+EVICT_TARGET_RATIO = 0.9  # 상한 초과 시 이 비율까지 줄임
+# 벡터 값과 무관한 encode 옵션 (네임스페이스에서 제외)
+NEUTRAL_ENCODE_KEYS = {'batch_size', 'show_progress_bar', 'device', 'convert_to_numpy', 'convert_to_tensor'}
+
+
+def cache_namespace(model_name: str, encode_kwargs: Optional[dict] = None, pooling: Optional[str] = None) -> str:
+    """캐시 네임스페이스: 모델명(백엔드 접미어 포함) + 정규화 여부 + 풀링 + 그 밖의 벡터 관련 encode 옵션"""
+    encode_kwargs = encode_kwargs or {}
+    parts = [f"norm={bool(encode_kwargs.get('normalize_embeddings', False))}"]
+    if pooling:
+        parts.append(f"pool={pooling}")
+    parts += [f"{key}={encode_kwargs[key]}" for key in sorted(encode_kwargs)
+              if key not in NEUTRAL_ENCODE_KEYS and key != 'normalize_embeddings']
+    return f"{model_name}#{','.join(parts)}"
+
+
+def normalize_text(text: str) -> str:
+    """캐시 키용 정규화: 유니코드 NFC + 연속 공백 1칸 + 앞뒤 공백 제거"""
+    return " ".join(unicodedata.normalize('NFC', text).split())
+
+
+def _pack(vector) -> bytes:
+    if np is not None:
+        return np.asarray(vector, dtype=np.float16).tobytes()
+    return struct.pack(f'<{len(vector)}e', *vector)
+
+
+def _unpack(blob: bytes) -> List[float]:
+    if np is not None:
+        return np.frombuffer(blob, dtype=np.float16).astype(np.float32).tolist()
+    return list(struct.unpack(f'<{len(blob) // 2}e', blob))
+
+
+class CachedEmbeddings(Embeddings):
+    """임베딩 엔진 래퍼: 캐시 적중은 디스크에서, 미스만 원래 엔진으로 계산"""
+
+    def __init__(self, embeddings: Embeddings, model_name: str, path: Path, max_mb: Optional[float] = None):
+        """model_name: 캐시 네임스페이스 (cache_namespace() 로 encode 설정까지 포함해 지정)"""
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.path = Path(path)
+        self.max_bytes = max_mb * MB if max_mb else None
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings (last_used)")
+        self.conn.commit()
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+    def _key(self, text: str, kind: str = 'doc') -> str:
+        # 검색어 전용 접두어를 쓰는 모델이 있으므로 문서/검색어 벡터는 따로 보관
+        payload = f"{self.model_name}\x00{kind}\x00{normalize_text(text)}"
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _lookup(self, keys: List[str]) -> dict:
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            for i in range(0, len(unique), 500):  # SQLite 변수 개수 제한 대비
+                part = unique[i:i + 500]
+                rows = self.conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                with self.conn:
+                    self.conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?",
+                                          ((now, key) for key in found))
+        return found
+
+    def _store(self, items: dict):
+        now = time.time()
+        rows = [(key, _pack(vector), now) for key, vector in items.items()]
+        with self._lock:
+            with self.conn:
+                for key, blob, used in rows:
+                    # 이미 있는 키를 덮어쓰면 크기 합계가 어긋나지 않도록 기존 크기 차감
+                    old = self.conn.execute("SELECT size FROM embeddings WHERE key = ?", (key,)).fetchone()
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO embeddings (key, vector, size, last_used) VALUES (?, ?, ?, ?)",
+                        (key, blob, len(blob), used),
+                    )
+                    self.total_bytes += len(blob) - (old[0] if old else 0)
+            if self.max_bytes and self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """오래 안 쓴 항목부터 삭제해 상한의 EVICT_TARGET_RATIO 까지 축소 (잠금 보유 상태에서 호출)"""
+        target = self.max_bytes * EVICT_TARGET_RATIO
+        with self.conn:
+            cursor = self.conn.execute("SELECT key, size FROM embeddings ORDER BY last_used")
+            victims = []
+            for key, size in cursor:
+                if self.total_bytes <= target:
+                    break
+                victims.append((key,))
+                self.total_bytes -= size
+            self.conn.executemany("DELETE FROM embeddings WHERE key = ?", victims)
+        self.evicted += len(victims)
+        logger.info(f"🧹 임베딩 캐시 용량 초과: {len(victims)}건 삭제 (현재 {self.total_bytes / MB:.1f}MB)")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        found = self._lookup(keys)
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        miss_count = sum(1 for key in keys if key not in found)
+        with self._lock:  # 파이프라인/검색 스레드가 같은 캐시를 공유
+            self.hits += len(keys) - miss_count
+            self.misses += miss_count
+
+        computed = {}
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing, vectors))
+            self._store(computed)
+        # 미스는 원래 엔진 결과(float32) 그대로, 적중은 float16 → float32 복원
+        return [computed[key] if key in computed else _unpack(found[key]) for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text, 'query')
+        found = self._lookup([key])
+        with self._lock:
+            if key in found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if key in found:
+            return _unpack(found[key])
+        vector = self.embeddings.embed_query(text)
+        self._store({key: vector})
+        return vector
+
+    def stats_line(self) -> str:
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        return (f"임베딩 캐시: 적중 {self.hits} / 미스 {self.misses} (적중률 {rate:.1%}) | "
+                f"{self.total_bytes / MB:.1f}MB, 삭제 {self.evicted}건")
+
+    def close(self):
+        self.conn.close()
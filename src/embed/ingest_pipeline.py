@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+적재 파이프라인 단계(Stage) 실행기
+목표: 읽기 → 분할 → 임베딩 → DB 기록을 단계별 스레드로 겹쳐 실행 (I/O 대기 중에도 CPU 사용)
+
+기능:
+- 단계마다 워커 스레드 N개, 단계 사이는 크기 제한 큐 (느린 단계가 앞 단계를 자연스럽게 늦춤)
+- 종료 신호(DONE)는 마지막 워커가 다음 단계로 1번만 전달
+- 단계별 처리 건수/작업 시간 집계 → 가동률(utilization) 리포트
+- 항목 처리 중 예외는 on_error 로 넘기고 다음 항목 계속 처리 (on_error 자체의 예외도 로그만 남기고 계속)
+
+사용: from ingest_pipeline import Stage, DONE, iter_queue
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+DONE = object()  # 단계 종료 신호
+
+
+def iter_queue(q: queue.Queue) -> Iterator:
+    """DONE 을 받을 때까지 큐 항목 반환"""
+    while True:
+        item = q.get()
+        if item is DONE:
+            return
+        yield item
+
+
+class Stage:
+    """입력 큐 항목마다 func 실행, 결과(None 제외)를 출력 큐로 전달하는 워커 스레드 묶음"""
+
+    def __init__(self, name: str, func: Callable, inputs: queue.Queue, outputs: Optional[queue.Queue] = None,
+                 workers: int = 1, on_error: Optional[Callable] = None):
+        self.name = name
+        self.func = func
+        self.inputs = inputs
+        self.outputs = outputs
+        self.workers = max(1, workers)
+        self.on_error = on_error
+        self.busy = 0.0   # 워커 작업 시간 합계(초)
+        self.items = 0
+        self._alive = self.workers
+        self._lock = threading.Lock()
+        self.threads = [
+            threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def _run(self):
+        while True:
+            item = self.inputs.get()
+            if item is DONE:
+                self.inputs.put(DONE)  # 같은 단계의 다른 워커도 종료
+                break
+            started = time.perf_counter()
+            try:
+                result = self.func(item)
+            except Exception as e:
+                result = None
+                if self.on_error:
+                    # 오류 처리기 예외로 워커가 죽으면 DONE 이 전달되지 않아 앞뒤 단계가 큐에서 멈춤
+                    try:
+                        self.on_error(item, e)
+                    except Exception as handler_error:
+                        logger.error(f"❌ [{self.name}] 오류 처리 실패: {handler_error} (원래 오류: {e})")
+                else:
+                    logger.error(f"❌ [{self.name}] 처리 실패: {e}")
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.busy += elapsed
+                self.items += 1
+            if self.outputs is not None and result is not None:
+                self.outputs.put(result)
+
+        with self._lock:
+            self._alive -= 1
+            last = self._alive == 0
+        if last and self.outputs is not None:
+            self.outputs.put(DONE)
+
+    def join(self):
+        for thread in self.threads:
+            thread.join()
+
+    def utilization(self, wall: float) -> float:
+        """가동률 = 작업 시간 합계 / (경과 시간 × 워커 수)"""
+        return self.busy / (wall * self.workers) if wall > 0 else 0.0
+
+    def report(self, wall: float) -> str:
+        return (f"{self.name:<8} 워커 {self.workers}개 | 처리 {self.items:>6}건 | "
+                f"작업 {self.busy:7.1f}s | 가동률 {self.utilization(wall):6.1%}")
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+적재 상태 저장소 (SQLite)
+목표: 파일마다 처리 목록 전체를 JSON 으로 다시 쓰던 방식(O(n²) I/O, 중간 종료 시 파손)을 대체
+
+기능:
+- 문서 키 → 파일명/청크 수/완료 시각 을 기본 키 테이블에 기록 (조회는 인덱스 1회)
+- 완료 기록은 트랜잭션 단위로 원자적 커밋 (WAL 모드, 중단되어도 커밋된 파일만 남음)
+- 기존 BATCH_STATE_FILE(JSON 목록) 1회 가져오기
+- 적재 파이프라인의 기록 스레드에서도 사용할 수 있도록 연결 1개를 잠금으로 공유
+- 대형 파일 청크 구간 체크포인트 (앞에서부터 기록된 청크 수 + 마지막 청크 ID), 완료 시 삭제
+- 기록 해제(discard): 중복 정리 등으로 벡터를 지운 문서를 다시 적재 대상으로
+
+사용: from ingest_state import IngestState
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class IngestState:
+    """적재 완료 문서 목록 (키는 호출 측이 정하는 문서 키)"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS processed ("
+            " doc_key TEXT PRIMARY KEY,"
+            " file_name TEXT NOT NULL,"
+            " chunks INTEGER,"
+            " done_at TEXT NOT NULL)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS progress ("
+            " doc_key TEXT PRIMARY KEY,"
+            " file_name TEXT NOT NULL,"
+            " total INTEGER NOT NULL,"
+            " written INTEGER NOT NULL,"
+            " last_chunk_id TEXT NOT NULL,"
+            " updated_at TEXT NOT NULL)"
+        )
+        self.conn.commit()
+
+    def __contains__(self, doc_key: str) -> bool:
+        with self._lock:
+            row = self.conn.execute("SELECT 1 FROM processed WHERE doc_key = ?", (doc_key,)).fetchone()
+        return row is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM processed").fetchone()[0]
+
+    def mark_done(self, entries: Iterable[Tuple[str, str, int]]):
+        """[(문서 키, 파일명, 청크 수), ...] 를 한 트랜잭션으로 기록 (체크포인트는 함께 삭제)"""
+        now = datetime.now().isoformat(timespec='seconds')
+        entries = list(entries)
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO processed (doc_key, file_name, chunks, done_at) VALUES (?, ?, ?, ?)",
+                ((doc_key, file_name, chunks, now) for doc_key, file_name, chunks in entries),
+            )
+            self.conn.executemany("DELETE FROM progress WHERE doc_key = ?", ((doc_key,) for doc_key, _, _ in entries))
+
+    def save_progress(self, entries: Iterable[Tuple[str, str, int, int, str]]):
+        """[(문서 키, 파일명, 전체 청크 수, 기록된 청크 수, 마지막 기록 청크 ID), ...] 체크포인트 갱신"""
+        now = datetime.now().isoformat(timespec='seconds')
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO progress (doc_key, file_name, total, written, last_chunk_id, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                ((doc_key, file_name, total, written, last_id, now)
+                 for doc_key, file_name, total, written, last_id in entries),
+            )
+
+    def get_progress(self, doc_key: str) -> Optional[Tuple[int, int, str]]:
+        """체크포인트 → (전체 청크 수, 기록된 청크 수, 마지막 기록 청크 ID) 또는 None"""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT total, written, last_chunk_id FROM progress WHERE doc_key = ?", (doc_key,)
+            ).fetchone()
+
+    def discard(self, doc_keys: Iterable[str]):
+        """문서 완료 기록 + 체크포인트 삭제 (다음 실행에서 다시 적재)"""
+        keys = [(doc_key,) for doc_key in doc_keys]
+        with self._lock, self.conn:
+            self.conn.executemany("DELETE FROM processed WHERE doc_key = ?", keys)
+            self.conn.executemany("DELETE FROM progress WHERE doc_key = ?", keys)
+
+    def import_json(self, json_path: Path, key_func: Callable[[str], str]) -> int:
+        """기존 JSON 상태 파일(처리 파일명 목록) 가져오기 → 새로 추가된 건수 (원본 파일은 그대로 둠)"""
+        json_path = Path(json_path)
+        if not json_path.exists():
+            return 0
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                file_names = json.load(f)
+        except Exception as e:
+            logger.error(f"❌ 기존 상태 파일 로드 실패: {e}")
+            return 0
+
+        before = len(self)
+        now = datetime.now().isoformat(timespec='seconds')
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO processed (doc_key, file_name, chunks, done_at) VALUES (?, ?, NULL, ?)",
+                ((key_func(name), name, now) for name in file_names),
+            )
+        return len(self) - before
+
+    def close(self):
+        self.conn.close()
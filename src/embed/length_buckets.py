@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+길이 버킷 임베딩 배치
+목표: 수십 자 ~ CHUNK_SIZE(2000자) 청크를 문서 순서대로 묶으면 배치마다 가장 긴 청크 길이로 패딩되어 연산 낭비
+      → 토큰 길이로 정렬해 비슷한 길이끼리 배치, 결과는 원래 순서로 복원
+
+기능:
+- 토큰 길이 오름차순 정렬 후 "배치 크기 × 최대 길이(패딩 포함 토큰)" 가 예산 이하가 되도록 묶음
+  (짧은 청크는 큰 배치, 긴 청크는 작은 배치)
+- 실제 토큰 / 패딩 포함 토큰 / 임베딩 시간 집계 → 토큰/초, 패딩 낭비율
+- 엔진이 embed_batches 를 제공하면(CPU 샤드) 버킷 목록을 한 번에 넘겨 병렬 임베딩
+- 벤치마크: 같은 청크를 문서 순서 고정 배치 vs 길이 버킷으로 임베딩해 비교
+
+사용: from length_buckets import LengthBucketedEmbeddings, make_token_counter, benchmark_buckets
+"""
+
+import time
+from typing import Callable, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+
+def make_token_counter(embeddings: Embeddings) -> Callable[[str], int]:
+    """임베딩 모델 토크나이저 기반 토큰 카운터 (토크나이저가 없으면 글자 수로 근사)"""
+    model = getattr(embeddings, "_client", None) or getattr(embeddings, "client", None) or embeddings
+    tokenizer = getattr(model, "tokenizer", None)
+    if tokenizer is None:
+        return len
+    return lambda text: len(tokenizer(text, add_special_tokens=False)["input_ids"])
+
+
+def plan_buckets(lengths: List[int], max_tokens: int, max_size: int, sort: bool = True) -> List[List[int]]:
+    """
+    청크 인덱스 배치 목록
+    - sort=True: 토큰 길이 오름차순으로 모아 (배치 크기 × 최대 길이) <= max_tokens, 배치 크기 <= max_size
+    - sort=False: 문서 순서 그대로 max_size 씩 (비교 기준)
+    """
+    if not sort:
+        return [list(range(i, min(i + max_size, len(lengths)))) for i in range(0, len(lengths), max_size)]
+    batches = []
+    current = []
+    for index in sorted(range(len(lengths)), key=lengths.__getitem__):
+        # 오름차순이므로 새 청크가 배치의 최대 길이
+        if current and (len(current) >= max_size or (len(current) + 1) * max(lengths[index], 1) > max_tokens):
+            batches.append(current)
+            current = []
+        current.append(index)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def padded_tokens(lengths: List[int], batches: List[List[int]]) -> int:
+    """배치마다 최대 길이로 패딩했을 때 모델이 처리하는 토큰 수"""
+    return sum(len(batch) * max(lengths[i] for i in batch) for batch in batches)
+
+
+class LengthBucketedEmbeddings(Embeddings):
+    """임베딩 엔진 래퍼: 비슷한 토큰 길이끼리 배치로 임베딩 후 원래 순서로 반환"""
+
+    def __init__(self, embeddings: Embeddings, count_tokens: Optional[Callable[[str], int]] = None,
+                 max_tokens: int = 16384, max_size: int = 64, sort: bool = True):
+        self.embeddings = embeddings
+        self.count_tokens = count_tokens or make_token_counter(embeddings)
+        self.max_tokens = max_tokens
+        self.max_size = max_size
+        self.sort = sort
+        self.batches = 0
+        self.tokens = 0
+        self.padded = 0
+        self.seconds = 0.0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        lengths = [self.count_tokens(text) for text in texts]
+        batches = plan_buckets(lengths, self.max_tokens, self.max_size, self.sort)
+        vectors = [None] * len(texts)
+        started = time.perf_counter()
+        groups = [[texts[i] for i in batch] for batch in batches]
+        if hasattr(self.embeddings, 'embed_batches'):  # 샤드 엔진: 버킷을 워커 프로세스에 한꺼번에 분배
+            results = self.embeddings.embed_batches(groups)
+        else:
+            results = (self.embeddings.embed_documents(group) for group in groups)
+        for batch, batch_vectors in zip(batches, results):
+            for index, vector in zip(batch, batch_vectors):
+                vectors[index] = vector
+        self.seconds += time.perf_counter() - started
+        self.batches += len(batches)
+        self.tokens += sum(lengths)
+        self.padded += padded_tokens(lengths, batches)
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    def tokens_per_second(self) -> float:
+        return self.tokens / self.seconds if self.seconds else 0.0
+
+    def stats_line(self) -> str:
+        waste = 1 - self.tokens / self.padded if self.padded else 0.0
+        label = '길이 버킷' if self.sort else '문서 순서'
+        return (f"{label}: 배치 {self.batches}회 | 토큰 {self.tokens} (패딩 포함 {self.padded}, 낭비 {waste:.1%}) | "
+                f"{self.tokens_per_second():.0f} 토큰/s")
+
+
+def benchmark_buckets(embeddings: Embeddings, texts: List[str], count_tokens: Optional[Callable[[str], int]] = None,
+                      max_tokens: int = 16384, max_size: int = 64) -> List[str]:
+    """같은 청크를 문서 순서 고정 배치 vs 길이 버킷으로 임베딩 → 리포트 줄 목록"""
+    count_tokens = count_tokens or make_token_counter(embeddings)
+    embeddings.embed_documents(texts[:max_size])  # 예열 (모델 로드/첫 호출 비용 제외)
+    lines = [f"임베딩 길이 버킷 벤치마크: 청크 {len(texts)}개 (배치 최대 {max_size}개, 패딩 포함 {max_tokens} 토큰)"]
+    results = {}
+    for sort in (False, True):
+        bucketed = LengthBucketedEmbeddings(embeddings, count_tokens, max_tokens, max_size, sort=sort)
+        bucketed.embed_documents(texts)
+        results[sort] = bucketed.tokens_per_second()
+        lines.append(f"- 시간 {bucketed.seconds:7.2f}s | {bucketed.stats_line()}")
+    before, after = results[False], results[True]
+    lines.append(f"→ 토큰/s {before:.0f} → {after:.0f} ({after / before if before else 0:.2f}배)")
+    return lines
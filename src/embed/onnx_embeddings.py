@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ONNX / int8 양자화 CPU 임베딩 백엔드
+목표: GPU 없는 환경에서 BGE-M3 를 PyTorch fp32 대신 ONNX Runtime(선택적 int8 동적 양자화)으로 임베딩
+
+기능:
+- 내보내기: transformers 모델 → ONNX (fp32) → int8 동적 양자화 (가중치 2GB 초과분은 외부 데이터 파일)
+- 임베딩: 토크나이저 → ONNX 세션 → CLS 풀링 + L2 정규화 (sentence-transformers BGE-M3 dense 출력과 동일 방식)
+- 같은 Embeddings 인터페이스 → 캐시/길이 버킷/CPU 샤드 래퍼와 그대로 조합
+- 정합성 점검: fp32 기준 모델 대비 코사인 유사도(평균/최소) + 처리량/지연 시간 비교
+
+사용: from onnx_embeddings import OnnxEmbeddings, export_onnx, onnx_model_path, parity_check
+"""
+
+import logging
+import math
+import statistics
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+try:
+    import numpy as np
+    import onnxruntime as ort  # pip install onnxruntime (선택)
+except ImportError:
+    np = None
+    ort = None
+
+logger = logging.getLogger(__name__)
+
+FP32_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+
+
+def onnx_model_path(onnx_dir, quantized: bool = True) -> Path:
+    return Path(onnx_dir) / (INT8_FILE if quantized else FP32_FILE)
+
+
+def onnx_available(onnx_dir, quantized: bool = True) -> bool:
+    """onnxruntime 설치 + 내보낸 모델 파일 존재 여부"""
+    return ort is not None and onnx_model_path(onnx_dir, quantized).exists()
+
+
+def export_onnx(model_name: str, onnx_dir, quantize: bool = True, opset: int = 17) -> Path:
+    """HuggingFace 모델 → ONNX (+ int8 동적 양자화) 내보내기, 토크나이저도 같은 폴더에 저장 → 사용할 모델 경로"""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    onnx_dir = Path(onnx_dir)
+    onnx_dir.mkdir(parents=True, exist_ok=True)
+    fp32_path = onnx_model_path(onnx_dir, quantized=False)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    tokenizer.save_pretrained(str(onnx_dir))
+    if not fp32_path.exists():
+        model = AutoModel.from_pretrained(model_name).eval()
+        sample = tokenizer(["샘플 문장"], return_tensors='pt')
+        logger.info(f"📦 ONNX 내보내기: {model_name} → {fp32_path}")
+        with torch.no_grad():
+            torch.onnx.export(
+                model, (sample['input_ids'], sample['attention_mask']), str(fp32_path),
+                input_names=['input_ids', 'attention_mask'], output_names=['last_hidden_state'],
+                dynamic_axes={
+                    'input_ids': {0: 'batch', 1: 'sequence'},
+                    'attention_mask': {0: 'batch', 1: 'sequence'},
+                    'last_hidden_state': {0: 'batch', 1: 'sequence'},
+                },
+                opset_version=opset,
+            )
+    if not quantize:
+        return fp32_path
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    int8_path = onnx_model_path(onnx_dir, quantized=True)
+    logger.info(f"🗜️ int8 동적 양자화: {int8_path}")
+    quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8, use_external_data_format=True)
+    return int8_path
+
+
+class OnnxEmbeddings(Embeddings):
+    """ONNX Runtime CPU 임베딩 엔진 (CLS 풀링, 선택적 L2 정규화)"""
+
+    def __init__(self, onnx_dir, quantized: bool = True, normalize: bool = True, max_length: int = 8192,
+                 batch_size: int = 32, threads: int = 0):
+        if ort is None:
+            raise ImportError("onnxruntime/numpy 미설치: ONNX 임베딩 백엔드를 사용할 수 없습니다.")
+        from transformers import AutoTokenizer
+
+        self.model_path = onnx_model_path(onnx_dir, quantized)
+        self.tokenizer = AutoTokenizer.from_pretrained(str(onnx_dir))
+        self.normalize = normalize
+        self.max_length = max_length
+        self.batch_size = batch_size
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(self.model_path), options, providers=['CPUExecutionProvider'])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        encoded = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length, return_tensors='np')
+        feeds = {name: encoded[name].astype(np.int64) for name in ('input_ids', 'attention_mask')
+                 if name in self.input_names}
+        hidden = self.session.run(None, feeds)[0]
+        vectors = hidden[:, 0]  # CLS 풀링
+        if self.normalize:
+            vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors.astype(np.float32).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            vectors.extend(self._embed(texts[i:i + self.batch_size]))
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0]
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def _measure(engine: Embeddings, texts: List[str], batch_size: int, queries: int):
+    """(벡터, 처리량 청크/s, 단건 지연 p50/p95 ms)"""
+    engine.embed_documents(texts[:batch_size])  # 예열
+    started = time.perf_counter()
+    vectors = []
+    for i in range(0, len(texts), batch_size):
+        vectors.extend(engine.embed_documents(texts[i:i + batch_size]))
+    seconds = time.perf_counter() - started
+    latencies = []
+    for text in texts[:queries]:
+        started = time.perf_counter()
+        engine.embed_query(text)
+        latencies.append((time.perf_counter() - started) * 1000)
+    p95 = sorted(latencies)[max(0, math.ceil(len(latencies) * 0.95) - 1)] if latencies else 0.0
+    return vectors, len(texts) / seconds if seconds else 0.0, statistics.median(latencies) if latencies else 0.0, p95
+
+
+def parity_check(reference: Embeddings, candidate: Embeddings, texts: List[str], batch_size: int = 32,
+                 queries: int = 50, min_cosine: Optional[float] = 0.98) -> List[str]:
+    """기준(fp32) vs 후보(ONNX/int8) → 코사인 일치도 + 처리량/지연 리포트 줄 목록"""
+    ref_vectors, ref_rate, ref_p50, ref_p95 = _measure(reference, texts, batch_size, queries)
+    cand_vectors, cand_rate, cand_p50, cand_p95 = _measure(candidate, texts, batch_size, queries)
+    cosines = [_cosine(a, b) for a, b in zip(ref_vectors, cand_vectors)]
+    mean = statistics.mean(cosines) if cosines else 0.0
+    worst = min(cosines) if cosines else 0.0
+    below = sum(1 for c in cosines if min_cosine is not None and c < min_cosine)
+    lines = [
+        f"임베딩 백엔드 정합성 점검: 청크 {len(texts)}개 (배치 {batch_size}, 단건 지연 {min(queries, len(texts))}회)",
+        f"- 코사인 일치도: 평균 {mean:.4f} / 최소 {worst:.4f}"
+        + (f" | {min_cosine} 미만 {below}건" if min_cosine is not None else ""),
+        f"- 기준(fp32)  | {ref_rate:8.1f} 청크/s | 지연 p50 {ref_p50:7.1f}ms / p95 {ref_p95:7.1f}ms",
+        f"- 후보        | {cand_rate:8.1f} 청크/s | 지연 p50 {cand_p50:7.1f}ms / p95 {cand_p95:7.1f}ms",
+        f"→ 처리량 {cand_rate / ref_rate if ref_rate else 0:.2f}배, 지연(p50) {ref_p50 / cand_p50 if cand_p50 else 0:.2f}배 단축",
+    ]
+    return lines
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+원격 임베딩 API 토큰 버킷 속도 제한기
+목표: 고정 sleep(100청크마다) + 429 시 무조건 15초 대기 대신, 분당 토큰(TPM)/요청(RPM) 한도 안에서
+      여러 요청을 동시에 보내 할당량을 끝까지 사용
+
+기능:
+- TPM/RPM 버킷 2개 (1분치 용량, 초 단위로 연속 충전), 요청 전 토큰 수만큼 획득할 때까지 대기
+- 429 응답: retry-after / retry-after-ms / x-ratelimit-reset-* 헤더 또는 "try again in 1.5s" 문구를 읽어
+  모든 워커를 그 시간만큼 일시 정지 + 버킷 비움 (힌트가 없으면 지수 백오프 + 지터)
+- 일시 오류(연결 끊김/타임아웃/5xx): 해당 요청만 지수 백오프 후 재시도 (클라이언트 자체 재시도는 끄고 여기서 일괄 처리)
+- 스레드 안전 (여러 배치를 동시에 요청하는 적재 워커가 같은 제한기 공유)
+
+사용: from rate_limiter import TokenBucketLimiter, RateLimitedEmbeddings
+"""
+
+import logging
+import random
+import re
+import threading
+import time
+from typing import Callable, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+try:
+    import tiktoken  # langchain-openai 의존성 (없으면 글자 수 기반 추정)
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+MAX_BACKOFF = 60.0
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_TRY_AGAIN = re.compile(r"try again in\s+([\d.]+\s*(?:ms|s|m|h)(?:[\d.]+\s*(?:ms|s))?)", re.IGNORECASE)
+
+
+def parse_duration(value) -> Optional[float]:
+    """'1.5', '20ms', '6m0s', '1.2s' → 초 (해석 불가 시 None)"""
+    if value is None:
+        return None
+    text = str(value).strip().replace(" ", "")
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(text)
+    if not parts:
+        return None
+    scale = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+    return sum(float(number) * scale[unit] for number, unit in parts)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    status = getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+    text = str(error)
+    return status == 429 or "429" in text or "Rate limit" in text or "rate_limit" in text
+
+
+def is_transient_error(error: Exception) -> bool:
+    """연결 오류 / 타임아웃 / 5xx 서버 오류 (openai APIConnectionError, APITimeoutError, InternalServerError 등)"""
+    status = getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+    if isinstance(status, int) and (status >= 500 or status == 408):
+        return True
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    names = {cls.__name__ for cls in type(error).__mro__}
+    return bool(names & {'APIConnectionError', 'APITimeoutError', 'InternalServerError',
+                         'ConnectError', 'ReadTimeout', 'TimeoutException', 'RemoteProtocolError'})
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """429 예외의 응답 헤더/메시지에서 재시도 대기 시간(초) 추출"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    if headers:
+        if headers.get('retry-after-ms') is not None:
+            delay = parse_duration(headers.get('retry-after-ms'))
+            if delay is not None:
+                return delay / 1000
+        for name in ('retry-after', 'x-ratelimit-reset-tokens', 'x-ratelimit-reset-requests'):
+            delay = parse_duration(headers.get(name))
+            if delay is not None:
+                return delay
+    match = _TRY_AGAIN.search(str(error))
+    return parse_duration(match.group(1)) if match else None
+
+
+def make_token_estimator(model_name: str) -> Callable[[str], int]:
+    """TPM 계산용 토큰 수 (tiktoken, 없으면 글자 수 / 2 로 넉넉히 추정)"""
+    if tiktoken is not None:
+        try:
+            encoding = tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    return lambda text: max(1, len(text) // 2)
+
+
+class TokenBucketLimiter:
+    """분당 토큰/요청 한도 토큰 버킷 (여러 스레드 공유)"""
+
+    def __init__(self, tokens_per_minute: float, requests_per_minute: float):
+        self.tpm = float(tokens_per_minute)
+        self.rpm = float(requests_per_minute)
+        self.tokens = self.tpm
+        self.requests = self.rpm
+        self.paused_until = 0.0
+        self.waited = 0.0      # 한도 때문에 대기한 시간 합계(초)
+        self.throttled = 0     # 429 응답 횟수
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        self.tokens = min(self.tpm, self.tokens + elapsed * self.tpm / 60)
+        self.requests = min(self.rpm, self.requests + elapsed * self.rpm / 60)
+
+    def acquire(self, tokens: int):
+        """요청 1건 + tokens 만큼 획득할 때까지 대기 (1분 용량보다 큰 요청은 버킷이 가득 찰 때 통과)"""
+        tokens = min(tokens, self.tpm)
+        started = time.monotonic()
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self.paused_until - now
+                if wait <= 0:
+                    if self.tokens >= tokens and self.requests >= 1:
+                        self.tokens -= tokens
+                        self.requests -= 1
+                        break
+                    wait = max((tokens - self.tokens) * 60 / self.tpm, (1 - self.requests) * 60 / self.rpm, 0.01)
+                self._cond.wait(wait)
+            self.waited += time.monotonic() - started
+
+    def penalize(self, delay: float):
+        """429 응답: delay 초 동안 모든 요청 정지 + 버킷 비움 (서버 기준 한도를 넘긴 상태)"""
+        with self._cond:
+            self.throttled += 1
+            self.paused_until = max(self.paused_until, time.monotonic() + delay)
+            self.tokens = 0.0
+            self.requests = 0.0
+            self._cond.notify_all()
+
+    def stats_line(self) -> str:
+        return f"속도 제한: TPM {self.tpm:.0f} / RPM {self.rpm:.0f} | 한도 대기 {self.waited:.1f}s | 429 응답 {self.throttled}회"
+
+
+class RateLimitedEmbeddings(Embeddings):
+    """원격 임베딩 래퍼: 호출마다 제한기 통과, 429 는 힌트 시간만큼 쉬고 재시도, 일시 오류는 백오프 후 재시도"""
+
+    def __init__(self, embeddings: Embeddings, limiter: TokenBucketLimiter,
+                 count_tokens: Callable[[str], int], max_retries: int = 6):
+        self.embeddings = embeddings
+        self.limiter = limiter
+        self.count_tokens = count_tokens
+        self.max_retries = max_retries
+
+    def _call(self, func, texts: List[str]):
+        tokens = sum(self.count_tokens(text) for text in texts)
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(tokens)
+            try:
+                return func()
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                if not is_rate_limit_error(e):
+                    if not is_transient_error(e):
+                        raise
+                    # 한도 문제가 아니므로 다른 워커는 멈추지 않고 이 요청만 대기
+                    delay = min(MAX_BACKOFF, 2 ** attempt) * (1 + random.random() * 0.25)
+                    logger.warning(f"⚠️ [일시 오류] {type(e).__name__}: {delay:.1f}초 후 재시도 ({attempt + 1}/{self.max_retries})")
+                    time.sleep(delay)
+                    continue
+                delay = retry_after_seconds(e)
+                if delay is None:
+                    delay = min(MAX_BACKOFF, 2 ** attempt) * (1 + random.random() * 0.25)
+                logger.warning(f"⏳ [Rate Limit] {delay:.1f}초 대기 후 재시도 ({attempt + 1}/{self.max_retries})")
+                self.limiter.penalize(delay)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._call(lambda: self.embeddings.embed_documents(texts), texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._call(lambda: self.embeddings.embed_query(text), [text])
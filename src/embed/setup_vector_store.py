@@ -20,8 +20,14 @@ from config import Settings  # 원칙 1: config 하나만 참조
 import sys
 from pathlib import Path
 # from typing import List, Dict, Tuple
+from typing import List, Dict, Iterable
+from itertools import islice
 import logging
 import json
+sys.path.insert(0, str(Path(__file__).parent))
+from chunk_ids import make_chunk_id  # 결정적 청크 ID (재적재 시 중복 방지)
+from embedding_cache import CachedEmbeddings, cache_namespace  # 디스크 임베딩 캐시
+from length_buckets import LengthBucketedEmbeddings  # 길이 버킷 배치
 
 # 원칙 2 : 개별 선언 최소화 (Settings 값 직접 사용)
 EMBEDDING_MODEL = Settings.EMBEDDING_MODEL
@@ -31,8 +37,20 @@ COLLECTION_NAME = Settings.CHROMA_COLLECTION_NAME
 # 원칙 3 : 임베딩 엔진 생성 (파일 분리 없이 직접 선언하여 직관성 확보)
 embeddings = HuggingFaceEmbeddings(
     model_name=EMBEDDING_MODEL,
-    model_kwargs={'device': 'cpu'}
+    model_kwargs={'device': 'cpu'},
+    encode_kwargs={'batch_size': Settings.EMBED_BUCKET_MAX_SIZE} if Settings.EMBED_BUCKET_ENABLED else {}
 )
+bucketed_embeddings = None
+# [길이 버킷] 비슷한 토큰 길이 청크끼리 모델 호출 (패딩 낭비 감소, 결과는 원래 순서)
+if Settings.EMBED_BUCKET_ENABLED:
+    embeddings = bucketed_embeddings = LengthBucketedEmbeddings(
+        embeddings, max_tokens=Settings.EMBED_BUCKET_TOKENS, max_size=Settings.EMBED_BUCKET_MAX_SIZE
+    )
+# [임베딩 캐시] 적재/검색 모두 디스크 캐시 경유 (같은 텍스트는 재임베딩하지 않음)
+# 정규화하지 않는 엔진이므로 정규화 적재기(v5)와 같은 DB 를 써도 네임스페이스가 분리됨
+if Settings.EMBED_CACHE_ENABLED:
+    embeddings = CachedEmbeddings(embeddings, cache_namespace(EMBEDDING_MODEL), Settings.EMBED_CACHE_DB,
+                                  Settings.EMBED_CACHE_MAX_MB)
 
 
 logging.basicConfig(
@@ -95,29 +113,51 @@ class VectorStore:
         # logger.info(f"✅ 상단 선언 임베딩 엔진(Settings) 연결 완료")
         
         self.doc_count = 0
+        # [재적재 정리] 적재 1회(여러 add_documents 호출)에 걸쳐 출처별 새 청크 ID 누적 → finish_ingest 에서 한 번에 정리
+        self._source_ordinals = {}  # offset 이 없는 청크는 출처별 순번을 위치로 사용
+        self._source_ids = {}  # 출처 → 이번 적재의 청크 ID
     
-    def add_documents(self, documents: List[Dict]) -> Dict:
-        """문서를 벡터로 변환 후 DB에 추가"""
+    def add_documents(self, documents: Iterable[Dict]) -> Dict:
+        """
+        문서를 벡터로 변환 후 DB에 추가 (리스트 또는 DocumentProcessor.iter_chunks 같은 제너레이터)
+        같은 적재의 호출이 모두 끝나면 finish_ingest() 로 이전 청크 정리 (출처가 여러 호출에 나뉘어도 안전)
+        """
         
-        logger.info(f"📝 {len(documents)}개 문서 추가 시작...")
+        total = len(documents) if hasattr(documents, '__len__') else None
+        logger.info(f"📝 {total if total is not None else '스트리밍'} 문서 추가 시작...")
         
-        if not documents:
-            logger.warning("추가할 문서 없음")
-            return {'added': 0, 'skipped': 0}
-        
-        # 배치 처리 (100개씩)
+        # 배치 처리 (100개씩, 제너레이터는 100개씩만 꺼내 메모리 일정)
         batch_size = 100
         total_added = 0
         total_skipped = 0
+        processed = 0
+        source_ordinals = self._source_ordinals
+        source_ids = self._source_ids
+        iterator = iter(documents)
         
-        for i in range(0, len(documents), batch_size):
-            batch = documents[i:i + batch_size]
+        while True:
+            batch = list(islice(iterator, batch_size))
+            if not batch:
+                break
+            processed += len(batch)
             
             ids = []
             texts = []
             embeddings = []
             metadatas = []
             
+            # [결정적 ID] 출처 + 위치 + 내용 해시 → 이미 저장된 청크는 임베딩 생략 (재실행 시 no-op)
+            batch_ids = []
+            for doc in batch:
+                source = doc.get('source', 'unknown')
+                ordinal = source_ordinals.get(source, 0)
+                source_ordinals[source] = ordinal + 1
+                batch_ids.append(make_chunk_id(source, doc.get('offset', ordinal), doc.get('text', '')))
+                new_ids = source_ids.setdefault(source, set())
+                if doc.get('text', '').strip():
+                    new_ids.add(batch_ids[-1])
+            existing = set(self.collection.get(ids=batch_ids, include=[])['ids'])
+            
             for idx, doc in enumerate(batch):
                 text = doc.get('text', '')
                 source = doc.get('source', 'unknown')
@@ -126,24 +166,36 @@ class VectorStore:
                     total_skipped += 1
                     continue
                 
-                # 임베딩 생성
+                # doc_id = f"doc_{self.doc_count}_{idx}"  # 카운터 ID: 재실행 시 중복 벡터 발생
+                doc_id = batch_ids[idx]
+                if doc_id in existing:
+                    total_skipped += 1
+                    continue
+                existing.add(doc_id)  # 같은 배치 안 동일 청크 (upsert 는 ID 중복 불가)
+                
+                # 임베딩은 배치 단위로 아래에서 한 번에 생성 (청크별 embed_query → 길이 버킷 배치)
                 # embedding = self.model.encode(text, convert_to_numpy=True) # openai query_embedding 사용시 방법.
-                embedding = self.embedding_engine.embed_query(text)
+                # embedding = self.embedding_engine.embed_query(text)
                 
-                doc_id = f"doc_{self.doc_count}_{idx}"
                 ids.append(doc_id)
                 texts.append(text)
                 # embeddings.append(embedding.tolist()) # openai query_embedding 사용시 방법.
-                embeddings.append(embedding)
-                metadatas.append({
+                metadata = {
                     'source': source,
                     'length': len(text)
-                })
+                }
+                # [구조 인식 청크] 페이지/앵커/섹션 (값이 있는 것만, Chroma 는 None 메타데이터 불가)
+                for key, meta_key in (('page', Settings.META_PAGE_KEY), ('anchor', Settings.META_ANCHOR_KEY),
+                                      ('section', Settings.META_SECTION_KEY)):
+                    if doc.get(key) is not None:
+                        metadata[meta_key] = doc[key]
+                metadatas.append(metadata)
                 
                 total_added += 1
             
             # 배치 추가
             if ids:
+                embeddings = self.embedding_engine.embed_documents(texts)
                 self.collection.upsert(
                     ids=ids,
                     embeddings=embeddings,
@@ -151,12 +203,19 @@ class VectorStore:
                     metadatas=metadatas
                 )
                 
-                progress = min(i + batch_size, len(documents))
-                logger.info(f"   진행: {progress}/{len(documents)} 문서")
+                logger.info(f"   진행: {processed}/{total if total is not None else '?'} 문서")
             
             self.doc_count += batch_size
         
+        if processed == 0:
+            logger.warning("추가할 문서 없음")
+            return {'added': 0, 'skipped': 0}
+        
         logger.info(f"✅ 추가 완료: {total_added}개 (스킵: {total_skipped}개)")
+        if isinstance(self.embedding_engine, CachedEmbeddings):
+            logger.info(f"🗄️ {self.embedding_engine.stats_line()}")
+        if bucketed_embeddings is not None:
+            logger.info(f"📏 {bucketed_embeddings.stats_line()}")
         
         return {
             'added': total_added,
@@ -164,6 +223,25 @@ class VectorStore:
             'total_docs': self.collection.count()
         }
     
+    def finish_ingest(self) -> int:
+        """
+        [재적재 정리] 이번 적재에서 다룬 출처마다 저장된 청크 중 새 ID 집합에 없는 것 삭제 → 삭제 수
+        모든 add_documents 호출이 끝난 뒤 한 번 호출 (다음 적재를 위해 출처별 누적 상태 초기화)
+        """
+        total_stale = 0
+        for source, new_ids in self._source_ids.items():
+            stored = self.collection.get(where={'source': source}, include=[])
+            stale = [chunk_id for chunk_id in stored['ids'] if chunk_id not in new_ids]
+            if stale:
+                self.collection.delete(ids=stale)
+                total_stale += len(stale)
+        self._source_ids = {}
+        self._source_ordinals = {}
+        
+        if total_stale:
+            logger.info(f"🧹 재적재 출처의 이전 청크 삭제: {total_stale}개")
+        return total_stale
+    
     def search(self, query: str, n_results: int = 5) -> List[Dict]:
         """유사 문서 검색"""
         
@@ -271,6 +349,7 @@ def main():
     print("\n1️⃣ 문서 추가")
     print("-" * 80)
     result = store.add_documents(test_documents)
+    store.finish_ingest()
     print(f"추가됨: {result['added']}, 스킵: {result['skipped']}")
     
     # 통계
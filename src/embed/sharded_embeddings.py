@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+CPU 다중 프로세스 임베딩 샤드
+목표: GPU 없는 적재 서버에서 BGE-M3 단일 프로세스가 병목 → 프로세스 N개에 배치를 나눠 임베딩
+
+기능:
+- 장치 자동 판별 (EMBEDDING_DEVICE="auto": CUDA 있으면 cuda, 없으면 cpu)
+- 프로세스 수 자동 산정: min(코어 수 / 프로세스당 최소 스레드, 가용 RAM / 모델 메모리 추정)
+- 프로세스마다 모델 1벌 로드 + torch 스레드 수 고정 (프로세스끼리 코어 과점유 방지)
+- onnx_options 지정 시 워커마다 ONNX Runtime 엔진 (torch 대신)
+- 배치(길이 버킷) 단위로 작업 분배, 결과는 제출 순서대로 병합 → 호출 측(단일 Chroma 기록기)은 그대로
+- 워커 비정상 종료(OOM kill 등): 대기 중인 호출이 멈추지 않고 BrokenProcessPool 예외로 전달,
+  풀은 새로 만들어 다음 배치부터 계속 (실패한 배치의 파일은 호출 측이 실패 처리)
+
+사용: from sharded_embeddings import ShardedEmbeddings, resolve_device, auto_shard_count
+"""
+
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+try:
+    import psutil  # pip install psutil (선택: 가용 메모리 확인)
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+MIN_THREADS_PER_SHARD = 2   # 프로세스당 최소 torch 스레드
+RAM_HEADROOM = 0.8          # 가용 RAM 중 모델 적재에 쓸 비율
+
+_worker_engine = None  # 워커 프로세스별 임베딩 엔진
+
+
+def resolve_device(device: Optional[str]) -> str:
+    """'auto'/미지정 → CUDA 사용 가능하면 'cuda', 아니면 'cpu' (그 외 값은 그대로)"""
+    if device and device != 'auto':
+        return device
+    try:
+        import torch
+        return 'cuda' if torch.cuda.is_available() else 'cpu'
+    except ImportError:
+        return 'cpu'
+
+
+def available_memory_mb() -> Optional[float]:
+    if psutil is not None:
+        return psutil.virtual_memory().available / (1024 * 1024)
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (ValueError, OSError, AttributeError):  # Windows 등 sysconf 미지원
+        return None
+
+
+def auto_shard_count(model_mb: float) -> int:
+    """코어 수와 가용 RAM 으로 프로세스 수 산정 (최소 1)"""
+    by_cpu = max(1, (os.cpu_count() or 1) // MIN_THREADS_PER_SHARD)
+    memory = available_memory_mb()
+    by_ram = max(1, int(memory * RAM_HEADROOM // model_mb)) if memory else by_cpu
+    return min(by_cpu, by_ram)
+
+
+def _load_engine(model_name: str, encode_kwargs: dict, onnx_options: Optional[dict] = None, threads: int = 0):
+    if onnx_options:
+        from onnx_embeddings import OnnxEmbeddings
+        return OnnxEmbeddings(
+            onnx_options['onnx_dir'], quantized=onnx_options.get('quantized', True),
+            normalize=encode_kwargs.get('normalize_embeddings', False),
+            max_length=onnx_options.get('max_length', 8192), batch_size=encode_kwargs.get('batch_size', 32),
+            threads=threads,
+        )
+    try:
+        from langchain_huggingface import HuggingFaceEmbeddings
+    except ImportError:
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=model_name, model_kwargs={'device': 'cpu'}, encode_kwargs=encode_kwargs)
+
+
+def _init_worker(model_name: str, encode_kwargs: dict, threads: int, onnx_options: Optional[dict] = None):
+    global _worker_engine
+    # torch 로드 전에 스레드 수 고정 (OpenMP/MKL 기본값은 전체 코어)
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ[var] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    except (ImportError, RuntimeError):
+        pass
+    _worker_engine = _load_engine(model_name, encode_kwargs, onnx_options, threads)
+
+
+def _embed_batch(texts: List[str]) -> List[List[float]]:
+    return _worker_engine.embed_documents(texts)
+
+
+def _embed_query(text: str) -> List[float]:
+    return _worker_engine.embed_query(text)
+
+
+class ShardedEmbeddings(Embeddings):
+    """CPU 워커 프로세스 풀 임베딩 엔진 (배치 1개 = 작업 1개, 결과는 제출 순서)"""
+
+    def __init__(self, model_name: str, encode_kwargs: Optional[dict] = None, workers: int = 0,
+                 threads: int = 0, batch_size: int = 64, model_mb: float = 2500,
+                 onnx_options: Optional[dict] = None):
+        self.workers = workers or auto_shard_count(model_mb)
+        self.threads = threads or max(1, (os.cpu_count() or 1) // self.workers)
+        self.batch_size = batch_size
+        self.tokenizer = self._load_tokenizer(model_name)
+        self._initargs = (model_name, encode_kwargs or {}, self.threads, onnx_options)
+        self.pool = self._start_pool()
+
+    def _start_pool(self) -> ProcessPoolExecutor:
+        # fork 는 부모의 스레드/잠금 상태까지 복제하므로 spawn 사용 (Windows 와 동작 동일)
+        # multiprocessing.Pool 은 죽은 워커의 작업을 영원히 기다리므로 ProcessPoolExecutor 사용
+        return ProcessPoolExecutor(
+            self.workers, mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker, initargs=self._initargs,
+        )
+
+    def _run(self, call):
+        """풀 호출 실행, 워커가 죽어 풀이 깨졌으면 새 풀로 교체 후 예외 전달"""
+        try:
+            return call(self.pool)
+        except BrokenProcessPool:
+            logger.error(f"❌ 임베딩 워커 프로세스 비정상 종료 (메모리 부족 등) → 워커 {self.workers}개 재시작")
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = self._start_pool()
+            raise
+
+    @staticmethod
+    def _load_tokenizer(model_name: str):
+        """길이 버킷/토큰 예산용 토크나이저 (부모 프로세스에는 모델 없이 토크나이저만)"""
+        try:
+            from transformers import AutoTokenizer
+            return AutoTokenizer.from_pretrained(model_name)
+        except Exception as e:
+            logger.warning(f"⚠️ 토크나이저 로드 실패 → 글자 수로 토큰 근사: {e}")
+            return None
+
+    def embed_batches(self, batches: List[List[str]]) -> List[List[List[float]]]:
+        """배치 목록을 워커에 분배 → 배치별 벡터 목록 (입력 순서)"""
+        return self._run(lambda pool: list(pool.map(_embed_batch, batches)))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        return [vector for vectors in self.embed_batches(batches) for vector in vectors]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._run(lambda pool: pool.submit(_embed_query, text).result())
+
+    def close(self):
+        self.pool.shutdown(wait=True)
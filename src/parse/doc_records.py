@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+변환기 → 로더 구조화 중간 포맷 (JSONL, 선택적 zstd 압축)
+목표: 평문 .txt 의 "Source:" 줄 재파싱 대신 출처/페이지·슬라이드 위치/표/추출 메타데이터를 그대로 전달
+
+레코드 (한 줄에 JSON 1개, 파일 순서대로):
+- {"type": "doc", "version": 1, "source": 표준 경로}                      ← 첫 줄
+- {"type": "block", "kind": "text|table", "text": ..., "page": 3, "anchor": "Page 3/40"}
+  (page/anchor 는 위치 정보가 있는 PDF/PPTX 만)
+- {"type": "meta", ...}                                                   ← 마지막 줄 (엔진, 폴백 페이지, text_hash 등)
+
+사용: from doc_records import DocRecordWriter, iter_doc_records, read_doc_file
+"""
+
+import io
+import json
+from typing import Iterator, List, Optional, Tuple
+
+try:
+    import zstandard  # pip install zstandard (선택)
+except ImportError:
+    zstandard = None
+
+FORMAT_VERSION = 1
+RECORD_EXT = ".jsonl"
+COMPRESSED_EXT = ".jsonl.zst"
+RECORD_EXTS = (RECORD_EXT, COMPRESSED_EXT)
+BLOCK_SEPARATOR = "\n"  # 블록을 본문으로 이을 때 구분자 (.txt 출력과 동일)
+
+
+def is_record_file(file_name) -> bool:
+    return str(file_name).endswith(RECORD_EXTS)
+
+
+def _open(path, mode: str):
+    """확장자에 따라 평문/zstd 텍스트 스트림 열기"""
+    if not str(path).endswith(COMPRESSED_EXT):
+        return open(path, mode, encoding='utf-8')
+    if zstandard is None:
+        raise ImportError("zstandard 미설치: .jsonl.zst 파일을 처리할 수 없습니다.")
+    raw = open(path, mode + 'b')
+    if mode == 'w':
+        stream = zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=True)
+    else:
+        stream = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+    return io.TextIOWrapper(stream, encoding='utf-8')
+
+
+class DocRecordWriter:
+    """문서 1개 분량 레코드 기록기 (with 문으로 사용)"""
+
+    def __init__(self, path, source: str):
+        self.path = path
+        self.source = source
+        self._f = None
+
+    def __enter__(self):
+        self._f = _open(self.path, 'w')
+        self._write({'type': 'doc', 'version': FORMAT_VERSION, 'source': self.source})
+        return self
+
+    def __exit__(self, *exc):
+        self._f.close()
+
+    def _write(self, record: dict):
+        self._f.write(json.dumps(record, ensure_ascii=False))
+        self._f.write("\n")
+
+    def write_block(self, text: str, kind: str = 'text', page: Optional[int] = None, anchor: Optional[str] = None):
+        record = {'type': 'block', 'kind': kind, 'text': text}
+        if page is not None:
+            record['page'] = page
+        if anchor is not None:
+            record['anchor'] = anchor
+        self._write(record)
+
+    def write_meta(self, meta: dict):
+        self._write({'type': 'meta', **meta})
+
+
+def iter_doc_records(path) -> Iterator[dict]:
+    """레코드를 파일 순서대로 한 줄씩 반환 (문서 전체를 메모리에 올리지 않음)"""
+    with _open(path, 'r') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_doc_file(path) -> Tuple[Optional[str], str, List[Tuple[int, Optional[int], Optional[str]]], dict]:
+    """
+    로더용 일괄 읽기 → (출처, 본문, 위치 구간, 추출 메타데이터)
+    - 본문: 블록을 BLOCK_SEPARATOR 로 이은 문자열 (.txt 출력 본문과 동일 → 해시/청크 호환)
+    - 위치 구간: [(본문 내 시작 오프셋, page, anchor), ...] 오프셋 오름차순 (위치 정보가 있는 블록만)
+    """
+    source = None
+    parts = []
+    spans = []
+    meta = {}
+    offset = 0
+    for record in iter_doc_records(path):
+        kind = record.get('type')
+        if kind == 'doc':
+            source = record.get('source')
+        elif kind == 'block':
+            if parts:
+                offset += len(BLOCK_SEPARATOR)
+            if record.get('page') is not None or record.get('anchor') is not None:
+                if not spans or spans[-1][1:] != (record.get('page'), record.get('anchor')):
+                    spans.append((offset, record.get('page'), record.get('anchor')))
+            parts.append(record['text'])
+            offset += len(record['text'])
+        elif kind == 'meta':
+            meta = {k: v for k, v in record.items() if k != 'type'}
+    return source, BLOCK_SEPARATOR.join(parts), spans, meta
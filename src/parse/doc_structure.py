@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+문서 구조 인식 (페이지/슬라이드 표지 + 제목 검출)
+목표: 처리기가 붙이는 "[Page i/N]" / "[Slide i/N]" 머리줄과 본문 제목을 읽어
+      청크마다 page / anchor / section 메타데이터를 채움 (원본 재열람 없이 정확한 인용)
+
+기능:
+- 머리줄 분리: "[Page 3/40]\n본문" → (3, "Page 3/40", 본문, 본문 시작 오프셋)
+- 제목 검출: 마크다운 #, "제1장/제2조", "1." "1.1" "Ⅱ." "가." 번호 제목, □/■ 등 기호 제목 (짧은 줄만)
+- 오프셋 → 해당 위치에서 유효한 제목 (이분 탐색, 페이지를 넘어 이어짐)
+- 자를 위치 선택: 창 뒤쪽 절반 안에서 제목 > 빈 줄 > 줄바꿈 순으로 경계 우선
+- 구조 인식 청크: 페이지/슬라이드 구간을 넘지 않고 모델 토큰 수 기준으로 분할
+  (DocumentProcessor.chunk_texts 와 v5 로더가 같은 분할 경로 사용)
+
+사용: from doc_structure import split_marker, detect_headings, section_at, best_break, span_segments, chunk_segments, get_tokenizer
+"""
+
+import bisect
+import logging
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+MARKER = re.compile(r"\A\s*\[(Page|Slide) (\d+)/(\d+)\][ \t]*\n?")
+MAX_HEADING_CHARS = 60
+_SENTENCE_END = re.compile(r"(한다|된다|있다|없다|이다|니다|였다|했다|함|음)$")
+
+_HEADING_PATTERNS = [
+    re.compile(r"^#{1,6}\s+\S"),                                   # 마크다운
+    re.compile(r"^제\s*\d+\s*[편장절관조항]"),                        # 제1장, 제 3 조
+    re.compile(r"^\d{1,2}(\.\d{1,2})*\.?\s+[^\d\s]"),               # 1. / 1.1 / 2.3.1 (숫자 행 제외)
+    re.compile(r"^[IVXⅠⅡⅢⅣⅤⅥⅦⅧⅨⅩ]+\.\s*\S"),                     # Ⅱ. / IV.
+    re.compile(r"^[가나다라마바사아자차카타파하]\.\s+\S"),            # 가. 나.
+    re.compile(r"^[□■◆◇◈▣▶▷●○◎※]\s*\S"),                         # 기호 제목
+    re.compile(r"^【.+】$"),
+]
+
+
+def split_marker(text: str) -> Tuple[Optional[int], Optional[str], str, int]:
+    """페이지/슬라이드 머리줄 분리 → (번호, 앵커 "Page i/N", 본문, 원문 내 본문 시작 오프셋)"""
+    match = MARKER.match(text)
+    if not match:
+        return None, None, text, 0
+    kind, number, total = match.groups()
+    return int(number), f"{kind} {number}/{total}", text[match.end():], match.end()
+
+
+def is_heading(line: str) -> bool:
+    line = line.strip()
+    if not line or len(line) > MAX_HEADING_CHARS or line.startswith('|'):
+        return False
+    # 문장으로 끝나는 줄은 번호가 있어도 본문 (예: "1. 계약 기간은 ... 한다.")
+    if not line.startswith('#') and (line.endswith(('.', ',', ';')) or _SENTENCE_END.search(line)):
+        return False
+    return any(pattern.match(line) for pattern in _HEADING_PATTERNS)
+
+
+def detect_headings(text: str, base: int = 0) -> List[Tuple[int, str]]:
+    """[(오프셋 + base, 제목 문자열), ...] 오프셋 오름차순"""
+    headings = []
+    offset = 0
+    for line in text.split('\n'):
+        if is_heading(line):
+            headings.append((base + offset + len(line) - len(line.lstrip()), line.strip().lstrip('#').strip()))
+        offset += len(line) + 1
+    return headings
+
+
+def section_at(headings: List[Tuple[int, str]], starts: List[int], offset: int) -> Optional[str]:
+    """offset 위치에서 유효한 제목 (starts: headings 의 오프셋 목록)"""
+    i = bisect.bisect_right(starts, offset) - 1
+    return headings[i][1] if i >= 0 else None
+
+
+def best_break(text: str, start: int, end: int, heading_starts: List[int]) -> int:
+    """
+    [start, end) 창을 자를 위치 (글자 오프셋)
+    창 뒤쪽 절반 안에서 제목 시작 > 빈 줄 > 줄바꿈 순으로 찾고, 없으면 end 그대로
+    """
+    half = start + (end - start) // 2
+    i = bisect.bisect_right(heading_starts, end) - 1
+    if i >= 0 and half < heading_starts[i] < end:
+        return heading_starts[i]
+    for separator in ("\n\n", "\n"):
+        cut = text.rfind(separator, half, end)
+        if cut > half:
+            return cut + len(separator)
+    return end
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(model_name: str):
+    """프로세스당 1회 로드하는 fast 토크나이저 (오프셋 매핑 필요, 로드 실패 시 None → 단어 분할 폴백)"""
+    try:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+    except Exception as e:
+        logger.warning(f"⚠️ 토크나이저 로드 실패 ({model_name}) → 단어 단위 분할: {e}")
+        return None
+    if not tokenizer.is_fast:
+        logger.warning(f"⚠️ fast 토크나이저 아님 ({model_name}) → 단어 단위 분할")
+        return None
+    return tokenizer
+
+
+def span_segments(body: str, spans: Sequence[Tuple[int, Optional[int], Optional[str]]]) -> List[Tuple]:
+    """
+    변환기 위치 구간 → 페이지/슬라이드 구간 [(page, anchor, 구간 본문, 본문 내 시작 오프셋), ...]
+    spans: [(시작 오프셋, page, anchor), ...] (doc_records.read_doc_file), 없으면 본문 전체 1구간
+    """
+    if not spans:
+        return [(None, None, body, 0)]
+    segments = []
+    if spans[0][0] > 0:
+        segments.append((None, None, body[:spans[0][0]], 0))
+    for i, (start, page, anchor) in enumerate(spans):
+        end = spans[i + 1][0] if i + 1 < len(spans) else len(body)
+        segments.append((page, anchor, body[start:end], start))
+    return segments
+
+
+def chunk_segments(segments: Sequence[Tuple], chunk_size: int, chunk_overlap: int, tokenizer=None,
+                   heading_starts: Sequence[int] = ()) -> List[Dict]:
+    """
+    [구조 인식 청크] 구간 목록 → [{'text', 'offset', 'page', 'anchor', 'tokens' 또는 'size'}, ...]
+    - segments: [(page, anchor, 구간 본문, 기준 시작 오프셋), ...] 청크는 구간을 넘지 않음 (인용 페이지 정확)
+    - tokenizer: fast 토크나이저 → chunk_size/chunk_overlap 은 모델 토큰 수, 오프셋 매핑으로 원문을 직접 잘라냄
+      (None 이면 단어 단위 폴백: chunk_size // 2 단어)
+    - heading_starts: 기준 오프셋의 제목 시작 위치 (자를 때 제목 > 빈 줄 > 줄바꿈 경계 우선)
+    - offset: 기준 오프셋 (결정적 청크 ID 용)
+    """
+    chunks = []
+    if tokenizer is None:
+        chunk_size_words = max(1, chunk_size // 2)
+        for page, anchor, body, body_base in segments:
+            words = list(re.finditer(r'\S+', body))
+            for i in range(0, len(words), chunk_size_words):
+                chunk_words = words[i:i + chunk_size_words]
+                chunk_text = ' '.join(w.group() for w in chunk_words)
+                chunks.append({'text': chunk_text, 'offset': body_base + chunk_words[0].start(),
+                               'page': page, 'anchor': anchor, 'size': len(chunk_text)})
+        return chunks
+
+    # 특수 토큰 제외, 토큰별 원문 글자 구간 (구간 전체 1회 일괄 인코딩)
+    bodies = [body for _, _, body, _ in segments]
+    encoded = tokenizer(bodies, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+    for (page, anchor, body, body_base), offsets in zip(segments, encoded['offset_mapping']):
+        token_starts = [start for start, _ in offsets]
+        local_headings = [offset - body_base for offset in heading_starts if body_base <= offset < body_base + len(body)]
+        i = 0
+        while i < len(offsets):
+            j = min(i + chunk_size, len(offsets))
+            start, end = offsets[i][0], offsets[j - 1][1]
+            at_heading = False
+            if j < len(offsets):
+                # 창 뒤쪽 절반 안의 구조 경계에서 자름 (제목에서 자르면 다음 청크는 겹침 없이 제목부터)
+                cut = best_break(body, start, end, local_headings)
+                k = bisect.bisect_left(token_starts, cut, i + 1, j)
+                if cut < end and k > i:
+                    at_heading = cut in local_headings
+                    j = k
+                    end = offsets[j - 1][1]
+            chunk_text = body[start:end]
+            if chunk_text.strip():
+                chunks.append({'text': chunk_text, 'offset': body_base + start,
+                               'page': page, 'anchor': anchor, 'tokens': j - i})
+            if j >= len(offsets):
+                break
+            i = j if at_heading else max(i + 1, j - chunk_overlap)
+    return chunks
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+OOXML(DOCX/PPTX) 경량 텍스트 리더
+목표: python-docx / python-pptx 객체 모델 없이 zip 내부 XML 을 iterparse 로 스트리밍
+
+기능:
+- DOCX: word/document.xml 본문의 문단/표를 문서 순서대로 반환
+- PPTX: presentation.xml 의 슬라이드 순서대로 도형 텍스트/표 반환 (그룹 도형 포함)
+- 처리한 요소는 즉시 clear() 하여 대용량 문서도 메모리 일정 (이미지 등 미디어는 읽지 않음)
+
+사용: from ooxml_reader import iter_docx_blocks, iter_pptx_slides
+"""
+
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import Iterator, List, Tuple
+
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_A = '{http://schemas.openxmlformats.org/drawingml/2006/main}'
+_P = '{http://schemas.openxmlformats.org/presentationml/2006/main}'
+_R = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_REL = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+_MC_FALLBACK = '{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback'
+
+# 블록: ('paragraph', 문자열) 또는 ('table', [[셀 문자열, ...], ...])
+Block = Tuple[str, object]
+
+
+def table_to_markdown(rows: List[List[str]]) -> str:
+    """표 행 목록 → 마크다운 표 (빈 표는 빈 문자열)"""
+    if not rows or not any(any(cell for cell in row) for row in rows):
+        return ""
+    width = max(len(row) for row in rows)
+    lines = []
+    for i, row in enumerate(rows):
+        cells = [cell.replace('\n', ' ').strip() for cell in row] + [""] * (width - len(row))
+        lines.append("| " + " | ".join(cells) + " |")
+        if i == 0:
+            lines.append("| " + " | ".join(["---"] * width) + " |")
+    return "\n".join(lines)
+
+
+def _iter_table_blocks(xml_file, tags) -> Iterator[Block]:
+    """
+    문단/표 공통 스트리밍 파서
+    tags: (문단, 텍스트, 탭, 줄바꿈 목록, 표, 행, 셀, 도형 종료 태그 또는 None, 텍스트 상자 태그 또는 None)
+    - 표 밖 문단은 즉시 반환, 표 안 문단은 셀 텍스트로 누적
+    - 도형 종료 태그가 있으면(PPTX) 도형 단위로 문단을 묶어 반환
+    - 텍스트 상자(DOCX w:txbxContent) 문단/표는 바깥 문단에 붙이지 않고 별도 블록으로 반환
+    - mc:Fallback (구버전 VML 사본) 은 건너뜀 → mc:Choice 와 같은 텍스트 상자가 두 번 나오지 않음
+    """
+    para_tag, text_tag, tab_tag, break_tags, tbl_tag, tr_tag, tc_tag, shape_tag, frame_tag = tags
+    para_stack: List[List[str]] = []   # 중첩 문단 대비 스택
+    tables: List[dict] = []            # 중첩 표 스택: {'rows': [], 'row': [], 'cell': []}
+    shape_paras: List[str] = []
+    frames: List[tuple] = []           # 텍스트 상자 진입 시 바깥 (문단 스택, 표 스택) 보관
+    fallback_depth = 0
+
+    for event, elem in ET.iterparse(xml_file, events=('start', 'end')):
+        tag = elem.tag
+        if tag == _MC_FALLBACK:
+            fallback_depth += 1 if event == 'start' else -1
+            if event == 'end':
+                elem.clear()
+            continue
+        if fallback_depth:
+            continue
+        if event == 'start':
+            if tag == para_tag:
+                para_stack.append([])
+            elif tag == tbl_tag:
+                tables.append({'rows': [], 'row': [], 'cell': []})
+            elif tag == frame_tag:
+                frames.append((para_stack, tables))
+                para_stack, tables = [], []
+            continue
+
+        if tag == text_tag:
+            if para_stack and elem.text:
+                para_stack[-1].append(elem.text)
+        elif tag == tab_tag:
+            if para_stack:
+                para_stack[-1].append('\t')
+        elif tag in break_tags:
+            if para_stack:
+                para_stack[-1].append('\n')
+        elif tag == para_tag:
+            text = ''.join(para_stack.pop()) if para_stack else ''
+            if para_stack:
+                # 문단 안의 문단: 바깥 문단에 이어 붙임
+                para_stack[-1].append(text)
+            elif tables:
+                tables[-1]['cell'].append(text)
+            elif shape_tag is not None:
+                shape_paras.append(text)
+            elif text.strip():
+                yield 'paragraph', text
+            elem.clear()
+        elif tag == tc_tag and tables:
+            table = tables[-1]
+            table['row'].append('\n'.join(t for t in table['cell'] if t.strip()))
+            table['cell'] = []
+        elif tag == tr_tag and tables:
+            table = tables[-1]
+            table['rows'].append(table['row'])
+            table['row'] = []
+        elif tag == tbl_tag and tables:
+            rows = tables.pop()['rows']
+            if tables:
+                # 중첩 표는 바깥 셀 텍스트로 평탄화
+                tables[-1]['cell'].extend(' | '.join(row) for row in rows)
+            else:
+                yield 'table', rows
+            elem.clear()
+        elif tag == frame_tag and frames:
+            para_stack, tables = frames.pop()
+        elif shape_tag is not None and tag == shape_tag:
+            text = '\n'.join(shape_paras).strip()
+            shape_paras = []
+            if text:
+                yield 'paragraph', text
+            elem.clear()
+
+
+_DOCX_TAGS = (_W + 'p', _W + 't', _W + 'tab', {_W + 'br', _W + 'cr'}, _W + 'tbl', _W + 'tr', _W + 'tc', None,
+              _W + 'txbxContent')
+_PPTX_TAGS = (_A + 'p', _A + 't', None, {_A + 'br'}, _A + 'tbl', _A + 'tr', _A + 'tc', _P + 'sp', None)
+
+
+def iter_docx_blocks(file_path) -> Iterator[Block]:
+    """DOCX 본문 문단/표를 문서 순서대로 반환"""
+    with zipfile.ZipFile(file_path) as zf:
+        with zf.open('word/document.xml') as xml_file:
+            yield from _iter_table_blocks(xml_file, _DOCX_TAGS)
+
+
+def _slide_paths(zf: zipfile.ZipFile) -> List[str]:
+    """presentation.xml 의 sldIdLst 순서대로 슬라이드 XML 경로"""
+    with zf.open('ppt/_rels/presentation.xml.rels') as f:
+        targets = {
+            rel.get('Id'): rel.get('Target')
+            for rel in ET.parse(f).getroot().iter(_REL + 'Relationship')
+        }
+    with zf.open('ppt/presentation.xml') as f:
+        slide_ids = ET.parse(f).getroot().iter(_P + 'sldId')
+        rel_ids = [sld.get(_R + 'id') for sld in slide_ids]
+
+    paths = []
+    for rel_id in rel_ids:
+        target = targets.get(rel_id)
+        if target:
+            path = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('ppt', target))
+            paths.append(path)
+    return paths
+
+
+def iter_pptx_slides(file_path) -> Iterator[Tuple[int, int, List[Block]]]:
+    """PPTX 슬라이드별 (슬라이드 번호, 전체 슬라이드 수, 블록 목록) 반환"""
+    with zipfile.ZipFile(file_path) as zf:
+        paths = _slide_paths(zf)
+        for i, path in enumerate(paths, 1):
+            with zf.open(path) as xml_file:
+                yield i, len(paths), list(_iter_table_blocks(xml_file, _PPTX_TAGS))
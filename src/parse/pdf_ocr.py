@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+스캔 PDF 페이지 선택적 OCR + 결과 캐시
+목표: 스캔 페이지는 extract_text() 가 빈 문자열 → 조용히 누락
+      → 글자 없는 페이지만 골라 렌더링 후 OCR (텍스트 레이어가 있는 페이지는 그대로)
+
+기능:
+- 렌더링: pypdfium2 로 페이지 → 흑백 이미지 (DPI 지정), 렌더링은 한 스레드에서 순서대로 (pdfium 은 스레드 안전하지 않음)
+- 캐시: 키 = sha256(렌더링 픽셀 + 크기 + 언어), SQLite(WAL) → 바뀌지 않은 스캔은 다시 OCR 하지 않음
+  (여러 파싱 워커 프로세스가 같은 DB 공유)
+- 병렬: 스레드 풀에서 페이지별 tesseract 실행 (tesseract 는 별도 프로세스라 스레드로도 코어 병렬,
+  daemon 감시 워커 안에서도 사용 가능), tesseract 내부 OpenMP 스레드는 1개로 제한해 코어 과점유 방지
+  (OMP_THREAD_LIMIT 는 tesseract 호출에 넘기는 환경에만 설정, 현재 프로세스 환경은 그대로)
+- 동시에 메모리에 올리는 렌더링 이미지는 스레드 수 × 2 개까지
+- 페이지별 OCR 시간 / 캐시 적중 여부 반환 → 호출 측 로그 요약
+
+사용: from pdf_ocr import PageOcr, OcrCache
+"""
+
+import hashlib
+import io
+import logging
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+try:
+    import pypdfium2 as pdfium  # pip install pypdfium2 (선택: 페이지 렌더링)
+    import pytesseract  # pip install pytesseract (선택, Tesseract 설치 필요)
+except ImportError:
+    pdfium = None
+    pytesseract = None
+
+logger = logging.getLogger(__name__)
+
+
+class PageText(NamedTuple):
+    """페이지 OCR 결과: 텍스트, OCR 소요 시간(초, 캐시 적중이면 원래 OCR 시간), 캐시 적중 여부"""
+    text: str
+    seconds: float
+    cached: bool
+
+
+class OcrCache:
+    """OCR 결과 캐시 (SQLite): 이미지 내용 해시 → 텍스트"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # 여러 워커 프로세스가 동시에 기록 → 잠금 대기 시간 넉넉히
+        self.conn = sqlite3.connect(str(self.path), timeout=60, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS ocr ("
+            " key TEXT PRIMARY KEY,"
+            " text TEXT NOT NULL,"
+            " seconds REAL NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def key(image, lang: str) -> str:
+        digest = hashlib.sha256(f"{lang}\x00{image.mode}\x00{image.size}\x00".encode('utf-8'))
+        digest.update(image.tobytes())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[PageText]:
+        with self._lock:
+            row = self.conn.execute("SELECT text, seconds FROM ocr WHERE key = ?", (key,)).fetchone()
+        return PageText(row[0], row[1], True) if row else None
+
+    def put(self, key: str, text: str, seconds: float):
+        with self._lock:
+            with self.conn:
+                self.conn.execute("INSERT OR REPLACE INTO ocr (key, text, seconds, created_at) VALUES (?, ?, ?, ?)",
+                                  (key, text, seconds, time.time()))
+
+    def close(self):
+        self.conn.close()
+
+
+def ocr_available() -> bool:
+    """pypdfium2 + pytesseract + tesseract 실행 파일 모두 있어야 True"""
+    if pytesseract is None:
+        return False
+    try:
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+
+class PageOcr:
+    """PDF 페이지 렌더링 → (캐시 미스만) 스레드 풀 OCR"""
+
+    def __init__(self, lang: str = 'kor+eng', dpi: int = 300, workers: int = 2, cache_path: Optional[Path] = None):
+        if pytesseract is None:
+            raise ImportError("pypdfium2/pytesseract 미설치: 스캔 페이지 OCR 을 사용할 수 없습니다.")
+        # Tesseract 경로 설정 (Windows)
+        if sys.platform == 'win32':
+            pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+        self.lang = lang
+        self.scale = dpi / 72
+        self.workers = max(1, workers)
+        self.cache = OcrCache(cache_path) if cache_path else None
+        # tesseract 프로세스마다 OpenMP 스레드 1개 (동시 실행 수만큼만 코어 사용)
+        self.env = {**os.environ, 'OMP_THREAD_LIMIT': '1'}
+
+    def _tesseract(self, image) -> str:
+        """이미지 → 텍스트 (PNG 를 stdin 으로 전달, OMP_THREAD_LIMIT 은 이 호출의 환경에만 적용)"""
+        buffer = io.BytesIO()
+        image.save(buffer, format='PNG')
+        result = subprocess.run(
+            [pytesseract.pytesseract.tesseract_cmd, 'stdin', 'stdout', '-l', self.lang],
+            input=buffer.getvalue(), capture_output=True, env=self.env,
+        )
+        if result.returncode != 0:
+            raise pytesseract.TesseractError(result.returncode, result.stderr.decode('utf-8', errors='replace').strip())
+        return result.stdout.decode('utf-8', errors='replace')
+
+    def _ocr(self, image, key: Optional[str]) -> PageText:
+        started = time.perf_counter()
+        text = self._tesseract(image)
+        seconds = time.perf_counter() - started
+        if self.cache is not None:
+            self.cache.put(key, text, seconds)
+        return PageText(text, seconds, False)
+
+    def ocr_pages(self, file_path: Path, pages: List[int]) -> Dict[int, PageText]:
+        """페이지 인덱스(0부터) 목록 → {인덱스: PageText} (렌더링/OCR 실패 페이지는 제외)"""
+        results = {}
+        doc = pdfium.PdfDocument(str(file_path))
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                in_flight = {}
+                for index in pages:
+                    try:
+                        page = doc[index]
+                        try:
+                            image = page.render(scale=self.scale, grayscale=True).to_pil()
+                        finally:
+                            page.close()
+                    except Exception as e:
+                        logger.warning(f"⚠️ 페이지 렌더링 실패 ({Path(file_path).name} p.{index + 1}): {e}")
+                        continue
+                    key = OcrCache.key(image, self.lang) if self.cache is not None else None
+                    cached = self.cache.get(key) if key else None
+                    if cached is not None:
+                        results[index] = cached
+                        continue
+                    in_flight[index] = executor.submit(self._ocr, image, key)
+                    # 렌더링 이미지가 쌓이지 않도록 먼저 제출한 OCR 완료 대기
+                    if len(in_flight) >= self.workers * 2:
+                        self._collect(file_path, in_flight, results, wait_for=next(iter(in_flight)))
+                for index in list(in_flight):
+                    self._collect(file_path, in_flight, results, wait_for=index)
+        finally:
+            doc.close()
+        return results
+
+    @staticmethod
+    def _collect(file_path: Path, in_flight: dict, results: dict, wait_for: int):
+        future = in_flight.pop(wait_for)
+        try:
+            results[wait_for] = future.result()
+        except Exception as e:
+            logger.warning(f"⚠️ OCR 실패 ({Path(file_path).name} p.{wait_for + 1}): {e}")
+
+    def close(self):
+        if self.cache is not None:
+            self.cache.close()
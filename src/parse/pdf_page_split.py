@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+대용량 PDF 페이지 범위 분할 (문서 내부 병렬 추출)
+목표: 300페이지 이상 PDF 몇 개가 파일 1개 = 작업 1개로 워커 하나에 묶여 전체 변환 시간을 좌우
+      → 페이지 범위 작업으로 쪼개 같은 감시 워커 풀의 빈 워커들이 나눠 추출, 부모가 페이지 순서대로 재조립
+
+기능:
+- 페이지 수 확인: pypdfium2 → pypdf/PyPDF2 → pdfplumber 순 (열기 실패 시 0 → 분할 없이 파일 작업)
+- 페이지 수 확인도 감시 워커 안에서 (SplitProbe 작업, 파일 단위 시간/메모리 예산 + 격리 적용)
+  → 임계 미만이면 워커가 그 자리에서 파일 전체 변환, 이상이면 페이지 수(PageCount)만 반환
+  → 부모가 범위당 페이지 수 기준으로 균등 분할한 PageRange 작업을 대기열 앞에 추가 (긴 작업 먼저 시작)
+- 범위 결과 모으기: 모든 범위가 도착하면 시작 페이지 순으로 반환, 범위 1개라도 실패하면 파일 전체 실패
+  (감시 워커는 daemon 프로세스라 워커 안에서 하위 프로세스 풀을 만들 수 없어 분배는 부모가 담당)
+
+사용: from pdf_page_split import PageRange, SplitProbe, PageCount, probe_tasks, probe_pdf, task_file, RangeAssembler
+"""
+
+import logging
+import math
+from collections import deque
+from pathlib import Path
+from typing import Callable, Deque, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class PageRange(NamedTuple):
+    """PDF 페이지 범위 작업: [start, end) 0부터 시작, total 은 문서 전체 페이지 수"""
+    file_path: Path
+    start: int
+    end: int
+    total: int
+
+
+class SplitProbe(NamedTuple):
+    """PDF 분할 판정 작업: 워커가 페이지 수 확인 → 임계 미만이면 바로 변환, 이상이면 PageCount 반환"""
+    file_path: Path
+    min_pages: int
+    range_pages: int
+
+
+class PageCount(NamedTuple):
+    """SplitProbe 결과: 분할 대상 PDF 의 전체 페이지 수 (부모가 PageRange 작업으로 분배)"""
+    total: int
+
+
+def task_file(task) -> Path:
+    """작업(파일 경로, SplitProbe 또는 PageRange) → 원본 파일 경로"""
+    return task.file_path if isinstance(task, (PageRange, SplitProbe)) else task
+
+
+def count_pdf_pages(file_path) -> int:
+    """PDF 페이지 수 (본문 파싱 없이 페이지 트리만 확인, 실패 시 0)"""
+    try:
+        import pypdfium2 as pdfium
+        doc = pdfium.PdfDocument(str(file_path))
+        try:
+            return len(doc)
+        finally:
+            doc.close()
+    except ImportError:
+        pass
+    except Exception as e:
+        logger.warning(f"⚠️ 페이지 수 확인 실패 ({Path(file_path).name}): {e}")
+        return 0
+    try:
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            from PyPDF2 import PdfReader
+        with open(file_path, 'rb') as f:
+            return len(PdfReader(f).pages)
+    except ImportError:
+        pass
+    except Exception as e:
+        logger.warning(f"⚠️ 페이지 수 확인 실패 ({Path(file_path).name}): {e}")
+        return 0
+    try:
+        import pdfplumber
+        with pdfplumber.open(file_path) as pdf:
+            return len(pdf.pages)
+    except Exception as e:
+        logger.warning(f"⚠️ 페이지 수 확인 실패 ({Path(file_path).name}): {e}")
+        return 0
+
+
+def page_ranges(total: int, range_pages: int) -> List[Tuple[int, int]]:
+    """전체 페이지를 range_pages 안팎의 균등한 범위로 분할 → [(start, end), ...]"""
+    parts = max(1, math.ceil(total / max(1, range_pages)))
+    bounds = [round(total * i / parts) for i in range(parts + 1)]
+    return [(bounds[i], bounds[i + 1]) for i in range(parts)]
+
+
+def probe_tasks(files: Iterable[Path], min_pages: int, range_pages: int) -> Deque:
+    """
+    파일 목록 → 작업 대기열 (PDF 는 SplitProbe 로 앞쪽에, 나머지는 파일 경로 그대로)
+    부모는 PDF 를 열지 않음: 손상/비정상 PDF 도 워커 예산 안에서만 파싱
+    """
+    probes = []
+    whole = []
+    for file_path in files:
+        if Path(file_path).suffix.lower() == '.pdf':
+            probes.append(SplitProbe(file_path, min_pages, range_pages))
+        else:
+            whole.append(file_path)
+    return deque(probes + whole)
+
+
+def probe_pdf(task: SplitProbe, run: Callable[[Path], object],
+              count_pages: Callable[[Path], int] = count_pdf_pages):
+    """[워커] 페이지 수 확인 → 분할 대상이면 PageCount, 아니면 run(파일) 결과 (파일 작업과 동일)"""
+    total = count_pages(task.file_path)
+    if total >= task.min_pages and total > task.range_pages:
+        return PageCount(total)
+    return run(task.file_path)
+
+
+class RangeAssembler:
+    """페이지 범위 결과 모으기 → 파일 단위로 완성되면 시작 페이지 순 결과 목록 반환"""
+
+    def __init__(self, parts: Optional[Dict[Path, int]] = None):
+        self.parts = dict(parts or {})
+        self.results: Dict[Path, Dict[int, object]] = {}
+        self.failed = set()
+
+    def split(self, probe: SplitProbe, count: PageCount, tasks: Deque) -> int:
+        """분할 판정 결과 → PageRange 작업을 대기열 앞에 추가 (감시 풀이 빈 워커에 바로 배정), 범위 수 반환"""
+        ranges = page_ranges(count.total, probe.range_pages)
+        self.parts[probe.file_path] = len(ranges)
+        tasks.extendleft(reversed([PageRange(probe.file_path, start, end, count.total) for start, end in ranges]))
+        return len(ranges)
+
+    def add(self, task: PageRange, value) -> Optional[List[object]]:
+        """범위 결과 추가 → 파일의 모든 범위가 모이면 [범위 결과...] (이미 실패한 파일은 None)"""
+        if task.file_path in self.failed:
+            return None
+        received = self.results.setdefault(task.file_path, {})
+        received[task.start] = value
+        if len(received) < self.parts[task.file_path]:
+            return None
+        del self.results[task.file_path]
+        return [received[start] for start in sorted(received)]
+
+    def fail(self, task: PageRange) -> bool:
+        """범위 실패 → 파일 전체 실패 처리 (처음 실패한 범위일 때만 True: 격리/로그는 파일당 1회)"""
+        self.results.pop(task.file_path, None)
+        if task.file_path in self.failed:
+            return False
+        self.failed.add(task.file_path)
+        return True
@@ -17,7 +17,8 @@ Day 2: 문서 처리 파이프라인
 import os
 import sys
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Iterator
+from collections import deque
 import logging
 from datetime import datetime
 
@@ -43,6 +44,10 @@ spec.loader.exec_module(config_module)
 
 Settings = config_module.Settings
 
+sys.path.insert(0, str(Path(__file__).parent))
+from doc_structure import split_marker, detect_headings, section_at, chunk_segments, get_tokenizer  # 페이지/제목 구조 인식 + 구조 인식 청크
+from pdf_page_split import PageRange, SplitProbe, PageCount, probe_tasks, probe_pdf, task_file, RangeAssembler  # 대용량 PDF 페이지 범위 분할
+
 
 class DocumentProcessor:
     """문서 처리 엔진"""
@@ -53,61 +58,110 @@ class DocumentProcessor:
         self.downloads_dir = Settings.DOWNLOADS_DIR
         self.chunk_size = Settings.CHUNK_SIZE
         self.chunk_overlap = Settings.CHUNK_OVERLAP
+        self._ocr = None  # 스캔 페이지 OCR 엔진 (첫 스캔 페이지에서 생성, 사용 불가 시 False)
         
         logger.info("📄 문서 처리기 초기화 완료")
     
     def process_pdf(self, file_path: Path) -> List[str]:
         """PDF 파일 처리"""
         try:
-            from PyPDF2 import PdfReader
-            
-            logger.info(f"📕 PDF 처리: {file_path.name}")
-            
-            pages = []
-            with open(file_path, 'rb') as f:
-                reader = PdfReader(f)
-                total_pages = len(reader.pages)
-                
-                for i, page in enumerate(reader.pages):
-                    text = page.extract_text()
-                    if text.strip():
-                        pages.append(f"[Page {i+1}/{total_pages}]\n{text}")
-                    
-                    if (i + 1) % 10 == 0:
-                        logger.info(f"   진행: {i+1}/{total_pages} 페이지")
-            
-            logger.info(f"✅ PDF 완료: {len(pages)}페이지 추출")
-            return pages
+            return self.extract_pdf_pages(file_path)
         
         except Exception as e:
             logger.error(f"❌ PDF 처리 실패 ({file_path.name}): {e}")
             return []
     
+    def extract_pdf_pages(self, file_path: Path, start: int = 0, end: int = None) -> List[str]:
+        """PDF 페이지 [start, end) 추출 (대용량 PDF 범위 작업용, 실패 시 예외)"""
+        from PyPDF2 import PdfReader
+        
+        pages = []
+        with open(file_path, 'rb') as f:
+            reader = PdfReader(f)
+            total_pages = len(reader.pages)
+            end = total_pages if end is None else min(end, total_pages)
+            span = f" (p.{start + 1}-{end})" if start or end < total_pages else ""
+            logger.info(f"📕 PDF 처리: {file_path.name}{span}")
+            
+            texts = {}
+            for i in range(start, end):
+                texts[i] = reader.pages[i].extract_text() or ""
+                
+                if (i + 1) % 10 == 0:
+                    logger.info(f"   진행: {i+1}/{total_pages} 페이지")
+        
+        # [스캔 페이지] 글자가 거의 없는 페이지만 렌더링 → OCR
+        blank = [i for i, text in texts.items() if len("".join(text.split())) < Settings.OCR_MIN_CHARS]
+        if blank:
+            texts.update(self.ocr_pdf_pages(file_path, blank, texts))
+        
+        for i, text in texts.items():
+            if text.strip():
+                pages.append(f"[Page {i+1}/{total_pages}]\n{text}")
+        
+        logger.info(f"✅ PDF 완료{span}: {len(pages)}페이지 추출")
+        return pages
+    
+    def ocr_pdf_pages(self, file_path: Path, indices: List[int], texts: Dict[int, str]) -> Dict[int, str]:
+        """
+        텍스트 레이어 없는 페이지 OCR → {페이지 인덱스: 텍스트} (기존 추출보다 긴 결과만)
+        페이지별 OCR 시간/캐시 적중을 로그로 보고
+        """
+        ocr = self._get_ocr()
+        if not ocr:
+            logger.warning(f"⚠️ 텍스트 없는 페이지 {len(indices)}개 OCR 생략 ({file_path.name})")
+            return {}
+        
+        logger.info(f"🔎 스캔 페이지 OCR: {file_path.name} {len(indices)}페이지")
+        results = ocr.ocr_pages(file_path, indices)
+        for i, result in sorted(results.items()):
+            if result.cached:
+                logger.info(f"   p.{i+1}: 캐시 적중 (원래 OCR {result.seconds:.2f}s, {len(result.text.strip())}자)")
+            else:
+                logger.info(f"   p.{i+1}: OCR {result.seconds:.2f}s ({len(result.text.strip())}자)")
+        
+        ocr_seconds = [r.seconds for r in results.values() if not r.cached]
+        cached = len(results) - len(ocr_seconds)
+        if ocr_seconds:
+            logger.info(
+                f"🔎 OCR 완료: {len(results)}/{len(indices)}페이지 (캐시 적중 {cached}) | "
+                f"페이지당 평균 {sum(ocr_seconds) / len(ocr_seconds):.2f}s / 최대 {max(ocr_seconds):.2f}s"
+            )
+        else:
+            logger.info(f"🔎 OCR 완료: {len(results)}/{len(indices)}페이지 (전부 캐시 적중)")
+        return {i: r.text for i, r in results.items() if len(r.text.strip()) > len(texts[i].strip())}
+    
+    def _get_ocr(self):
+        if self._ocr is None:
+            from pdf_ocr import PageOcr, ocr_available
+            
+            if Settings.OCR_ENABLED and ocr_available():
+                self._ocr = PageOcr(Settings.OCR_LANG, Settings.OCR_DPI, Settings.OCR_WORKERS, Settings.OCR_CACHE_DB)
+            else:
+                if Settings.OCR_ENABLED:
+                    logger.warning("⚠️ pypdfium2/pytesseract/Tesseract 미설치: 스캔 페이지 OCR 비활성화")
+                self._ocr = False
+        return self._ocr
+    
     def process_pptx(self, file_path: Path) -> List[str]:
-        """PowerPoint 파일 처리"""
+        """PowerPoint 파일 처리 (zip + iterparse 스트리밍, 표 포함)"""
         try:
-            from pptx import Presentation
+            from ooxml_reader import iter_pptx_slides, table_to_markdown
             
             logger.info(f"📊 PPT 처리: {file_path.name}")
             
             slides = []
-            prs = Presentation(file_path)
-            total_slides = len(prs.slides)
-            
-            for i, slide in enumerate(prs.slides):
-                text = []
-                
-                # 텍스트 상자에서 추출
-                for shape in slide.shapes:
-                    if hasattr(shape, "text") and shape.text.strip():
-                        text.append(shape.text)
+            for i, total_slides, blocks in iter_pptx_slides(file_path):
+                # 도형/표 텍스트 (슬라이드 내 순서 유지)
+                text = [table_to_markdown(value) if kind == 'table' else value for kind, value in blocks]
+                text = [t for t in text if t.strip()]
                 
                 if text:
-                    slide_text = f"[Slide {i+1}/{total_slides}]\n" + "\n".join(text)
+                    slide_text = f"[Slide {i}/{total_slides}]\n" + "\n".join(text)
                     slides.append(slide_text)
                 
-                if (i + 1) % 10 == 0:
-                    logger.info(f"   진행: {i+1}/{total_slides} 슬라이드")
+                if i % 10 == 0:
+                    logger.info(f"   진행: {i}/{total_slides} 슬라이드")
             
             logger.info(f"✅ PPT 완료: {len(slides)}슬라이드 추출")
             return slides
@@ -117,22 +171,20 @@ class DocumentProcessor:
             return []
     
     def process_docx(self, file_path: Path) -> List[str]:
-        """Word 파일 처리"""
+        """Word 파일 처리 (zip + iterparse 스트리밍, 표 포함)"""
         try:
-            from docx import Document
+            from ooxml_reader import iter_docx_blocks, table_to_markdown
             
             logger.info(f"📄 Word 처리: {file_path.name}")
             
             paragraphs = []
-            doc = Document(file_path)
-            total_paras = len(doc.paragraphs)
-            
-            for i, para in enumerate(doc.paragraphs):
-                if para.text.strip():
-                    paragraphs.append(para.text)
+            for i, (kind, value) in enumerate(iter_docx_blocks(file_path)):
+                text = table_to_markdown(value) if kind == 'table' else value
+                if text.strip():
+                    paragraphs.append(text)
                 
                 if (i + 1) % 100 == 0:
-                    logger.info(f"   진행: {i+1}/{total_paras} 단락")
+                    logger.info(f"   진행: {i+1}개 단락/표")
             
             logger.info(f"✅ Word 완료: {len(paragraphs)}단락 추출")
             return paragraphs
@@ -165,115 +217,195 @@ class DocumentProcessor:
     
     def chunk_text(self, text: str, source: str) -> List[Dict]:
         """텍스트를 청크로 분할"""
-        from transformers import AutoTokenizer
-        
+        return self.chunk_texts([text], source)
+    
+    def chunk_texts(self, texts: List[str], source: str) -> List[Dict]:
+        """
+        페이지/슬라이드 텍스트 목록을 청크로 분할 (토크나이저 1회 일괄 인코딩)
+        - 임베딩 모델과 같은 토크나이저 → CHUNK_SIZE/CHUNK_OVERLAP 는 실제 모델 토큰 수
+        - 오프셋 매핑으로 원문을 직접 잘라냄 (decode 없음 → 공백/특수문자 원형 보존)
+        - [구조 인식] 청크는 페이지/슬라이드를 넘지 않고, 자를 때는 제목 > 빈 줄 > 줄바꿈 경계 우선
+          ("[Page i/N]" 머리줄 → page/anchor, 검출한 제목 → section, 제목은 다음 페이지로 이어짐)
+        - offset: 파일 전체(텍스트 목록을 줄바꿈으로 이은 기준) 글자 위치 (결정적 청크 ID 용)
+        """
         # 토크나이저로 정확한 토큰 수 계산
-        try:
-            tokenizer = AutoTokenizer.from_pretrained(
-                'sentence-transformers/xlm-r-base-multilingual-nli-stsb'
-            )
-        except:
-            # 폴백: 간단한 분할
-            words = text.split()
-            chunk_size_words = self.chunk_size // 2
-            chunks = []
-            
-            for i in range(0, len(words), chunk_size_words):
-                chunk_words = words[i:i + chunk_size_words]
-                chunk_text = ' '.join(chunk_words)
-                chunks.append({
-                    'text': chunk_text,
-                    'source': source,
-                    'size': len(chunk_text)
-                })
-            
-            return chunks
-        
-        # 토크나이저 사용
-        tokens = tokenizer.encode(text)
-        chunks = []
+        # tokenizer = AutoTokenizer.from_pretrained('sentence-transformers/xlm-r-base-multilingual-nli-stsb')  # 호출마다 로드 (느림)
+        if not texts:
+            return []
         
-        for i in range(0, len(tokens), self.chunk_size - self.chunk_overlap):
-            chunk_tokens = tokens[i:i + self.chunk_size]
-            chunk_text = tokenizer.decode(chunk_tokens)
-            
-            if chunk_text.strip():
-                chunks.append({
-                    'text': chunk_text,
-                    'source': source,
-                    'tokens': len(chunk_tokens)
-                })
+        # 페이지별 (번호, 앵커, 본문, 파일 기준 본문 시작 오프셋) + 파일 전체 제목 목록
+        pages = []
+        headings = []
+        base = 0
+        for text in texts:
+            page, anchor, body, body_start = split_marker(text)
+            pages.append((page, anchor, body, base + body_start))
+            headings.extend(detect_headings(body, base + body_start))
+            base += len(text) + 1
+        heading_starts = [offset for offset, _ in headings]
         
+        # [구조 인식 청크] 페이지/슬라이드 경계를 넘지 않고 모델 토큰 수 기준 분할 (v5 로더와 같은 경로)
+        chunks = chunk_segments(pages, self.chunk_size, self.chunk_overlap,
+                                get_tokenizer(Settings.EMBEDDING_MODEL), heading_starts)
+        for chunk in chunks:
+            chunk['source'] = source
+            chunk['section'] = section_at(headings, heading_starts, chunk['offset'])
         return chunks
     
-    def process_directory(self, directory: Path = None) -> Tuple[List[Dict], Dict]:
-        """디렉토리의 모든 문서 처리"""
-        if directory is None:
-            directory = self.downloads_dir
+    def process_file(self, file_path: Path) -> List[str]:
+        """형식별 처리 → 페이지/슬라이드/단락 단위 텍스트 목록"""
+        ext = file_path.suffix.lower()
         
-        print("\n" + "="*80)
-        print("📚 문서 처리 시작")
-        print("="*80)
+        if ext == '.pdf':
+            return self.process_pdf(file_path)
+        elif ext == '.pptx':
+            return self.process_pptx(file_path)
+        elif ext == '.docx':
+            return self.process_docx(file_path)
+        elif ext in {'.png', '.jpg', '.jpeg'}:
+            text = self.process_image(file_path)
+            return [text] if text else []
+        elif ext == '.txt':
+            with open(file_path, 'r', encoding='utf-8') as f:
+                return [f.read()]
+        return []
+    
+    def iter_file_contents(self, files: List[Path], supervised: bool = False):
+        """
+        (파일, 텍스트 목록) 반환 — 실패/격리 파일은 텍스트 목록 None
+        supervised: 감시 워커에서 파싱 (파일당 시간/메모리 예산, 초과 시 격리 후 지수 백오프 재시도)
+                    호출마다 워커 풀을 새로 띄우므로 큰 파일 목록을 한 번에 넘기는 호출에서만 사용 (기본은 현재 프로세스)
+        """
+        if not supervised:
+            for file_path in files:
+                try:
+                    yield file_path, self.process_file(file_path)
+                except Exception as e:
+                    logger.error(f"파일 처리 실패 ({file_path.name}): {e}")
+                    yield file_path, None
+            return
+        
+        from worker_supervisor import SupervisedPool, Quarantine
+        
+        quarantine = Quarantine(Settings.QUARANTINE_FILE, Settings.QUARANTINE_BASE_DELAY, Settings.QUARANTINE_MAX_DELAY)
+        targets = []
+        for file_path in files:
+            if quarantine.is_blocked(str(file_path)):
+                logger.warning(f"⏸️ 격리 대기 중 스킵: {file_path.name} ({quarantine.entries[str(file_path)]['reason']})")
+                yield file_path, None
+            else:
+                targets.append(file_path)
         
-        all_documents = []
-        stats = {
+        # [문서 내부 병렬] 대용량 PDF 는 페이지 범위 작업으로 나눠 빈 워커들이 함께 추출, 부모에서 페이지 순서대로 재조립
+        # (페이지 수 확인도 워커의 분할 판정 작업에서: 부모는 PDF 를 열지 않음)
+        tasks = deque(targets)
+        workers = min(Settings.PARSE_WORKERS, len(tasks) or 1)
+        if Settings.PARSE_WORKERS > 1 and Settings.PDF_SPLIT_MIN_PAGES:
+            tasks = probe_tasks(targets, Settings.PDF_SPLIT_MIN_PAGES, Settings.PDF_SPLIT_RANGE_PAGES)
+            if any(isinstance(task, SplitProbe) for task in tasks):
+                workers = Settings.PARSE_WORKERS
+        assembler = RangeAssembler()
+        
+        pool = SupervisedPool(
+            _process_in_worker, workers,
+            initializer=_init_parse_worker,
+            time_budget=Settings.FILE_TIME_BUDGET, memory_budget_mb=Settings.FILE_MEMORY_BUDGET_MB,
+            max_tasks_per_worker=Settings.WORKER_MAX_TASKS,
+        )
+        for task, status, value in pool.imap_unordered(tasks):
+            file_path = task_file(task)
+            is_range = isinstance(task, PageRange)
+            if status == 'ok':
+                if isinstance(value, PageCount):
+                    parts = assembler.split(task, value, tasks)
+                    logger.info(f"✂️ 대용량 PDF {file_path.name} ({value.total}페이지) → 페이지 범위 작업 {parts}개로 분할 추출")
+                    continue
+                if is_range:
+                    parts = assembler.add(task, value)
+                    if parts is None:
+                        continue
+                    value = [page for pages in parts for page in pages]
+                quarantine.release(str(file_path))
+                yield file_path, value
+                continue
+            
+            # 범위 작업은 첫 실패만 보고 (파일 전체 실패, 나머지 범위 결과는 버림)
+            if is_range and not assembler.fail(task):
+                continue
+            label = f"{file_path.name} p.{task.start + 1}-{task.end}" if is_range else file_path.name
+            if status == 'error':
+                logger.error(f"파일 처리 실패 ({label}): {value}")
+            else:
+                quarantine.add(str(file_path), value)
+                logger.error(f"🚫 격리 ({label}): {value} (워커 교체)")
+            yield file_path, None
+    
+    def new_stats(self) -> Dict:
+        return {
             'total_files': 0,
             'processed_files': 0,
             'failed_files': 0,
             'total_chunks': 0,
             'formats': {},
+            'file_chunks': {},  # 파일 경로 → 청크 수 (성공 파일만)
             'start_time': datetime.now()
         }
+    
+    def iter_chunks(self, directory: Path = None, stats: Dict = None, files: List[Path] = None,
+                    supervised: bool = False) -> Iterator[Dict]:
+        """
+        [스트리밍] 파일 단위로 청크 dict 를 순서대로 반환 (전체 청크를 메모리에 모으지 않음)
+        - stats: 넘기면 진행 중 통계를 그 dict 에 누적 (new_stats() 형식, 종료 시 end_time/duration 기록)
+        - files: 지정 시 디렉토리 검색 대신 해당 파일만 처리
+        - supervised: 감시 워커 풀에서 파싱 (iter_file_contents 참고)
+        """
+        if stats is None:
+            stats = self.new_stats()
+        if files is None:
+            if directory is None:
+                directory = self.downloads_dir
+            # 지원되는 형식 찾기
+            files = []
+            for ext in self.supported_formats:
+                files.extend(directory.glob(f'*{ext}'))
         
-        # 지원되는 형식 찾기
-        files = []
-        for ext in self.supported_formats:
-            files.extend(directory.glob(f'*{ext}'))
-        
-        stats['total_files'] = len(files)
+        stats['total_files'] += len(files)
         logger.info(f"발견된 파일: {len(files)}개")
         
-        for file_path in files:
+        for file_path, contents in self.iter_file_contents(files, supervised):
             ext = file_path.suffix.lower()
             
             try:
-                contents = []
-                
-                # 형식별 처리
-                if ext == '.pdf':
-                    contents = self.process_pdf(file_path)
-                elif ext == '.pptx':
-                    contents = self.process_pptx(file_path)
-                elif ext == '.docx':
-                    contents = self.process_docx(file_path)
-                elif ext in {'.png', '.jpg', '.jpeg'}:
-                    text = self.process_image(file_path)
-                    contents = [text] if text else []
-                elif ext == '.txt':
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        contents = [f.read()]
-                
                 # 청크 분할
                 if contents:
-                    for content in contents:
-                        chunks = self.chunk_text(content, str(file_path))
-                        all_documents.extend(chunks)
-                    
-                    stats['processed_files'] += 1
-                    stats['formats'][ext] = stats['formats'].get(ext, 0) + 1
-                    stats['total_chunks'] += len([c for c in all_documents 
-                                                  if str(c['source']) == str(file_path)])
+                    chunks = self.chunk_texts(contents, str(file_path))
                 else:
                     stats['failed_files'] += 1
-            
+                    continue
             except Exception as e:
                 logger.error(f"파일 처리 실패 ({file_path.name}): {e}")
                 stats['failed_files'] += 1
+                continue
+            
+            stats['processed_files'] += 1
+            stats['formats'][ext] = stats['formats'].get(ext, 0) + 1
+            stats['total_chunks'] += len(chunks)
+            stats['file_chunks'][str(file_path)] = len(chunks)
+            yield from chunks
         
-        # 결과 출력
         stats['end_time'] = datetime.now()
         stats['duration'] = (stats['end_time'] - stats['start_time']).total_seconds()
+    
+    def process_directory(self, directory: Path = None, supervised: bool = False) -> Tuple[List[Dict], Dict]:
+        """디렉토리의 모든 문서 처리 (전체 청크 목록 반환, 스트리밍은 iter_chunks, supervised: 감시 워커 풀 1개로 파싱)"""
+        print("\n" + "="*80)
+        print("📚 문서 처리 시작")
+        print("="*80)
+        
+        stats = self.new_stats()
+        all_documents = list(self.iter_chunks(directory, stats, supervised=supervised))
         
+        # 결과 출력
         print("\n" + "="*80)
         print("📊 처리 결과")
         print("="*80)
@@ -288,6 +420,25 @@ class DocumentProcessor:
         return all_documents, stats
 
 
+# =========================================================
+# [감시 워커] 워커 프로세스당 DocumentProcessor 1개
+# =========================================================
+_worker_processor = None
+
+
+def _init_parse_worker():
+    global _worker_processor
+    _worker_processor = DocumentProcessor()
+
+
+def _process_in_worker(task) -> List[str]:
+    if isinstance(task, PageRange):
+        return _worker_processor.extract_pdf_pages(task.file_path, task.start, task.end)
+    if isinstance(task, SplitProbe):
+        return probe_pdf(task, _worker_processor.process_file)
+    return _worker_processor.process_file(task)
+
+
 def main():
     """테스트 실행"""
     processor = DocumentProcessor()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+감시형 워커 풀 + 격리(quarantine) 목록
+목표: 비정상 문서 1개가 야간 배치 전체를 멈추지 않도록 파일 단위 예산 적용
+
+기능:
+- 워커 프로세스마다 파일 1개씩 배정, 시간/메모리(RSS) 예산 초과 시 강제 종료 후 새 워커로 교체
+- 워커당 처리 파일 수 상한 도달 시 정상 종료 후 재생성 (파서 메모리 누수 차단)
+- 예산 초과/비정상 종료 파일은 사유와 함께 격리, 지수 백오프 후에만 재시도
+- 작업 목록을 deque 로 넘기면 결과 처리 중 추가한 작업도 빈 워커에 배정 (작업이 후속 작업을 만드는 경우)
+
+사용: from worker_supervisor import SupervisedPool, Quarantine
+"""
+
+import json
+import logging
+import multiprocessing as mp
+import os
+import time
+from collections import deque
+from multiprocessing.connection import wait
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+
+try:
+    import psutil  # 메모리 예산 감시용 (선택)
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+class Quarantine:
+    """격리 목록 (JSON): 키 → 사유, 시도 횟수, 다음 재시도 시각"""
+
+    def __init__(self, path: Path, base_delay: float = 24 * 3600, max_delay: float = 30 * 24 * 3600):
+        self.path = Path(path)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.entries = {}
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except Exception as e:
+                logger.error(f"❌ 격리 목록 로드 실패: {e}")
+
+    def is_blocked(self, key: str, fingerprint: Optional[str] = None) -> bool:
+        """재시도 대기 중이면 True (원본 내용이 바뀌었으면 즉시 재시도 허용)"""
+        entry = self.entries.get(key)
+        if not entry:
+            return False
+        if fingerprint and entry.get('fingerprint') and entry['fingerprint'] != fingerprint:
+            return False
+        return entry['next_retry'] > time.time()
+
+    def add(self, key: str, reason: str, fingerprint: Optional[str] = None):
+        entry = self.entries.get(key, {'attempts': 0})
+        attempts = entry['attempts'] + 1
+        delay = min(self.base_delay * 2 ** (attempts - 1), self.max_delay)
+        self.entries[key] = {
+            'reason': reason,
+            'attempts': attempts,
+            'fingerprint': fingerprint,
+            'quarantined_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'next_retry': time.time() + delay,
+        }
+        self.save()
+
+    def release(self, key: str):
+        if self.entries.pop(key, None) is not None:
+            self.save()
+
+    def save(self):
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def _worker_main(conn, func, initializer, initargs):
+    """워커 루프: 작업 수신 → 실행 → ('ok', 결과) / ('error', 메시지) 전송, None 수신 시 종료"""
+    if initializer is not None:
+        initializer(*initargs)
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        try:
+            conn.send(('ok', func(task)))
+        except Exception as e:
+            conn.send(('error', f"{type(e).__name__}: {e}"))
+
+
+class SupervisedPool:
+    """
+    파일 단위 예산을 감시하는 프로세스 풀
+    imap_unordered() 는 (작업, 상태, 값) 을 반환
+    - 상태: ok | error | timeout | memory | crashed (timeout/memory/crashed 의 값은 사유 문자열)
+    """
+
+    def __init__(self, func: Callable, workers: int, initializer: Optional[Callable] = None, initargs: tuple = (),
+                 time_budget: float = 600, memory_budget_mb: Optional[float] = None,
+                 max_tasks_per_worker: int = 200, poll_interval: float = 0.5):
+        self.func = func
+        self.workers = max(1, workers)
+        self.initializer = initializer
+        self.initargs = initargs
+        self.time_budget = time_budget
+        self.memory_budget = memory_budget_mb * MB if memory_budget_mb else None
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.poll_interval = poll_interval
+        self._ctx = mp.get_context()
+        if self.memory_budget and psutil is None:
+            logger.warning("⚠️ psutil 미설치: 메모리 예산 감시 없이 시간 예산만 적용합니다.")
+
+    def _spawn(self) -> dict:
+        parent_conn, child_conn = self._ctx.Pipe()
+        proc = self._ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self.func, self.initializer, self.initargs),
+            daemon=True,
+        )
+        proc.start()
+        child_conn.close()
+        return {'proc': proc, 'conn': parent_conn, 'task': None, 'started': 0.0, 'done': 0}
+
+    @staticmethod
+    def _kill(worker: dict):
+        worker['proc'].kill()
+        worker['proc'].join()
+        worker['conn'].close()
+
+    @staticmethod
+    def _stop(worker: dict):
+        try:
+            worker['conn'].send(None)
+        except (OSError, ValueError):
+            pass
+        worker['proc'].join(timeout=5)
+        if worker['proc'].is_alive():
+            worker['proc'].kill()
+            worker['proc'].join()
+        worker['conn'].close()
+
+    def _assign(self, worker: dict, tasks) -> bool:
+        if isinstance(tasks, deque):
+            task = tasks.popleft() if tasks else None
+        else:
+            task = next(tasks, None)
+        if task is None:
+            return False
+        worker['task'] = task
+        worker['started'] = time.monotonic()
+        worker['conn'].send(task)
+        return True
+
+    def _over_budget(self, worker: dict, now: float) -> Optional[Tuple[str, str]]:
+        if now - worker['started'] > self.time_budget:
+            return 'timeout', f"시간 예산 초과 ({self.time_budget:.0f}s)"
+        if self.memory_budget and psutil is not None:
+            try:
+                rss = psutil.Process(worker['proc'].pid).memory_info().rss
+            except psutil.Error:
+                return None
+            if rss > self.memory_budget:
+                return 'memory', f"메모리 예산 초과 ({rss / MB:.0f}MB > {self.memory_budget / MB:.0f}MB)"
+        return None
+
+    def _fill(self, pool: list, tasks):
+        """대기 중인 워커에 작업 배정 (deque 는 소비 측이 yield 사이에 작업을 추가할 수 있음)"""
+        for worker in pool:
+            if worker['task'] is None and not self._assign(worker, tasks):
+                break
+
+    def imap_unordered(self, tasks: Iterable) -> Iterator[Tuple[object, str, object]]:
+        """tasks: 반복 가능 객체 또는 deque (deque 는 반복 중 추가된 작업까지 처리)"""
+        if not isinstance(tasks, deque):
+            tasks = iter(tasks)
+        pool = [self._spawn() for _ in range(self.workers)]
+        try:
+            self._fill(pool, tasks)
+
+            while any(w['task'] is not None for w in pool):
+                busy = {w['conn']: i for i, w in enumerate(pool) if w['task'] is not None}
+                ready = wait(list(busy), timeout=self.poll_interval)
+
+                for conn in ready:
+                    i = busy[conn]
+                    worker = pool[i]
+                    task = worker['task']
+                    try:
+                        status, value = conn.recv()
+                    except (EOFError, OSError):
+                        # 파서가 프로세스를 죽인 경우 (segfault, OOM killer 등)
+                        worker['proc'].join(timeout=1)
+                        status, value = 'crashed', f"워커 비정상 종료 (exitcode {worker['proc'].exitcode})"
+                        self._kill(worker)
+                        pool[i] = worker = self._spawn()
+                    else:
+                        worker['task'] = None
+                        worker['done'] += 1
+                        if worker['done'] >= self.max_tasks_per_worker:
+                            # 워커 재활용: 누적 메모리 반환
+                            self._stop(worker)
+                            pool[i] = worker = self._spawn()
+                    yield task, status, value
+                    self._fill(pool, tasks)
+
+                now = time.monotonic()
+                for i, worker in enumerate(pool):
+                    if worker['task'] is None or worker['conn'] in ready:
+                        continue
+                    violation = self._over_budget(worker, now)
+                    if violation is None:
+                        continue
+                    task = worker['task']
+                    self._kill(worker)
+                    pool[i] = worker = self._spawn()
+                    yield (task,) + violation
+                    self._fill(pool, tasks)
+        finally:
+            for worker in pool:
+                if worker['task'] is None:
+                    self._stop(worker)
+                else:
+                    self._kill(worker)